@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for ClaimIndex."""
+from __future__ import unicode_literals
+import json
+import mock
+import os
+import unittest
+
+import pywikibot
+
+from wikidatastuff.claim_index import ClaimIndex
+
+
+class TestClaimIndex(unittest.TestCase):
+
+    """Test ClaimIndex."""
+
+    def setUp(self):
+        """Setup test."""
+        self.repo = pywikibot.Site('test', 'wikidata')
+        self.wd_page = pywikibot.ItemPage(self.repo, None)
+        data_dir = os.path.join(os.path.split(__file__)[0], 'data')
+        with open(os.path.join(data_dir, 'Q27399.json')) as f:
+            self.wd_page._content = json.load(f).get('entities').get('Q27399')
+        self.wd_page._content['id'] = '-1'  # override id used in demo file
+        self.wd_page.get()
+        self.resolve = mock.Mock(side_effect=lambda target: target)
+
+    def test_claim_index_find(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        hits = index.find('P664', 'Duplicate_string', self.resolve)
+        self.assertEqual(
+            [claim.toJSON()['id'] for claim, target in hits],
+            ['Q27399$221e4451-46d7-8c4a-53cb-47a4e0d09660',
+             'Q27399$a9b83de1-49d7-d033-939d-f430a232ffd0'])
+
+    def test_claim_index_find_no_match(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        self.assertEqual(
+            index.find('P174', 'An unknown string', self.resolve), [])
+        self.assertEqual(index.find('P0', 'A string', self.resolve), [])
+
+    def test_claim_index_find_item(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        itis = pywikibot.ItemPage(self.repo, 'Q1341')
+        hits = index.find('P84', itis, self.resolve)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0][1], itis)
+
+    def test_claim_index_find_snaktype(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        self.assertEqual(
+            len(index.find_snaktype('P174', 'value')),
+            len(self.wd_page.claims['P174']))
+        self.assertEqual(index.find_snaktype('P174', 'novalue'), [])
+
+    def test_claim_index_targets_resolved_once(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        index.find('P174', 'A string', self.resolve)
+        num_claims = len(self.wd_page.claims['P174'])
+        self.assertEqual(self.resolve.call_count, num_claims)
+
+        index = ClaimIndex.for_item(self.wd_page)
+        index.find('P174', 'Another string', self.resolve)
+        self.assertEqual(self.resolve.call_count, num_claims)
+
+    def test_claim_index_rebuilt_on_new_revision(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        self.wd_page._revid = 123
+        self.assertIsNot(ClaimIndex.for_item(self.wd_page), index)
+
+    def test_claim_index_rebuilt_on_invalidate(self):
+        index = ClaimIndex.for_item(self.wd_page)
+        ClaimIndex.invalidate(self.wd_page)
+        self.assertIsNot(ClaimIndex.for_item(self.wd_page), index)
+
+    def test_claim_index_qualifier_keys(self):
+        # two qualifiers: P174:A qualifier, P174:Another qualifier
+        claim = self.wd_page.claims['P174'][5]
+        keys = ClaimIndex.qualifier_keys(claim, self.resolve)
+        self.assertEqual(
+            keys,
+            {('P174', ('value', 'A qualifier')): 1,
+             ('P174', ('value', 'Another qualifier')): 1})
+
+    def test_claim_index_qualifier_keys_duplicates_counted(self):
+        # one qualifier: P174:qualifier
+        claim = self.wd_page.claims['P664'][1]
+        claim.qualifiers['P174'].append(claim.qualifiers['P174'][0].copy())
+        keys = ClaimIndex.qualifier_keys(claim, self.resolve)
+        self.assertEqual(keys, {('P174', ('value', 'qualifier')): 2})
+
+    def test_claim_index_qualifier_keys_computed_once(self):
+        claim = self.wd_page.claims['P174'][5]
+        ClaimIndex.qualifier_keys(claim, self.resolve)
+        ClaimIndex.qualifier_keys(claim, self.resolve)
+        self.assertEqual(self.resolve.call_count, 2)
+
+    def test_claim_index_qualifier_keys_rebuilt_on_invalidate(self):
+        claim = self.wd_page.claims['P174'][2]
+        self.assertEqual(ClaimIndex.qualifier_keys(claim, self.resolve), {})
+
+        qualifier = pywikibot.Claim(self.repo, 'P174', is_qualifier=True)
+        qualifier.setTarget('New qualifier')
+        claim.qualifiers['P174'] = [qualifier]
+        ClaimIndex.invalidate_claim(claim)
+        self.assertEqual(
+            ClaimIndex.qualifier_keys(claim, self.resolve),
+            {('P174', ('value', 'New qualifier')): 1})
+
+    def test_claim_index_source_keys(self):
+        # two refs each with one claim: P174:ref_1, P174:ref_2
+        claim = self.wd_page.claims['P174'][3]
+        self.assertEqual(
+            ClaimIndex.source_keys(claim, self.resolve),
+            frozenset([('P174', ('value', 'ref_1')),
+                       ('P174', ('value', 'ref_2'))]))
+
+    def test_claim_index_source_keys_rebuilt_on_new_revision(self):
+        claim = self.wd_page.claims['P174'][3]
+        ClaimIndex.source_keys(claim, self.resolve)
+        ClaimIndex.source_keys(claim, self.resolve)
+        self.assertEqual(self.resolve.call_count, 2)
+
+        self.wd_page._revid = 123
+        ClaimIndex.source_keys(claim, self.resolve)
+        self.assertEqual(self.resolve.call_count, 4)
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for EntityId."""
+from __future__ import unicode_literals
+import pickle
+import unittest
+
+from wikidatastuff.entity_id import EntityId, ItemId, LexemeId, PropertyId
+
+
+class TestEntityId(unittest.TestCase):
+
+    """Test EntityId."""
+
+    def test_entity_id_parse_uri(self):
+        result = EntityId.parse('http://www.wikidata.org/entity/Q42')
+        self.assertIsInstance(result, ItemId)
+        self.assertEqual(result, 42)
+
+    def test_entity_id_parse_prefixed(self):
+        self.assertIsInstance(EntityId.parse('wd:P31'), PropertyId)
+        self.assertIsInstance(EntityId.parse('P31'), PropertyId)
+        self.assertIsInstance(EntityId.parse('L7'), LexemeId)
+
+    def test_entity_id_parse_unprefixed_requires_type(self):
+        with self.assertRaises(ValueError):
+            EntityId.parse('42')
+        with self.assertRaises(ValueError):
+            EntityId.parse(42)
+        self.assertEqual(ItemId.parse('42'), ItemId(42))
+        self.assertEqual(ItemId.parse(42), ItemId(42))
+
+    def test_entity_id_parse_wrong_type(self):
+        with self.assertRaises(ValueError):
+            ItemId.parse('P42')
+        with self.assertRaises(ValueError):
+            ItemId.parse(PropertyId(42))
+
+    def test_entity_id_parse_invalid(self):
+        for value in ('', 'Q', 'Q-1', 'Q0', 'Foo', None, True, -3, 1.5):
+            with self.assertRaises(ValueError):
+                ItemId.parse(value)
+
+    def test_entity_id_init(self):
+        self.assertEqual(ItemId('Q42'), ItemId(42))
+        with self.assertRaises(ValueError):
+            ItemId(0)
+
+    def test_entity_id_id_and_uri(self):
+        qid = ItemId(42)
+        self.assertEqual(qid.id, 'Q42')
+        self.assertEqual(qid.uri, 'http://www.wikidata.org/entity/Q42')
+        self.assertEqual(repr(qid), 'ItemId(Q42)')
+
+    def test_entity_id_behaves_as_int(self):
+        qid = ItemId(42)
+        self.assertEqual(qid, 42)
+        self.assertEqual(hash(qid), hash(42))
+        self.assertEqual(str(qid), '42')
+        self.assertEqual('Q{}'.format(qid), 'Q42')
+        self.assertEqual(qid + 1, 43)
+
+    def test_entity_id_types_differ(self):
+        self.assertNotEqual(ItemId(42), PropertyId(42))
+        self.assertFalse(ItemId(42) == PropertyId(42))
+        self.assertEqual(ItemId(42), ItemId('Q42'))
+        self.assertNotEqual(ItemId(42), 'Q42')
+
+    def test_entity_id_pickle(self):
+        qid = ItemId(42)
+        result = pickle.loads(pickle.dumps(qid))
+        self.assertEqual(result, qid)
+        self.assertIsInstance(result, ItemId)
@@ -7,8 +7,10 @@ import mock
 
 import pywikibot
 
+from wikidatastuff.entity_id import ItemId, PropertyId
 from wikidatastuff.helpers import (
     bundle_values,
+    chunks,
     convert_language_dict_to_json,
     fill_cache_wdqs,
     get_unit_q,
@@ -21,7 +23,9 @@ from wikidatastuff.helpers import (
     sig_fig_error,
     _std_val,
     std_p,
-    std_q
+    std_q,
+    target_key,
+    wbtime_key
 )
 
 
@@ -173,20 +177,27 @@ class TestFillCacheWdqs(unittest.TestCase):
         patcher = mock.patch(
             'wikidatastuff.wdq_to_wdqs.make_claim_wdqs_search')
         self.mock_wdqs_search = patcher.start()
-        self.mock_wdqs_search.return_value = {
-            'Q123': ['abc', 'def'],
-            'Q456': ['ghi']
-        }
+        self.mock_wdqs_search.return_value = self.make_rows(
+            ('Q123', 'abc'), ('Q123', 'def'), ('Q456', 'ghi'))
         self.addCleanup(patcher.stop)
         patcher = mock.patch('wikidatastuff.helpers.pywikibot.output')
         self.mock_output = patcher.start()
         self.addCleanup(patcher.stop)
 
+    @staticmethod
+    def make_rows(*rows):
+        """Make a stream of raw rows, as returned by a streamed search."""
+        return (
+            {'item': 'http://www.wikidata.org/entity/{}'.format(qid),
+             'value': value}
+            for qid, value in rows)
+
     def test_fill_cache_wdqs_prop_w_p(self):
         expected = {'abc': 123, 'def': 123, 'ghi': 456}
         result = fill_cache_wdqs('P123')
         self.mock_wdqs_search.assert_called_once_with(
-            'P123', get_values=True, allow_multiple=True
+            'P123', get_values=True, raw=True, stream=True, ttl=None,
+            bypass_cache=False
         )
         self.mock_output.assert_not_called()
         self.assertCountEqual(result, expected)
@@ -195,7 +206,8 @@ class TestFillCacheWdqs(unittest.TestCase):
         expected = {'abc': 123, 'def': 123, 'ghi': 456}
         result = fill_cache_wdqs('123')
         self.mock_wdqs_search.assert_called_once_with(
-            'P123', get_values=True, allow_multiple=True
+            'P123', get_values=True, raw=True, stream=True, ttl=None,
+            bypass_cache=False
         )
         self.mock_output.assert_not_called()
         self.assertCountEqual(result, expected)
@@ -204,25 +216,32 @@ class TestFillCacheWdqs(unittest.TestCase):
         expected = {'abc': 'Q123', 'def': 'Q123', 'ghi': 'Q456'}
         result = fill_cache_wdqs('P123', no_strip=True)
         self.mock_wdqs_search.assert_called_once_with(
-            'P123', get_values=True, allow_multiple=True
+            'P123', get_values=True, raw=True, stream=True, ttl=None,
+            bypass_cache=False
         )
         self.mock_output.assert_not_called()
         self.assertCountEqual(result, expected)
 
     def test_fill_cache_wdqs_non_unique(self):
-        self.mock_wdqs_search.return_value = {
-            'Q123': ['abc', 'def'],
-            'Q456': ['ghi', 'abc']
-        }
-        expected = {'abc': 123, 'def': 123, 'ghi': 456}
+        self.mock_wdqs_search.return_value = self.make_rows(
+            ('Q123', 'abc'), ('Q123', 'def'), ('Q456', 'ghi'),
+            ('Q456', 'abc'), ('Q456', 'abc'))
+        expected = {'abc': 456, 'def': 123, 'ghi': 456}
         result = fill_cache_wdqs('123')
         self.mock_wdqs_search.assert_called_once_with(
-            'P123', get_values=True, allow_multiple=True
+            'P123', get_values=True, raw=True, stream=True, ttl=None,
+            bypass_cache=False
+        )
+        self.mock_output.assert_called_once_with(
+            'Double ids in Wikidata: Q456, Q123 (CLAIM[123])')
+        self.assertEqual(result, expected)
+
+    def test_fill_cache_wdqs_cache_options(self):
+        fill_cache_wdqs('P123', ttl=3600, bypass_cache=True)
+        self.mock_wdqs_search.assert_called_once_with(
+            'P123', get_values=True, raw=True, stream=True, ttl=3600,
+            bypass_cache=True
         )
-        self.mock_output.assert_called_once()
-        # Note that we cannot easily check the sent value since order of the
-        # dict is not guaranteed
-        self.assertCountEqual(result, expected)
 
     def test_fill_cache_wdqs_queryoverride_trigger_error(self):
         with self.assertRaises(NotImplementedError):
@@ -355,6 +374,19 @@ class TestListify(unittest.TestCase):
         self.assertEqual(listify(input_value), expected)
 
 
+class TestChunks(unittest.TestCase):
+
+    """Test chunks()."""
+
+    def test_chunks_empty(self):
+        self.assertEqual(list(chunks([], 2)), [])
+
+    def test_chunks_uneven(self):
+        self.assertEqual(
+            list(chunks(iter(range(5)), 2)),
+            [[0, 1], [2, 3], [4]])
+
+
 class TestStdVal(unittest.TestCase):
 
     """Test _std_val(), std_p, std_q."""
@@ -388,6 +420,11 @@ class TestStdVal(unittest.TestCase):
         with self.assertRaises(ValueError):
             _std_val('B15', 'A')
 
+    def test_std_val_entity_id(self):
+        self.assertEqual(_std_val(ItemId(16), 'Q'), 'Q16')
+        with self.assertRaises(ValueError):
+            _std_val(PropertyId(16), 'Q')
+
     def test_std_p(self):
         with mock.patch('wikidatastuff.helpers._std_val', autospec=True,
                         return_value='mock_value') as mock_std_val:
@@ -501,3 +538,143 @@ class TestReorderNames(unittest.TestCase):
         name = 'Last, Middle, First'
         self.assertEqual(reorder_names(name), None)
         self.mock_output.assert_called_once()
+
+
+class TestTargetKey(unittest.TestCase):
+
+    """Test target_key()."""
+
+    def setUp(self):
+        self.repo = pywikibot.Site('test', 'wikidata')
+
+    def test_target_key_string(self):
+        self.assertEqual(target_key('a string'), ('value', 'a string'))
+
+    def test_target_key_item(self):
+        self.assertEqual(
+            target_key(pywikibot.ItemPage(self.repo, 'Q42')),
+            ('entity', 'Q42'))
+
+    def test_target_key_wbtime_truncated_on_precision(self):
+        time_1 = pywikibot.WbTime(
+            year=2016, month=11, day=22, precision='month', site=self.repo)
+        time_2 = pywikibot.WbTime(
+            year=2016, month=11, day=1, precision='month', site=self.repo)
+        self.assertEqual(target_key(time_1), target_key(time_2))
+
+    def test_target_key_wbtime_different_precision(self):
+        time_1 = pywikibot.WbTime(
+            year=2016, month=11, precision='month', site=self.repo)
+        time_2 = pywikibot.WbTime(
+            year=2016, month=11, precision='year', site=self.repo)
+        self.assertNotEqual(target_key(time_1), target_key(time_2))
+
+    def test_target_key_quantity(self):
+        unit = 'http://test.wikidata.org/entity/Q11573'
+        quantity_1 = pywikibot.WbQuantity(
+            amount=5, error=1, unit=unit, site=self.repo)
+        quantity_2 = pywikibot.WbQuantity(
+            amount=5, unit=unit, site=self.repo)
+        self.assertEqual(target_key(quantity_1), target_key(quantity_2))
+        self.assertEqual(target_key(quantity_1), ('quantity', 5, 'Q11573'))
+
+    def test_target_key_unhashable(self):
+        self.assertIsNone(target_key(['a', 'list']))
+
+
+class TestWbtimeKey(unittest.TestCase):
+
+    """Test wbtime_key()."""
+
+    def setUp(self):
+        self.repo = pywikibot.Site('test', 'wikidata')
+
+    def test_wbtime_key_day(self):
+        wbtime = pywikibot.WbTime(
+            year=2016, month=11, day=22, hour=10, precision='day',
+            site=self.repo)
+        self.assertEqual(
+            wbtime_key(wbtime),
+            (11, wbtime.calendarmodel, 2016, 11, 22))
+
+    def test_wbtime_key_coarse_precision_truncates_year(self):
+        wbtime = pywikibot.WbTime(
+            year=2016, month=11, precision='decade', site=self.repo)
+        self.assertEqual(
+            wbtime_key(wbtime),
+            (8, wbtime.calendarmodel, 201))
+
+    def test_wbtime_key_coarse_precision_same_decade(self):
+        time_1 = pywikibot.WbTime(year=1990, precision='decade',
+                                  site=self.repo)
+        time_2 = pywikibot.WbTime(year=1995, precision='decade',
+                                  site=self.repo)
+        time_3 = pywikibot.WbTime(year=2005, precision='decade',
+                                  site=self.repo)
+        self.assertEqual(wbtime_key(time_1), wbtime_key(time_2))
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_3))
+
+    def test_wbtime_key_coarse_precision_bce(self):
+        time_1 = pywikibot.WbTime(year=-1510, precision='century',
+                                  site=self.repo)
+        time_2 = pywikibot.WbTime(year=-1590, precision='century',
+                                  site=self.repo)
+        time_3 = pywikibot.WbTime(year=1510, precision='century',
+                                  site=self.repo)
+        self.assertEqual(wbtime_key(time_1), wbtime_key(time_2))
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_3))
+
+    def test_wbtime_key_century_boundaries(self):
+        time_1 = pywikibot.WbTime(year=1901, precision='century',
+                                  site=self.repo)
+        time_2 = pywikibot.WbTime(year=2000, precision='century',
+                                  site=self.repo)
+        time_3 = pywikibot.WbTime(year=1900, precision='century',
+                                  site=self.repo)
+        self.assertEqual(wbtime_key(time_1), wbtime_key(time_2))
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_3))
+        self.assertEqual(wbtime_key(time_1)[2], 20)
+
+    def test_wbtime_key_century_boundaries_bce(self):
+        time_1 = pywikibot.WbTime(year=-1901, precision='century',
+                                  site=self.repo)
+        time_2 = pywikibot.WbTime(year=-2000, precision='century',
+                                  site=self.repo)
+        time_3 = pywikibot.WbTime(year=-1900, precision='century',
+                                  site=self.repo)
+        self.assertEqual(wbtime_key(time_1), wbtime_key(time_2))
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_3))
+
+    def test_wbtime_key_millennium_boundaries(self):
+        time_1 = pywikibot.WbTime(year=1001, precision='millenia',
+                                  site=self.repo)
+        time_2 = pywikibot.WbTime(year=2000, precision='millenia',
+                                  site=self.repo)
+        time_3 = pywikibot.WbTime(year=2001, precision='millenia',
+                                  site=self.repo)
+        self.assertEqual(wbtime_key(time_1), wbtime_key(time_2))
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_3))
+
+    def test_wbtime_key_decade_boundaries(self):
+        time_1 = pywikibot.WbTime(year=1990, precision='decade',
+                                  site=self.repo)
+        time_2 = pywikibot.WbTime(year=1989, precision='decade',
+                                  site=self.repo)
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_2))
+
+    def test_wbtime_key_ignores_timezone_and_bounds(self):
+        time_1 = pywikibot.WbTime(
+            year=2016, month=11, day=22, timezone=60, before=1,
+            site=self.repo)
+        time_2 = pywikibot.WbTime(
+            year=2016, month=11, day=22, site=self.repo)
+        self.assertEqual(wbtime_key(time_1), wbtime_key(time_2))
+
+    def test_wbtime_key_different_calendarmodel(self):
+        time_1 = pywikibot.WbTime(
+            year=1700, calendarmodel='http://www.wikidata.org/entity/Q1985727',
+            site=self.repo)
+        time_2 = pywikibot.WbTime(
+            year=1700, calendarmodel='http://www.wikidata.org/entity/Q1985786',
+            site=self.repo)
+        self.assertNotEqual(wbtime_key(time_1), wbtime_key(time_2))
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for ImportJournal."""
+from __future__ import unicode_literals
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from wikidatastuff.import_journal import ImportJournal
+from wikidatastuff.qualifier import Qualifier
+from wikidatastuff.reference import Reference
+from wikidatastuff.statement import Statement
+
+
+class TestImportJournal(unittest.TestCase):
+
+    """Test ImportJournal."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.filename = os.path.join(self.tmp_dir, 'journal.jsonl')
+        self.statement = Statement('foo')
+        self.other_statement = Statement('bar')
+
+    def open_journal(self):
+        journal = ImportJournal(self.filename)
+        self.addCleanup(journal.close)
+        return journal
+
+    def read_lines(self):
+        with io.open(self.filename, encoding='utf-8') as f:
+            return f.readlines()
+
+    def test_import_journal_empty(self):
+        journal = self.open_journal()
+        self.assertEqual(len(journal), 0)
+        self.assertFalse(journal.is_done('Q1', 'P1', self.statement))
+
+    def test_import_journal_record(self):
+        journal = self.open_journal()
+        journal.record('Q1', 'P1', self.statement, 123)
+        self.assertTrue(journal.is_done('Q1', 'P1', self.statement))
+        self.assertTrue(journal.is_done('Q1', '1', self.statement))
+        self.assertFalse(journal.is_done('Q2', 'P1', self.statement))
+        self.assertFalse(journal.is_done('Q1', 'P2', self.statement))
+        self.assertFalse(journal.is_done('Q1', 'P1', self.other_statement))
+
+        lines = self.read_lines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(
+            json.loads(lines[0]),
+            {'qid': 'Q1', 'prop': 'P1', 'revid': 123,
+             'fingerprint': self.statement.fingerprint()})
+
+    def test_import_journal_record_ref(self):
+        ref = Reference(source_test=Qualifier('P248', 'source'))
+        other_ref = Reference(source_test=Qualifier('P248', 'other source'))
+        journal = self.open_journal()
+        journal.record('Q1', 'P1', self.statement, 123, ref=ref)
+        self.assertTrue(journal.is_done('Q1', 'P1', self.statement, ref))
+        self.assertFalse(journal.is_done('Q1', 'P1', self.statement))
+        self.assertFalse(
+            journal.is_done('Q1', 'P1', self.statement, other_ref))
+        self.assertEqual(
+            journal.filter('Q1', {'P1': self.statement}, ref=other_ref),
+            {'P1': self.statement})
+
+        # an external ref is the same as an identical embedded ref
+        statement = Statement('foo').add_reference(ref)
+        self.assertTrue(journal.is_done('Q1', 'P1', statement))
+        self.assertTrue(journal.is_done('Q1', 'P1', statement, ref))
+
+    def test_import_journal_record_duplicate(self):
+        journal = self.open_journal()
+        journal.record('Q1', 'P1', self.statement, 123)
+        journal.record('Q1', 'P1', self.statement, 124)
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(len(self.read_lines()), 1)
+
+    def test_import_journal_reload(self):
+        journal = self.open_journal()
+        journal.record('Q1', 'P1', self.statement, 123)
+        journal.close()
+
+        journal = self.open_journal()
+        self.assertEqual(len(journal), 1)
+        self.assertTrue(journal.is_done('Q1', 'P1', self.statement))
+        journal.record('Q1', 'P1', self.other_statement, 124)
+        self.assertEqual(len(self.read_lines()), 2)
+
+    def test_import_journal_truncated_line(self):
+        journal = self.open_journal()
+        journal.record('Q1', 'P1', self.statement, 123)
+        journal.close()
+        with io.open(self.filename, 'a', encoding='utf-8') as f:
+            f.write('{"qid": "Q1", "pr')
+
+        journal = self.open_journal()
+        self.assertEqual(len(journal), 1)
+        journal.record('Q1', 'P1', self.other_statement, 124)
+        journal.close()
+
+        journal = self.open_journal()
+        self.assertEqual(len(journal), 2)
+        self.assertTrue(journal.is_done('Q1', 'P1', self.other_statement))
+
+    def test_import_journal_filter(self):
+        journal = self.open_journal()
+        journal.record('Q1', 'P1', self.statement, 123)
+        protoclaims = {
+            'P1': [self.statement, self.other_statement],
+            'P2': self.statement,
+            'P3': self.other_statement
+        }
+        self.assertEqual(
+            journal.filter('Q1', protoclaims),
+            {'P1': [self.other_statement],
+             'P2': self.statement,
+             'P3': self.other_statement})
+        self.assertEqual(
+            journal.filter('Q1', {'P1': [self.statement]}), {})
@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for ItemEditSession."""
+from __future__ import unicode_literals
+import json
+import mock
+import os
+import unittest
+
+import pywikibot
+
+from wikidatastuff import wikidata_stuff
+from wikidatastuff.qualifier import Qualifier
+from wikidatastuff.reference import Reference
+from wikidatastuff.statement import Statement
+
+
+class TestItemEditSession(unittest.TestCase):
+
+    """Test ItemEditSession together with WikidataStuff."""
+
+    def setUp(self):
+        """Setup test."""
+        self.repo = pywikibot.Site('test', 'wikidata')
+        self.wd_page = pywikibot.ItemPage(self.repo, None)
+        data_dir = os.path.join(os.path.split(__file__)[0], 'data')
+        with open(os.path.join(data_dir, 'Q27399.json')) as f:
+            self.wd_page._content = json.load(f).get('entities').get('Q27399')
+        self.wd_page._content['id'] = '-1'  # override id used in demo file
+        self.wd_page.get()
+        self.wd_stuff = wikidata_stuff.WikidataStuff(self.repo)
+
+        # silence output
+        output_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.output')
+        session_output_patcher = mock.patch(
+            'wikidatastuff.item_edit_session.pywikibot.output')
+        self.mock_output = output_patcher.start()
+        self.mock_session_output = session_output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+        self.addCleanup(session_output_patcher.stop)
+
+        # mock all writing calls
+        patchers = {
+            'edit_entity': 'pywikibot.ItemPage.editEntity',
+            'edit_labels': 'pywikibot.ItemPage.editLabels',
+            'edit_aliases': 'pywikibot.ItemPage.editAliases',
+            'edit_descriptions': 'pywikibot.ItemPage.editDescriptions',
+            'add_claim': 'pywikibot.ItemPage.addClaim',
+            'save_claim': 'pywikibot.site.DataSite.save_claim',
+            'add_qualifier': 'pywikibot.Claim.addQualifier',
+            'add_sources': 'pywikibot.Claim.addSources',
+        }
+        self.mocks = {}
+        for key, target in patchers.items():
+            patcher = mock.patch(
+                'wikidatastuff.wikidata_stuff.{}'.format(target))
+            self.mocks[key] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.ref_claim = pywikibot.Claim(self.repo, 'P174')
+        self.ref_claim.setTarget('ref_1')
+
+    def assert_no_single_writes(self):
+        for key, mocked in self.mocks.items():
+            if key != 'edit_entity':
+                mocked.assert_not_called()
+
+    def test_edit_session_no_changes_no_edit(self):
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.add_multiple_descriptions(
+                {'en': 'new_description'}, self.wd_page)
+        self.mocks['edit_entity'].assert_not_called()
+        self.assert_no_single_writes()
+
+    def test_edit_session_terms_single_edit(self):
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.add_multiple_descriptions(
+                {'fi': 'fi_desc'}, self.wd_page)
+            self.wd_stuff.add_multiple_label_or_alias(
+                {'fi': 'fi_label', 'sv': 'sv_alias'}, self.wd_page)
+        self.assert_no_single_writes()
+        self.mocks['edit_entity'].assert_called_once_with(
+            {
+                'labels': {'fi': 'fi_label'},
+                'aliases': {'sv': ['sv_alias']},
+                'descriptions': {'fi': 'fi_desc'}
+            },
+            summary='Added [fi] label, [sv] alias, [fi] description to '
+                    '[[-1]]')
+
+    def test_edit_session_local_item_updated(self):
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.add_multiple_label_or_alias(
+                {'fi': 'fi_label'}, self.wd_page)
+            self.assertEqual(self.wd_page.labels['fi'], 'fi_label')
+            # second call should not result in a new alias
+            self.wd_stuff.add_multiple_label_or_alias(
+                {'fi': 'fi_label'}, self.wd_page)
+        data = self.mocks['edit_entity'].call_args[0][0]
+        self.assertNotIn('aliases', data)
+
+    def test_edit_session_claims_single_edit(self):
+        statement = Statement('A statement')
+        statement.add_qualifier(Qualifier('P174', 'A qualifier'))
+        statement.add_reference(Reference(source_test=self.ref_claim))
+        old_statement = Statement('A string')
+        old_statement.add_qualifier(Qualifier('P664', 'A qualifier'))
+
+        with self.wd_stuff.edit_session(self.wd_page, summary='test'):
+            self.wd_stuff.add_new_claim('P509', statement, self.wd_page, None)
+            self.wd_stuff.add_new_claim(
+                'P174', old_statement, self.wd_page, None)
+
+        self.assert_no_single_writes()
+        self.mocks['edit_entity'].assert_called_once()
+        data = self.mocks['edit_entity'].call_args[0][0]
+        summary = self.mocks['edit_entity'].call_args[1]['summary']
+        self.assertEqual(
+            summary,
+            'Added 1 claim, 1 qualifier to [[-1]], test')
+        self.assertEqual(len(data['claims']), 2)
+
+        new_claim, old_claim = data['claims']
+        self.assertTrue(new_claim['id'].startswith('-1$'))
+        self.assertEqual(new_claim['mainsnak']['property'], 'P509')
+        self.assertEqual(list(new_claim['qualifiers'].keys()), ['P174'])
+        self.assertEqual(len(new_claim['references']), 1)
+        self.assertEqual(
+            old_claim['id'], 'Q27399$3f62d521-4efe-e8de-8f2d-0d8a10e024cf')
+        self.assertEqual(list(old_claim['qualifiers'].keys()), ['P664'])
+
+        # the new claim is visible on the local item
+        self.assertEqual(len(self.wd_page.claims['P509']), 1)
+
+    def test_edit_session_consecutive_sessions_same_claim(self):
+        statement = Statement('A statement')
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.add_new_claim('P509', statement, self.wd_page, None)
+        first_claim = self.mocks['edit_entity'].call_args[0][0]['claims'][0]
+
+        statement = Statement('A statement')
+        statement.add_qualifier(Qualifier('P174', 'A qualifier'))
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.add_new_claim('P509', statement, self.wd_page, None)
+
+        self.assertEqual(self.mocks['edit_entity'].call_count, 2)
+        data = self.mocks['edit_entity'].call_args[0][0]
+        summary = self.mocks['edit_entity'].call_args[1]['summary']
+        self.assertEqual(summary, 'Added 1 qualifier to [[-1]]')
+        self.assertEqual(len(data['claims']), 1)
+        self.assertEqual(data['claims'][0]['id'], first_claim['id'])
+        self.assertEqual(
+            list(data['claims'][0]['qualifiers'].keys()), ['P174'])
+        self.assertEqual(len(self.wd_page.claims['P509']), 1)
+
+    def test_edit_session_journal_after_save(self):
+        journal = mock.Mock()
+        journal.is_done.return_value = False
+        self.wd_stuff.journal = journal
+        statement = Statement('A statement')
+
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.add_new_claim('P509', statement, self.wd_page, None)
+            journal.record.assert_not_called()
+
+        self.mocks['edit_entity'].assert_called_once()
+        journal.record.assert_called_once_with(
+            '-1', 'P509', statement, self.wd_page.latest_revision_id,
+            ref=None)
+
+    def test_edit_session_no_journal_on_error(self):
+        journal = mock.Mock()
+        journal.is_done.return_value = False
+        self.wd_stuff.journal = journal
+
+        with self.assertRaises(ValueError):
+            with self.wd_stuff.edit_session(self.wd_page):
+                self.wd_stuff.add_new_claim(
+                    'P509', Statement('A statement'), self.wd_page, None)
+                raise ValueError('crash')
+        journal.record.assert_not_called()
+
+    def test_edit_session_no_save_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.wd_stuff.edit_session(self.wd_page):
+                self.wd_stuff.add_multiple_descriptions(
+                    {'fi': 'fi_desc'}, self.wd_page)
+                raise ValueError('crash')
+        self.mocks['edit_entity'].assert_not_called()
+        self.assertIsNone(self.wd_stuff.get_edit_session(self.wd_page))
+
+    def test_edit_session_closed_session_writes_directly(self):
+        with self.wd_stuff.edit_session(self.wd_page):
+            pass
+        self.wd_stuff.add_multiple_descriptions(
+            {'fi': 'fi_desc'}, self.wd_page)
+        self.mocks['edit_descriptions'].assert_called_once()
+
+    def test_edit_session_nested_session_raises_error(self):
+        with self.wd_stuff.edit_session(self.wd_page):
+            with self.assertRaises(pywikibot.Error):
+                with self.wd_stuff.edit_session(self.wd_page):
+                    pass
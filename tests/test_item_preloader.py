@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for ItemPreloader."""
+from __future__ import unicode_literals
+import json
+import mock
+import os
+import unittest
+
+import pywikibot
+
+from wikidatastuff.item_preloader import ItemPreloader
+
+
+class TestItemPreloader(unittest.TestCase):
+
+    """Test ItemPreloader."""
+
+    def setUp(self):
+        self.repo = pywikibot.Site('test', 'wikidata')
+        data_dir = os.path.join(os.path.split(__file__)[0], 'data')
+        with open(os.path.join(data_dir, 'Q27399.json')) as f:
+            self.entity = json.load(f).get('entities').get('Q27399')
+
+        request_patcher = mock.patch(
+            'wikidatastuff.item_preloader.pywikibot.data.api.Request')
+        self.mock_request = request_patcher.start()
+        self.mock_request.return_value.submit.side_effect = self.respond
+        self.addCleanup(request_patcher.stop)
+
+    def make_entity(self, qid):
+        entity = dict(self.entity)
+        entity['id'] = qid
+        entity['title'] = qid
+        return entity
+
+    def respond(self):
+        """Make a wbgetentities response for the last request."""
+        ids = self.mock_request.call_args[1]['parameters']['ids'].split('|')
+        entities = {}
+        for qid in ids:
+            if qid == 'Q404':
+                entities[qid] = {'id': qid, 'missing': ''}
+            elif qid == 'Q301':
+                entities[qid] = self.make_entity('Q302')
+                entities[qid]['redirects'] = {'from': 'Q301', 'to': 'Q302'}
+            else:
+                entities[qid] = self.make_entity(qid)
+        return {'entities': entities}
+
+    def test_item_preloader_bad_chunk_size(self):
+        with self.assertRaises(ValueError):
+            ItemPreloader(self.repo, chunk_size=51)
+
+    def test_item_preloader_fetch(self):
+        preloader = ItemPreloader(self.repo)
+        items = preloader.fetch(['Q1', 'Q404', 'Q301'])
+
+        self.mock_request.assert_called_once_with(
+            site=self.repo,
+            parameters={'action': 'wbgetentities', 'ids': 'Q1|Q404|Q301'})
+        self.assertEqual(items['Q1'].getID(), 'Q1')
+        self.assertIn('P174', items['Q1'].claims)
+        self.assertIsNone(items['Q404'])
+        self.assertEqual(items['Q301'].getID(), 'Q302')
+
+    def test_item_preloader_fetch_props_and_languages(self):
+        preloader = ItemPreloader(
+            self.repo, props=['claims', 'labels'], languages=['sv', 'en'])
+        preloader.fetch(['Q1'])
+
+        self.mock_request.assert_called_once_with(
+            site=self.repo,
+            parameters={
+                'action': 'wbgetentities',
+                'ids': 'Q1',
+                'props': 'info|claims|labels',
+                'languages': 'sv|en'})
+
+    def test_item_preloader_load(self):
+        preloader = ItemPreloader(self.repo)
+        item = pywikibot.ItemPage(self.repo, 'Q1')
+        preloader.load(item)
+        self.assertTrue(item.exists())
+        self.assertIn('P174', item.claims)
+
+    def test_item_preloader_load_missing(self):
+        preloader = ItemPreloader(self.repo)
+        item = pywikibot.ItemPage(self.repo, 'Q404')
+        preloader.load(item)
+        self.assertFalse(item.exists())
+
+    def test_item_preloader_preload(self):
+        entries = [('Q{}'.format(i), i) for i in range(1, 121)]
+        entries[3] = (4, 4)  # qid given as int
+        preloader = ItemPreloader(self.repo, max_chunks=1)
+        result = list(preloader.preload(iter(entries)))
+
+        self.assertEqual(self.mock_request.call_count, 3)
+        self.assertEqual(len(result), 120)
+        self.assertEqual(
+            [(item.getID(), payload) for item, payload in result],
+            [('Q{}'.format(i), i) for i in range(1, 121)])
+
+    def test_item_preloader_preload_error(self):
+        self.mock_request.return_value.submit.side_effect = \
+            pywikibot.Error('Crash')
+        preloader = ItemPreloader(self.repo)
+        with self.assertRaises(pywikibot.Error):
+            list(preloader.preload([('Q1', None)]))
+
+    def test_item_preloader_preload_stop_early(self):
+        entries = [('Q{}'.format(i), i) for i in range(1, 501)]
+        preloader = ItemPreloader(self.repo, chunk_size=10, max_chunks=1)
+        generator = preloader.preload(entries)
+        self.assertEqual(next(generator)[1], 1)
+        generator.close()
+        # at most the current, the queued and the one being put
+        self.assertLessEqual(self.mock_request.call_count, 3)
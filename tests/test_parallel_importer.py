@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for ParallelImporter."""
+from __future__ import unicode_literals
+import mock
+import threading
+import time
+import unittest
+
+import pywikibot
+
+from wikidatastuff.parallel_importer import ParallelImporter
+
+
+class TestParallelImporter(unittest.TestCase):
+
+    """Test ParallelImporter."""
+
+    def setUp(self):
+        self.wd_stuff = mock.Mock()
+        self.wd_stuff.q_to_itempage.side_effect = lambda qid: qid
+        self.importer = ParallelImporter(self.wd_stuff, num_workers=4)
+
+    def test_parallel_importer_bad_num_workers(self):
+        with self.assertRaises(ValueError):
+            ParallelImporter(self.wd_stuff, num_workers=0)
+
+    def test_parallel_importer_run(self):
+        entries = [(i, i * 2) for i in range(1, 21)]
+        results = self.importer.run(
+            iter(entries), lambda item, payload: (item, payload))
+
+        self.assertEqual(
+            results, [('Q{}'.format(i), i * 2) for i in range(1, 21)])
+        self.assertEqual(self.wd_stuff.load_item.call_count, 20)
+
+    def test_parallel_importer_one_worker_per_item(self):
+        lock = threading.Lock()
+        active = set()
+        overlaps = []
+        threads = set()
+
+        def process(item, payload):
+            with lock:
+                if item in active:
+                    overlaps.append(item)
+                active.add(item)
+                threads.add(threading.current_thread())
+            time.sleep(0.01)
+            with lock:
+                active.discard(item)
+
+        entries = [('Q1', i) for i in range(5)] + [('Q2', i) for i in range(5)]
+        self.importer.run(entries, process)
+
+        self.assertEqual(overlaps, [])
+        self.assertGreater(len(threads), 1)
+        self.assertEqual(self.importer._item_locks, {})
+
+    def test_parallel_importer_error(self):
+        def process(item, payload):
+            if payload == 3:
+                raise pywikibot.Error('Crash')
+            return payload
+
+        with self.assertRaises(pywikibot.Error):
+            self.importer.run([(i, i) for i in range(1, 10)], process)
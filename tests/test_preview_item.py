@@ -12,6 +12,11 @@ from wikidatastuff.preview_item import PreviewItem
 from wikidatastuff.qualifier import Qualifier  # replace with mocks
 from wikidatastuff.statement import Statement  # replace with mocks
 from wikidatastuff.reference import Reference  # replace with mocks
+from wikidatastuff.values import (
+    MonolingualTextValue,
+    QuantityValue,
+    TimeValue
+)
 
 
 class BasicFormatMocker(unittest.TestCase):
@@ -255,6 +260,19 @@ class TestFormatItis(BasicFormatMocker):
         self.mock_wd_template.assert_not_called()
         self.mock_format_timestring.assert_not_called()
 
+    def test_format_itis_values(self):
+        self.assertEqual(
+            PreviewItem.format_itis(QuantityValue('123', unit='Q123')),
+            '123 wd_template_1')
+        self.mock_wd_template.assert_called_once_with('Q123')
+        self.assertEqual(
+            PreviewItem.format_itis(TimeValue(2016, 11)),
+            '+2016-11-01T00:00:00Z')
+        self.assertEqual(
+            PreviewItem.format_itis(MonolingualTextValue('A text', 'sv')),
+            'A text (sv)')
+        self.mock_format_timestring.assert_not_called()
+
     def test_format_itis_quantity_unit(self):
         unit = pywikibot.ItemPage(self.repo, 'Q123')
         itis = pywikibot.WbQuantity(123, unit=unit, site=self.repo)
@@ -522,7 +540,7 @@ class TestFormatProtoclaims(TestPreviewItemBase):
     def test_format_protoclaims_single_with_qual(self):
         itis = Statement('dummy')
         qual = Qualifier('P321', 'qual_dummy')
-        itis._quals.add(qual)
+        itis.add_qualifier(qual)
         self.preview_item.protoclaims = {'P123': itis}
         expected = (
             "{| class='wikitable'\n"
@@ -546,8 +564,8 @@ class TestFormatProtoclaims(TestPreviewItemBase):
         itis = Statement('dummy')
         qual_1 = Qualifier('P321', 'qual_dummy')
         qual_2 = Qualifier('P213', 'qual_dummy')
-        itis._quals.add(qual_1)
-        itis._quals.add(qual_2)
+        itis.add_qualifier(qual_1)
+        itis.add_qualifier(qual_2)
         self.preview_item.protoclaims = {'P123': itis}
         expected = (
             "{| class='wikitable'\n"
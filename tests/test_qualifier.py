@@ -2,6 +2,7 @@
 # -*- coding: utf-8  -*-
 """Tests for WikidataStuff Qualifier."""
 from __future__ import unicode_literals
+import mock
 import unittest
 
 from wikidatastuff.qualifier import Qualifier
@@ -48,3 +49,52 @@ class TestQualifier(unittest.TestCase):
         self.assertEqual(
             repr(q),
             'WD.Qualifier(P123, foo)')
+
+    def test_qualifier_immutable(self):
+        q = Qualifier('P123', 'foo')
+        with self.assertRaises(AttributeError):
+            q.itis = 'bar'
+        with self.assertRaises(AttributeError):
+            q.new_attribute = 'bar'
+
+
+class TestQualifierOf(unittest.TestCase):
+
+    """Test Qualifier.of()."""
+
+    def setUp(self):
+        Qualifier.clear_cache()
+        self.addCleanup(Qualifier.clear_cache)
+
+    def test_qualifier_of_shared(self):
+        q_1 = Qualifier.of('P123', 'foo')
+        q_2 = Qualifier.of(123, 'foo')
+        self.assertIs(q_1, q_2)
+        self.assertEqual(q_1, Qualifier('P123', 'foo'))
+
+    def test_qualifier_of_different(self):
+        q_1 = Qualifier.of('P123', 'foo')
+        self.assertIsNot(q_1, Qualifier.of('P123', 'bar'))
+        self.assertIsNot(q_1, Qualifier.of('P124', 'foo'))
+
+    def test_qualifier_of_unkeyable_not_shared(self):
+        q_1 = Qualifier.of('P123', ['foo'])
+        q_2 = Qualifier.of('P123', ['foo'])
+        self.assertIsNot(q_1, q_2)
+        self.assertEqual(q_1, q_2)
+
+    def test_qualifier_of_same_key_different_target(self):
+        q_1 = Qualifier.of('P123', 'foo')
+        with mock.patch('wikidatastuff.qualifier.target_key',
+                        return_value=('value', 'foo')):
+            q_2 = Qualifier.of('P123', 'bar')
+        self.assertIsNot(q_1, q_2)
+        self.assertEqual(q_2.itis, 'bar')
+
+    def test_qualifier_of_bounded(self):
+        with mock.patch.object(Qualifier, 'MAX_CACHED', 2):
+            q_1 = Qualifier.of('P123', 'foo')
+            Qualifier.of('P123', 'bar')
+            Qualifier.of('P123', 'baz')
+            self.assertEqual(len(Qualifier._cache), 2)
+            self.assertIsNot(q_1, Qualifier.of('P123', 'foo'))
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for QueryCache."""
+from __future__ import unicode_literals
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from wikidatastuff.query_cache import QueryCache, normalise_query
+
+
+class TestNormaliseQuery(unittest.TestCase):
+
+    """Test the normalise_query method."""
+
+    def test_normalise_query_whitespace(self):
+        self.assertEqual(
+            normalise_query('  SELECT ?item\n\tWHERE {  ?item wdt:P31 wd:Q5 } '),
+            'SELECT ?item WHERE { ?item wdt:P31 wd:Q5 }')
+
+    def test_normalise_query_keeps_literals(self):
+        query = 'SELECT ?item WHERE {  ?item wdt:P1 "a  b" . ?item ?p  <x> }'
+        self.assertEqual(
+            normalise_query(query),
+            'SELECT ?item WHERE { ?item wdt:P1 "a  b" . ?item ?p <x> }')
+        self.assertNotEqual(
+            normalise_query('"a  b"'), normalise_query('"a b"'))
+
+
+class TestQueryCache(unittest.TestCase):
+
+    """Test the QueryCache class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.filename = os.path.join(self.tmp_dir, 'cache.sqlite')
+        self.cache = QueryCache(self.filename)
+        self.addCleanup(self.cache.close)
+
+    def test_query_cache_make_key(self):
+        self.assertEqual(
+            QueryCache.make_key('endpoint', 'SELECT  ?a'),
+            QueryCache.make_key('endpoint', 'SELECT ?a\n'))
+        self.assertNotEqual(
+            QueryCache.make_key('endpoint', 'SELECT ?a'),
+            QueryCache.make_key('other_endpoint', 'SELECT ?a'))
+        self.assertNotEqual(
+            QueryCache.make_key('endpoint', 'SELECT ?a'),
+            QueryCache.make_key('endpoint', 'SELECT ?a', 'tsv'))
+
+    def test_query_cache_get_set(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', '{"å": 1}')
+        self.assertEqual(self.cache.get('key'), '{"å": 1}')
+        self.assertEqual(len(self.cache), 1)
+
+    def test_query_cache_persists(self):
+        self.cache.set('key', 'text')
+        self.cache.close()
+        self.cache = QueryCache(self.filename)
+        self.assertEqual(self.cache.get('key'), 'text')
+
+    @mock.patch('wikidatastuff.query_cache.time.time')
+    def test_query_cache_ttl(self, mock_time):
+        mock_time.return_value = 1000
+        self.cache.set('key', 'text')
+        mock_time.return_value = 1100
+        self.assertEqual(self.cache.get('key'), 'text')
+        self.assertIsNone(self.cache.get('key', ttl=50))
+        self.cache.ttl = 50
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', ttl=200), 'text')
+
+    @mock.patch('wikidatastuff.query_cache.time.time')
+    def test_query_cache_lru_eviction(self, mock_time):
+        text = ''.join(  # poorly compressible
+            hashlib.sha1(str(i).encode('utf-8')).hexdigest()
+            for i in range(20))
+        mock_time.return_value = 1
+        self.cache.set('a', text + 'a')
+        size = self.cache._db.execute(
+            'SELECT size FROM results').fetchone()[0]
+        self.cache.max_size = 2 * size + 10
+        mock_time.return_value = 2
+        self.cache.set('b', text + 'b')
+        mock_time.return_value = 3
+        self.cache.get('a')  # b is now the least recently used
+        mock_time.return_value = 4
+        self.cache.set('c', text + 'c')
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_query_cache_clear(self):
+        self.cache.set('key', 'text')
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for RedirectCache."""
+from __future__ import unicode_literals
+import mock
+import unittest
+
+from wikidatastuff.redirect_cache import RedirectCache
+
+
+class TestRedirectCache(unittest.TestCase):
+
+    """Test RedirectCache."""
+
+    def setUp(self):
+        self.cache = RedirectCache(max_size=3, ttl=10)
+        self.repo = mock.Mock()
+
+        time_patcher = mock.patch(
+            'wikidatastuff.redirect_cache.time.time')
+        self.mock_time = time_patcher.start()
+        self.mock_time.return_value = 100
+        self.addCleanup(time_patcher.stop)
+
+        fetch_patcher = mock.patch(
+            'wikidatastuff.redirect_cache.RedirectCache._fetch')
+        self.mock_fetch = fetch_patcher.start()
+        self.mock_fetch.return_value = {}
+        self.addCleanup(fetch_patcher.stop)
+
+    def test_redirect_cache_get_unknown(self):
+        self.assertIsNone(self.cache.get('Q1'))
+
+    def test_redirect_cache_get_set(self):
+        self.cache.set('Q1', 'Q2')
+        self.cache.set('Q3', 'Q3')
+        self.assertEqual(self.cache.get('Q1'), 'Q2')
+        self.assertEqual(self.cache.get('Q3'), 'Q3')
+
+    def test_redirect_cache_ttl(self):
+        self.cache.set('Q1', 'Q2')
+        self.mock_time.return_value = 111
+        self.assertIsNone(self.cache.get('Q1'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_redirect_cache_size_bound_drops_least_recently_used(self):
+        self.cache.set('Q1', 'Q1')
+        self.cache.set('Q2', 'Q2')
+        self.cache.set('Q3', 'Q3')
+        self.cache.get('Q1')
+        self.cache.set('Q4', 'Q4')
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get('Q2'))
+        self.assertEqual(self.cache.get('Q1'), 'Q1')
+
+    def test_redirect_cache_resolve_only_unknown(self):
+        self.cache.set('Q1', 'Q2')
+        self.mock_fetch.return_value = {'Q3': 'Q4'}
+        result = self.cache.resolve(self.repo, ['Q1', 'Q3', 'Q5', 'Q3'])
+        self.assertEqual(result, {'Q1': 'Q2', 'Q3': 'Q4', 'Q5': 'Q5'})
+        self.mock_fetch.assert_called_once_with(self.repo, ['Q3', 'Q5'])
+        self.assertEqual(self.cache.get('Q5'), 'Q5')
+
+    def test_redirect_cache_resolve_in_chunks(self):
+        self.cache.max_size = 200
+        qids = ['Q{}'.format(i) for i in range(1, 121)]
+        self.cache.resolve(self.repo, qids)
+        self.assertEqual(
+            [len(c[0][1]) for c in self.mock_fetch.call_args_list],
+            [50, 50, 20])
+
+
+class TestRedirectCacheFetch(unittest.TestCase):
+
+    """Test RedirectCache._fetch()."""
+
+    def test_redirect_cache_fetch(self):
+        repo = mock.Mock()
+        data = {
+            'entities': {
+                'Q1': {
+                    'id': 'Q2', 'type': 'item',
+                    'redirects': {'from': 'Q1', 'to': 'Q2'}},
+                'Q3': {'id': 'Q3', 'type': 'item'},
+                'Q5': {'id': 'Q5', 'missing': ''}
+            }
+        }
+        with mock.patch('wikidatastuff.redirect_cache.pywikibot.data.api.'
+                        'Request') as mock_request:
+            mock_request.return_value.submit.return_value = data
+            result = RedirectCache._fetch(repo, ['Q1', 'Q3', 'Q5'])
+            mock_request.assert_called_once_with(
+                site=repo,
+                parameters={
+                    'action': 'wbgetentities',
+                    'ids': 'Q1|Q3|Q5',
+                    'props': 'info'})
+        self.assertEqual(result, {'Q1': 'Q2'})
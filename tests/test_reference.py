@@ -10,7 +10,9 @@ from pywikibot import (
     Claim as Claim
 )
 
+from wikidatastuff.qualifier import Qualifier
 from wikidatastuff.reference import Reference
+from wikidatastuff.values import StringValue
 
 
 class TestReference(unittest.TestCase):
@@ -88,3 +90,36 @@ class TestReference(unittest.TestCase):
             'WD.Reference('
             'test: [WD.Claim(P55: foo)], '
             'no_test: [WD.Claim(P55: bar)])')
+
+    def test_reference_equality(self):
+        r = Reference(self.ref_1, self.ref_2)
+        r_same = Reference(self.ref_1.copy(), self.ref_2.copy())
+        self.assertEqual(r, r_same)
+        self.assertEqual(hash(r), hash(r_same))
+        self.assertNotEqual(r, Reference(self.ref_1))
+        self.assertNotEqual(r, Reference(self.ref_2, self.ref_1))
+
+    def test_reference_equality_source_order(self):
+        r_1 = Reference([self.ref_1, self.ref_2])
+        r_2 = Reference([self.ref_2, self.ref_1])
+        self.assertEqual(r_1, r_2)
+        self.assertEqual(len(set([r_1, r_2])), 1)
+
+    def test_reference_intern(self):
+        r_1 = Reference.intern(self.ref_1, self.ref_2)
+        r_2 = Reference.intern(self.ref_1.copy(), self.ref_2.copy())
+        r_3 = Reference.intern(self.ref_1)
+        self.assertIs(r_1, r_2)
+        self.assertIsNot(r_1, r_3)
+
+    def test_reference_qualifier_sources(self):
+        r = Reference(
+            Qualifier('P55', StringValue('foo')), Qualifier('P55', 'bar'))
+        self.assertEqual(
+            Reference.get_snak(r.source_test[0]),
+            ('P55', 'value', StringValue('foo')))
+        self.assertEqual(
+            r.canonical_key(),
+            Reference(self.ref_1, self.ref_2).canonical_key())
+        self.assertEqual(r, Reference(
+            Qualifier('P55', StringValue('foo')), Qualifier('P55', 'bar')))
@@ -2,6 +2,7 @@
 # -*- coding: utf-8  -*-
 """Tests for WikidataStuff Statement."""
 from __future__ import unicode_literals
+import pickle
 import unittest
 
 from pywikibot import (
@@ -13,6 +14,7 @@ from pywikibot import (
 from wikidatastuff.statement import Statement
 from wikidatastuff.qualifier import Qualifier  # replace with mocks
 from wikidatastuff.reference import Reference  # replace with mocks
+from wikidatastuff.values import ItemValue, TimeValue
 
 
 class TestStatement(unittest.TestCase):
@@ -84,6 +86,30 @@ class TestStatement(unittest.TestCase):
         self.assertEqual(s._quals, set([self.q_1, self.q_2]))
         self.assertEqual(s, s)
 
+    def test_statement_quals_cached(self):
+        s = Statement('foo').add_qualifier(self.q_1)
+        self.assertIs(s.quals, s.quals)
+        s.add_qualifier(self.q_2)
+        self.assertEqual(set(s.quals), set([self.q_1, self.q_2]))
+
+    def test_statement_hash_follows_changes(self):
+        s = Statement('foo')
+        s_quals = Statement('foo').add_qualifier(self.q_1)
+        s_force = Statement('foo')
+        hash(s_quals)
+        hash(s_force)
+        s.add_qualifier(self.q_1)
+        s_force.force = True
+        self.assertEqual(hash(s), hash(s_quals))
+        self.assertNotEqual(s, s_force)
+
+    def test_statement_immutable_value(self):
+        s = Statement('foo')
+        with self.assertRaises(AttributeError):
+            s.itis = 'bar'
+        with self.assertRaises(AttributeError):
+            s.new_attribute = 'bar'
+
     def test_statement_none_qualifier(self):
         s = Statement('foo')
         s.add_qualifier(None)
@@ -113,11 +139,26 @@ class TestStatement(unittest.TestCase):
         s.add_qualifier(self.q_1)
         self.assertEqual(s.quals, [self.q_1])
 
+    def test_statement_qualifier_keys(self):
+        s = Statement('foo')
+        self.assertEqual(s.qualifier_keys(), {})
+        s.add_qualifier(self.q_1).add_qualifier(self.q_2)
+        self.assertEqual(
+            s.qualifier_keys(),
+            {('P123', ('value', 'foo')): 1, ('P123', ('value', 'bar')): 1})
+
     def test_statement_add_reference(self):
         s = Statement('foo')
         s.add_reference(self.ref)
         self.assertEqual(s.ref, self.ref)
 
+    def test_statement_equality_reference(self):
+        claim = self.ref.source_test[0].copy()
+        s_1 = Statement('foo').add_reference(self.ref)
+        s_2 = Statement('foo').add_reference(Reference(source_test=claim))
+        self.assertEqual(s_1, s_2)
+        self.assertEqual(len(set([s_1, s_2])), 1)
+
     def test_statement_add_chained_reference(self):
         s = Statement('foo').add_reference(self.ref)
         self.assertEqual(s.ref, self.ref)
@@ -159,3 +200,32 @@ class TestStatement(unittest.TestCase):
             'itis:foo, quals:[WD.Qualifier(P123, foo)], '
             'ref:WD.Reference(test: [WD.Claim(P55: foo)], no_test: []), '
             'special:False, force:False)')
+
+    def test_statement_fingerprint(self):
+        s_1 = Statement('foo').add_qualifier(self.q_1).add_qualifier(self.q_2)
+        s_2 = Statement('foo').add_qualifier(self.q_2).add_qualifier(self.q_1)
+        s_3 = Statement('foo').add_qualifier(self.q_1)
+        self.assertEqual(s_1.fingerprint(), s_2.fingerprint())
+        self.assertNotEqual(s_1.fingerprint(), s_3.fingerprint())
+
+    def test_statement_fingerprint_ignores_force(self):
+        s = Statement('foo')
+        s_force = Statement('foo')
+        s_force.force = True
+        self.assertEqual(s.fingerprint(), s_force.fingerprint())
+
+    def test_statement_fingerprint_reference(self):
+        s = Statement('foo')
+        s_ref = Statement('foo').add_reference(self.ref)
+        self.assertNotEqual(s.fingerprint(), s_ref.fingerprint())
+        self.assertEqual(
+            s_ref.fingerprint(),
+            Statement('foo').add_reference(self.ref).fingerprint())
+
+    def test_statement_pickle_values(self):
+        s = Statement(ItemValue('Q5')).add_qualifier(
+            Qualifier('P580', TimeValue(2000))).add_reference(
+                Reference(Qualifier('P248', ItemValue('Q1'))))
+        result = pickle.loads(pickle.dumps(s, 2))
+        self.assertEqual(result, s)
+        self.assertEqual(result.fingerprint(), s.fingerprint())
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for StatementTable."""
+from __future__ import unicode_literals
+import mock
+import unittest
+
+import pywikibot
+
+from wikidatastuff.qualifier import Qualifier
+from wikidatastuff.reference import Reference
+from wikidatastuff.statement import Statement
+from wikidatastuff import statement_table
+from wikidatastuff.statement_table import StatementTable
+
+
+class TestStatementTable(unittest.TestCase):
+
+    """Test StatementTable."""
+
+    def setUp(self):
+        self.repo = pywikibot.Site('test', 'wikidata')
+        self.table = StatementTable(self.repo)
+        ref_claim = pywikibot.Claim(self.repo, 'P55')
+        ref_claim.setTarget('foo')
+        self.ref = Reference(source_test=ref_claim)
+        self.qual = Qualifier('P123', 'foo')
+
+    def make_statements(self):
+        """Return a list of various (qid, prop, statement) rows."""
+        return [
+            ('Q2', 'P84', Statement(pywikibot.ItemPage(self.repo, 'Q5'))),
+            ('Q1', 'P174', Statement('a string').add_qualifier(self.qual)),
+            ('Q2', 'P74', Statement(pywikibot.WbTime(
+                year=2016, month=11, day=22, site=self.repo)).add_reference(
+                    self.ref)),
+            ('Q2', 'P74', Statement(pywikibot.WbTime(
+                year=1800, precision='year', site=self.repo))),
+            ('Q2', 'P74', Statement(pywikibot.WbTime(
+                year=2016, month=11, day=22, hour=10, site=self.repo))),
+            ('Q1', 'P664', Statement('novalue', special=True)),
+            ('Q3', 'P174', Statement('a string').add_reference(self.ref)),
+        ]
+
+    def test_statement_table_empty(self):
+        self.assertEqual(len(self.table), 0)
+        self.assertEqual(list(self.table.iter_items()), [])
+
+    def test_statement_table_round_trip(self):
+        rows = self.make_statements()
+        for qid, prop, statement in rows:
+            self.table.add_statement(qid, prop, statement)
+        self.assertEqual(len(self.table), len(rows))
+        for row, (qid, prop, statement) in enumerate(rows):
+            self.assertEqual(self.table.statement(row), statement)
+
+    def test_statement_table_force(self):
+        statement = Statement('a string').add_qualifier(self.qual, force=True)
+        self.table.add_statement('Q1', 'P174', statement)
+        self.assertTrue(self.table.statement(0).force)
+        self.assertEqual(self.table.statement(0), statement)
+
+    def test_statement_table_compact_columns(self):
+        for qid, prop, statement in self.make_statements():
+            self.table.add_statement(qid, prop, statement)
+        self.assertEqual(list(self.table.items), [2, 1, 2, 2, 2, 1, 3])
+        self.assertEqual(
+            list(self.table.props), [84, 174, 74, 74, 74, 664, 174])
+        self.assertEqual(self.table.values[0], 5)
+        self.assertEqual(self.table.kinds[2], StatementTable.DATE)
+        self.assertEqual(self.table.values[2], 2016112211)
+        # a date with a time is stored as is
+        self.assertEqual(self.table.kinds[4], StatementTable.OBJECT)
+        # shared values, qualifier groups and references are stored once
+        self.assertEqual(self.table.values[1], self.table.values[6])
+        self.assertEqual(len(self.table._refs), 1)
+        self.assertEqual(list(self.table.qual_groups), [-1, 0, -1, -1, -1, -1, -1])
+
+    def test_statement_table_iter_items(self):
+        for qid, prop, statement in self.make_statements():
+            self.table.add_statement(qid, prop, statement)
+        result = list(self.table.iter_items())
+        self.assertEqual([qid for qid, protoclaims in result], ['Q1', 'Q2', 'Q3'])
+        qid, protoclaims = result[1]
+        self.assertEqual(sorted(protoclaims.keys()), ['P74', 'P84'])
+        self.assertEqual(len(protoclaims['P74']), 3)
+        self.assertEqual(
+            protoclaims['P74'][0].itis,
+            pywikibot.WbTime(year=2016, month=11, day=22, site=self.repo))
+
+    def test_statement_table_iter_items_without_numpy(self):
+        for qid, prop, statement in self.make_statements():
+            self.table.add_statement(qid, prop, statement)
+        with mock.patch.object(statement_table, 'numpy', None):
+            self.assertEqual(self.table.item_order(), [1, 5, 0, 2, 3, 4, 6])
+
+    def test_statement_table_fingerprint(self):
+        rows = self.make_statements() + [
+            ('Q2', 'P74', Statement(pywikibot.WbTime(
+                year=1995, precision='decade', site=self.repo))),
+            ('Q2', 'P74', Statement(pywikibot.WbTime(
+                year=1950, precision='century', site=self.repo))),
+            ('Q2', 'P74', Statement(pywikibot.WbTime(
+                year=-1950, precision='century', site=self.repo)))]
+        for qid, prop, statement in rows:
+            self.table.add_statement(qid, prop, statement)
+        for row, (qid, prop, statement) in enumerate(rows):
+            self.assertEqual(
+                self.table.fingerprint(row), statement.fingerprint())
+            self.assertEqual(
+                self.table.fingerprint(row),
+                self.table.statement(row).fingerprint())
+
+    def test_statement_table_bad_special(self):
+        with self.assertRaises(pywikibot.Error):
+            self.table.add('Q1', 'P1', 'foo', special=True)
+        self.assertEqual(len(self.table), 0)
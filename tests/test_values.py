@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for the lightweight values."""
+from __future__ import unicode_literals
+from decimal import Decimal
+import pickle
+import unittest
+
+import pywikibot
+
+from wikidatastuff.entity_id import ItemId
+from wikidatastuff.helpers import target_key
+from wikidatastuff.values import (
+    ItemValue,
+    MonolingualTextValue,
+    QuantityValue,
+    StringValue,
+    TimeValue,
+    to_pywikibot
+)
+
+
+class TestValues(unittest.TestCase):
+
+    """Test the lightweight values."""
+
+    def setUp(self):
+        self.repo = pywikibot.Site('test', 'wikidata')
+        self.values = [
+            ItemValue('Q42'),
+            TimeValue(2016, 11, 22),
+            TimeValue(-1995, precision='decade'),
+            TimeValue(1900, precision='century'),
+            TimeValue(-1901, precision='century'),
+            QuantityValue('4.2', error=('0.1', '0.2')),
+            MonolingualTextValue('A text', 'sv'),
+            StringValue('A string')]
+
+    def test_values_pickle(self):
+        for value in self.values:
+            result = pickle.loads(pickle.dumps(value, 2))
+            self.assertEqual(result, value)
+            self.assertEqual(hash(result), hash(value))
+            self.assertIs(type(result), type(value))
+
+    def test_values_share_key_with_pywikibot(self):
+        for value in self.values:
+            self.assertEqual(
+                target_key(value),
+                target_key(value.to_pywikibot(self.repo)))
+
+    def test_quantity_value_unit_key_independent_of_repo(self):
+        quantity = pywikibot.WbQuantity(
+            amount='4.2', unit='http://test.wikidata.org/entity/Q11573',
+            site=self.repo)
+        self.assertEqual(
+            target_key(QuantityValue('4.2', unit='Q11573')),
+            target_key(quantity))
+
+    def test_values_of_different_types_not_equal(self):
+        self.assertNotEqual(ItemValue('Q42'), (ItemId(42), ))
+        self.assertNotEqual(StringValue('sv'), ('sv', ))
+        self.assertEqual(ItemValue(42), ItemValue('wd:Q42'))
+
+    def test_to_pywikibot(self):
+        self.assertEqual(to_pywikibot('A string', self.repo), 'A string')
+        self.assertEqual(
+            to_pywikibot(ItemValue('Q42'), self.repo),
+            pywikibot.ItemPage(self.repo, 'Q42'))
+        self.assertEqual(
+            to_pywikibot(MonolingualTextValue('A text', 'sv'), self.repo),
+            pywikibot.WbMonolingualText('A text', 'sv'))
+
+    def test_item_value(self):
+        value = ItemValue('http://www.wikidata.org/entity/Q42')
+        self.assertEqual(value.id, ItemId(42))
+        self.assertEqual(repr(value), 'ItemValue(Q42)')
+        with self.assertRaises(ValueError):
+            ItemValue('P42')
+
+    def test_time_value_precision(self):
+        self.assertEqual(TimeValue(2016).precision, 9)
+        self.assertEqual(TimeValue(2016, 11).precision, 10)
+        self.assertEqual(TimeValue(2016, 11, 22).precision, 11)
+        self.assertEqual(TimeValue(2016, 11, 22, precision='year').precision,
+                         9)
+        with self.assertRaises(ValueError):
+            TimeValue(2016, precision='fortnight')
+
+    def test_time_value_to_pywikibot(self):
+        value = TimeValue(2016, 11, precision='month')
+        self.assertEqual(
+            value.to_pywikibot(self.repo),
+            pywikibot.WbTime(
+                year=2016, month=11, precision='month',
+                calendarmodel='http://www.wikidata.org/entity/Q1985727',
+                site=self.repo))
+        self.assertEqual(value.to_timestr(), '+2016-11-01T00:00:00Z')
+
+    def test_quantity_value(self):
+        value = QuantityValue(4.2, unit='Q11573', error='0.1')
+        self.assertEqual(value.amount, Decimal('4.2'))
+        self.assertEqual(value.unit, ItemId(11573))
+        self.assertEqual(value.error, Decimal('0.1'))
+        result = value.to_pywikibot(self.repo)
+        self.assertEqual(result.amount, Decimal('4.2'))
+        self.assertEqual(result.upperBound, Decimal('4.3'))
+        self.assertEqual(result.get_unit_item().id, 'Q11573')
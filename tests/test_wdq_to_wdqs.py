@@ -286,6 +286,12 @@ class TestMakeClaimWdqsSearch(unittest.TestCase):
         self.mock_select_wdqs_query.assert_called_once_with(
             'claim_sparql', 'item', None, 'qual_sparql', ['P1', 'P2'], True)
 
+    def test_make_claim_wdqs_search_cache_options_passed_on(self):
+        make_claim_wdqs_search('P123', ttl=3600, bypass_cache=True)
+        self.mock_select_wdqs_query.assert_called_once_with(
+            'claim_sparql', 'item', None, None, None, False, ttl=3600,
+            bypass_cache=True)
+
     def test_make_claim_wdqs_search_illegal_combo(self):
         with self.assertRaises(pywikibot.Error):
             make_claim_wdqs_search(
@@ -412,6 +418,7 @@ class TestSanitizeToWdqResult(unittest.TestCase):
         expected = [123, 456]
         result = sanitize_to_wdq_result(data)
         self.assertEqual(result, expected)
+        self.assertEqual(result[0].id, 'Q123')
 
     def test_sanitize_to_wdq_result_other_type_raises_error(self):
         data = 'Q123'
@@ -2,13 +2,24 @@
 """Unit tests for WDQS lookup."""
 from __future__ import unicode_literals
 
+import json
 import unittest
 import mock
 
 import pywikibot
 
+from wikidatastuff.entity_id import ItemId, PropertyId
+from wikidatastuff.query_cache import QueryCache
+from wikidatastuff import wdqs_lookup
 from wikidatastuff.wdqs_lookup import (
+    WdqsClient,
+    iter_json_results,
+    iter_tsv_results,
+    iter_wdqs_query,
+    make_simple_wdqs_query,
     make_sparql_triple,
+    make_values_sparql,
+    make_values_wdqs_query,
     make_select_wdqs_query,
     list_of_dict_to_list,
     list_of_dict_to_dict,
@@ -69,6 +80,350 @@ class TestMakeSparqlTriple(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TestWdqsClient(unittest.TestCase):
+
+    """Test the WdqsClient class."""
+
+    def setUp(self):
+        self.client = WdqsClient(pool_size=4, user_agent='test_agent')
+        patcher = mock.patch.object(self.client.session, 'get')
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_wdqs_client_session_setup(self):
+        headers = self.client.session.headers
+        self.assertEqual(headers['User-Agent'], 'test_agent')
+        self.assertIn('gzip', headers['Accept-Encoding'])
+        adapter = self.client.session.get_adapter(wdqs_lookup.ENDPOINT)
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    def test_wdqs_client_query(self):
+        self.mock_get.return_value.text = '{"a": "json_reply"}'
+        self.assertEqual(self.client.query('a_query'), {'a': 'json_reply'})
+        self.mock_get.assert_called_once_with(
+            wdqs_lookup.ENDPOINT,
+            params={'format': 'json', 'query': 'a_query'},
+            headers={'Accept': 'application/sparql-results+json'},
+            timeout=self.client.timeout)
+        self.mock_get.return_value.raise_for_status.assert_called_once_with()
+
+    def test_wdqs_client_query_cache(self):
+        self.client.cache = QueryCache(':memory:')
+        self.mock_get.return_value.text = '{"a": 1}'
+        self.assertEqual(self.client.query('a_query'), {'a': 1})
+        self.mock_get.return_value.text = '{"a": 2}'
+        self.assertEqual(self.client.query('a_query  '), {'a': 1})
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertEqual(
+            self.client.query('a_query', bypass_cache=True), {'a': 2})
+        self.assertEqual(self.client.query('a_query'), {'a': 2})
+        self.assertEqual(self.client.query('a_query', ttl=-1), {'a': 2})
+        self.assertEqual(self.mock_get.call_count, 3)
+
+    def test_wdqs_client_query_post_long(self):
+        self.client.max_get_length = 20
+        self.mock_get.return_value.text = '{}'
+        with mock.patch.object(self.client.session, 'post') as mock_post:
+            mock_post.return_value.text = '{}'
+            self.client.query('a_query')
+            self.mock_get.assert_called_once()
+            mock_post.assert_not_called()
+            self.client.query('a very long query')
+            self.assertEqual(self.mock_get.call_count, 1)
+            mock_post.assert_called_once_with(
+                wdqs_lookup.ENDPOINT,
+                params={'format': 'json'},
+                data={'query': 'a very long query'},
+                headers={'Accept': 'application/sparql-results+json'},
+                timeout=self.client.timeout)
+
+    def test_wdqs_client_get_timeout(self):
+        self.client.get('an_url', timeout=5)
+        self.mock_get.assert_called_once_with('an_url', timeout=5)
+
+
+class TestIterJsonResults(unittest.TestCase):
+
+    """Test the iter_json_results method."""
+
+    def setUp(self):
+        self.text = json.dumps({
+            'head': {'vars': ['item', 'bindings']},
+            'results': {'bindings': [
+                {'item': {'type': 'uri', 'value': 'wd:Q1'},
+                 'bindings': {'type': 'literal', 'value': 'f{o}o]'}},
+                {'item': {'type': 'uri', 'value': 'wd:Q2'}}]}}, indent=1)
+        self.expected = [
+            {'item': 'wd:Q1', 'bindings': 'f{o}o]'},
+            {'item': 'wd:Q2', 'bindings': None}]
+
+    def test_iter_json_results_single_chunk(self):
+        self.assertEqual(list(iter_json_results([self.text])), self.expected)
+
+    def test_iter_json_results_any_chunking(self):
+        for size in (1, 2, 7, 50):
+            chunks = [self.text[i:i + size]
+                      for i in range(0, len(self.text), size)]
+            self.assertEqual(
+                list(iter_json_results(chunks)), self.expected)
+
+    def test_iter_json_results_no_rows(self):
+        text = '{"head": {"vars": ["item"]}, "results": {"bindings": []}}'
+        self.assertEqual(list(iter_json_results([text])), [])
+
+    def test_iter_json_results_truncated(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_results([self.text[:-30]]))
+        with self.assertRaises(ValueError):
+            list(iter_json_results(['{"head": {"vars": ["item"]}}']))
+
+
+class TestIterTsvResults(unittest.TestCase):
+
+    """Test the iter_tsv_results method."""
+
+    def setUp(self):
+        self.json_text = json.dumps({
+            'head': {'vars': ['item', 'value']},
+            'results': {'bindings': [
+                {'item': {'type': 'uri',
+                          'value': 'http://www.wikidata.org/entity/Q1'},
+                 'value': {'type': 'literal', 'value': 'a\tb "c"\n\\ å'}},
+                {'item': {'type': 'uri',
+                          'value': 'http://www.wikidata.org/entity/Q2'},
+                 'value': {'type': 'literal', 'value': 'text',
+                           'xml:lang': 'sv'}},
+                {'item': {'type': 'bnode', 'value': 'b0'},
+                 'value': {'type': 'literal', 'value': '42',
+                           'datatype': 'http://www.w3.org/2001/'
+                                       'XMLSchema#integer'}},
+                {'item': {'type': 'uri',
+                          'value': 'http://www.wikidata.org/entity/Q3'},
+                 'value': {'type': 'literal', 'value': ''}},
+                {'item': {'type': 'uri',
+                          'value': 'http://www.wikidata.org/entity/Q4'}}]}})
+        self.tsv_text = (
+            '?item\t?value\n'
+            '<http://www.wikidata.org/entity/Q1>\t"a\\tb \\"c\\"\\n\\\\ '
+            '\\u00e5"\n'
+            '<http://www.wikidata.org/entity/Q2>\t"text"@sv\n'
+            '_:b0\t"42"^^<http://www.w3.org/2001/XMLSchema#integer>\n'
+            '<http://www.wikidata.org/entity/Q3>\t""\n'
+            '<http://www.wikidata.org/entity/Q4>\t\n')
+
+    def test_iter_tsv_results_same_as_json(self):
+        self.assertEqual(
+            list(iter_tsv_results([self.tsv_text])),
+            list(iter_json_results([self.json_text])))
+
+    def test_iter_tsv_results_any_chunking(self):
+        expected = list(iter_tsv_results([self.tsv_text]))
+        for size in (1, 3, 40):
+            chunks = [self.tsv_text[i:i + size]
+                      for i in range(0, len(self.tsv_text), size)]
+            self.assertEqual(list(iter_tsv_results(chunks)), expected)
+
+    def test_iter_tsv_results_abbreviated_and_unbound(self):
+        text = '?item\t?count\r\n\t42\r\n<x>\t\r\n'
+        self.assertEqual(
+            list(iter_tsv_results([text])),
+            [{'item': None, 'count': '42'}, {'item': 'x', 'count': None}])
+
+    def test_iter_tsv_results_single_unbound_variable(self):
+        self.assertEqual(
+            list(iter_tsv_results(['?item\n\n<x>\n'])),
+            [{'item': None}, {'item': 'x'}])
+
+    def test_iter_tsv_results_processed_same_as_json(self):
+        json_result = process_query_results(
+            iter_json_results([self.json_text]), 'item', 'dict', 'value')
+        tsv_result = process_query_results(
+            iter_tsv_results([self.tsv_text]), 'item', 'dict', 'value')
+        self.assertEqual(tsv_result, json_result)
+
+    def test_iter_tsv_results_malformed(self):
+        with self.assertRaises(ValueError):
+            list(iter_tsv_results(['?item\t?value\n<x>\n']))
+        with self.assertRaises(ValueError):
+            list(iter_tsv_results([]))
+
+
+class TestWdqsClientIterQuery(unittest.TestCase):
+
+    """Test the WdqsClient.iter_query method."""
+
+    def setUp(self):
+        self.client = WdqsClient()
+        patcher = mock.patch.object(self.client.session, 'get')
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.text = json.dumps({
+            'head': {'vars': ['item']},
+            'results': {'bindings': [
+                {'item': {'type': 'uri', 'value': 'wd:Q1'}}]}})
+        response = self.mock_get.return_value
+        response.encoding = None
+        response.iter_content.return_value = iter(
+            [self.text[:20], self.text[20:]])
+
+    def test_wdqs_client_iter_query(self):
+        self.assertEqual(
+            list(self.client.iter_query('a_query')), [{'item': 'wd:Q1'}])
+        self.assertEqual(self.mock_get.call_args[1]['stream'], True)
+        response = self.mock_get.return_value
+        response.iter_content.assert_called_once_with(
+            wdqs_lookup.STREAM_CHUNK_SIZE, decode_unicode=True)
+        self.assertEqual(response.encoding, 'utf-8')
+        response.close.assert_called_once_with()
+
+    def test_wdqs_client_iter_query_tsv(self):
+        response = self.mock_get.return_value
+        response.iter_content.return_value = iter(['?item\n<wd:Q1>\n'])
+        self.client.cache = QueryCache(':memory:')
+        self.client.transport = 'tsv'
+        self.assertEqual(
+            list(self.client.iter_query('a_query')), [{'item': 'wd:Q1'}])
+        self.mock_get.assert_called_once_with(
+            wdqs_lookup.ENDPOINT, params={'query': 'a_query'},
+            headers={'Accept': 'text/tab-separated-values'},
+            timeout=self.client.timeout, stream=True)
+        # cached separately from the json response
+        response.iter_content.return_value = iter(
+            [self.text[:20], self.text[20:]])
+        self.assertEqual(
+            list(self.client.iter_query('a_query', transport='json')),
+            [{'item': 'wd:Q1'}])
+        self.assertEqual(self.mock_get.call_count, 2)
+        self.assertEqual(
+            list(self.client.iter_query('a_query')), [{'item': 'wd:Q1'}])
+        self.assertEqual(self.mock_get.call_count, 2)
+
+    def test_wdqs_client_unknown_transport(self):
+        with self.assertRaises(pywikibot.Error):
+            WdqsClient(transport='xml')
+        with self.assertRaises(pywikibot.Error):
+            list(self.client.iter_query('a_query', transport='xml'))
+
+    def test_wdqs_client_iter_query_cache(self):
+        self.client.cache = QueryCache(':memory:')
+        list(self.client.iter_query('a_query'))
+        self.assertEqual(
+            list(self.client.iter_query('a_query')), [{'item': 'wd:Q1'}])
+        self.mock_get.assert_called_once()
+        self.assertEqual(self.client.query('a_query'), json.loads(self.text))
+
+
+class TestIterWdqsQuery(unittest.TestCase):
+
+    """Test the iter_wdqs_query method."""
+
+    def test_iter_wdqs_query(self):
+        client = mock.MagicMock()
+        client.iter_query.return_value = iter([{'item': 'wd:Q1'}])
+        result = iter_wdqs_query('a_query', client=client)
+        client.iter_query.assert_not_called()  # lazy
+        self.assertEqual(list(result), [{'item': 'wd:Q1'}])
+        client.iter_query.assert_called_once_with(
+            wdqs_lookup.PREFIXES + 'a_query', ttl=None, bypass_cache=False)
+
+    def test_iter_wdqs_query_error(self):
+        client = mock.MagicMock()
+        client.iter_query.side_effect = ValueError('The response was '
+                                                   'truncated.')
+        with self.assertRaises(pywikibot.Error):
+            list(iter_wdqs_query('a_query', client=client))
+
+
+class TestMakeSimpleWdqsQuery(unittest.TestCase):
+
+    """Test the make_simple_wdqs_query method."""
+
+    def setUp(self):
+        patcher = mock.patch('wikidatastuff.wdqs_lookup.default_client')
+        self.mock_client = patcher.start()
+        self.mock_client.query.return_value = {
+            'head': {'vars': ['item', 'value']},
+            'results': {'bindings': [
+                {'item': {'type': 'uri', 'value': 'wd:Q1'},
+                 'value': {'type': 'literal', 'value': 'foo'}},
+                {'item': {'type': 'uri', 'value': 'wd:Q2'}}]}}
+        self.addCleanup(patcher.stop)
+
+    def test_make_simple_wdqs_query_uses_default_client(self):
+        result = make_simple_wdqs_query('a_query')
+        self.assertEqual(
+            result,
+            [{'item': 'wd:Q1', 'value': 'foo'},
+             {'item': 'wd:Q2', 'value': None}])
+        self.mock_client.query.assert_called_once()
+        self.assertTrue(
+            self.mock_client.query.call_args[0][0].endswith('a_query'))
+
+    def test_make_simple_wdqs_query_tsv(self):
+        client = mock.MagicMock()
+        client.transport = 'json'
+        client.iter_query.return_value = iter([{'item': 'wd:Q1'}])
+        result = make_simple_wdqs_query('a_query', client=client,
+                                        transport='tsv')
+        self.assertEqual(result, [{'item': 'wd:Q1'}])
+        client.iter_query.assert_called_once_with(
+            wdqs_lookup.PREFIXES + 'a_query', ttl=None, bypass_cache=False,
+            transport='tsv')
+        client.query.assert_not_called()
+
+    def test_make_simple_wdqs_query_client(self):
+        client = mock.MagicMock()
+        client.query.return_value = self.mock_client.query.return_value
+        make_simple_wdqs_query('a_query', client=client, ttl=5)
+        client.query.assert_called_once_with(
+            mock.ANY, ttl=5, bypass_cache=False)
+        self.mock_client.query.assert_not_called()
+
+
+class TestMakeValuesWdqsQuery(unittest.TestCase):
+
+    """Test the make_values_wdqs_query method."""
+
+    def setUp(self):
+        patcher = mock.patch('wikidatastuff.wdqs_lookup.make_simple_wdqs_query')
+        self.mock_simple_wdqs_query = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rows = [
+            {'item': 'http://www.wikidata.org/entity/Q1', 'value': 'a'},
+            {'item': 'http://www.wikidata.org/entity/Q2', 'value': 'b'},
+            {'item': 'http://www.wikidata.org/entity/Q2', 'value': 'c'},
+            {'item': 'http://www.wikidata.org/entity/Q3', 'value': 'd'}]
+
+    def test_make_values_sparql(self):
+        self.assertEqual(
+            make_values_sparql('?item', [ItemId(1), 'wd:Q2', '"foo"']),
+            'VALUES ?item { wd:Q1 wd:Q2 "foo" }')
+
+    def test_make_values_wdqs_query_chunks(self):
+        self.mock_simple_wdqs_query.side_effect = [
+            self.rows[:3], self.rows[3:]]
+        query = 'SELECT ?item ?value WHERE { %s ?item wdt:P1 ?value . }'
+        result = make_values_wdqs_query(
+            query, 'item', ['wd:Q1', 'wd:Q2', 'wd:Q1', 'wd:Q3'], 'item',
+            'dict', value_key='value', allow_multiple=True, chunk_size=2)
+        self.assertEqual(
+            self.mock_simple_wdqs_query.mock_calls, [
+                mock.call(query % 'VALUES ?item { wd:Q1 wd:Q2 }'),
+                mock.call(query % 'VALUES ?item { wd:Q3 }')])
+        self.assertEqual(
+            result,
+            process_query_results(
+                list(self.rows), 'item', 'dict', 'value', True))
+
+    def test_make_values_wdqs_query_conflict_across_chunks(self):
+        self.mock_simple_wdqs_query.side_effect = [
+            self.rows[:2], self.rows[2:]]
+        with self.assertRaises(pywikibot.Error):
+            make_values_wdqs_query(
+                '%s', 'item', ['wd:Q1', 'wd:Q2', 'wd:Q3'], 'item', 'dict',
+                value_key='value', chunk_size=2)
+
+
 class TestMakeSelectWdqsQuery(unittest.TestCase):
 
     """Test the make_select_wdqs_query method."""
@@ -92,6 +447,21 @@ class TestMakeSelectWdqsQuery(unittest.TestCase):
             'wdqs_reply', 'item', 'list', None, False)
         self.assertEqual(result, expected_result)
 
+    def test_make_select_wdqs_query_cache_options(self):
+        expected_query = 'SELECT ?item WHERE { main_sparql }'
+        make_select_wdqs_query('main_sparql', ttl=60, bypass_cache=True)
+        self.mock_simple_wdqs_query.assert_called_once_with(
+            expected_query, ttl=60, bypass_cache=True)
+
+    @mock.patch('wikidatastuff.wdqs_lookup.iter_wdqs_query')
+    def test_make_select_wdqs_query_stream(self, mock_iter_wdqs_query):
+        mock_iter_wdqs_query.return_value = 'wdqs_stream'
+        expected_query = 'SELECT ?item WHERE { main_sparql }'
+        result = make_select_wdqs_query('main_sparql', stream=True, raw=True)
+        mock_iter_wdqs_query.assert_called_once_with(expected_query)
+        self.mock_simple_wdqs_query.assert_not_called()
+        self.assertEqual(result, 'wdqs_stream')
+
     def test_make_select_wdqs_query_label(self):
         expected_query = 'SELECT ?test WHERE { main_sparql }'
         make_select_wdqs_query('main_sparql', label='test')
@@ -307,6 +677,14 @@ class TestSanitizeWdqsResult(unittest.TestCase):
         with self.assertRaises(pywikibot.Error):
             sanitize_wdqs_result(data)
 
+    def test_sanitize_wdqs_result_entity_ids(self):
+        data = ['http://www.wikidata.org/entity/Q123',
+                'http://www.wikidata.org/entity/P456',
+                'http://commons.wikimedia.org/wiki/Special:FilePath/A.jpg']
+        result = sanitize_wdqs_result(data, entity_ids=True)
+        self.assertEqual(result, [ItemId(123), PropertyId(456), 'A.jpg'])
+        self.assertIsInstance(result[0], ItemId)
+
 
 class TestProcessQueryResults(unittest.TestCase):
 
@@ -10,9 +10,12 @@ import unittest
 import pywikibot
 
 from wikidatastuff import wikidata_stuff
+from wikidatastuff.claim_index import ClaimIndex
+from wikidatastuff.redirect_cache import RedirectCache
 from wikidatastuff.reference import Reference  # replace with mocks
 from wikidatastuff.statement import Statement  # replace with mocks
 from wikidatastuff.qualifier import Qualifier  # replace with mocks
+from wikidatastuff.values import ItemValue, StringValue, TimeValue
 
 
 class BaseTest(unittest.TestCase):
@@ -41,6 +44,36 @@ class BaseTest(unittest.TestCase):
         self.addCleanup(warning_patcher.stop)
 
 
+class TestWrite(BaseTest):
+
+    """Test write()."""
+
+    def test_write_through_scheduler_on_repo(self):
+        scheduler = mock.Mock()
+        wd_stuff = wikidata_stuff.WikidataStuff(
+            self.repo, scheduler=scheduler)
+        func = mock.Mock()
+        wd_stuff.write(func, 'a', summary='b')
+        scheduler.run_on.assert_called_once_with(
+            self.repo, func, 'a', summary='b')
+
+    def test_make_new_item_from_page_through_scheduler(self):
+        scheduler = mock.Mock()
+        wd_stuff = wikidata_stuff.WikidataStuff(
+            self.repo, edit_summary='b', scheduler=scheduler)
+        page = mock.Mock()
+        wd_stuff.make_new_item_from_page(page)
+        scheduler.run_on.assert_called_once_with(
+            self.repo, self.repo.createNewItemFromPage, page, 'b')
+
+    def test_throttle_not_watched_by_default(self):
+        scheduler = mock.Mock()
+        wikidata_stuff.WikidataStuff(self.repo, scheduler=scheduler)
+        scheduler.watch.assert_not_called()
+        self.assertFalse(
+            hasattr(self.repo.throttle, '_wds_write_schedulers'))
+
+
 class TestAddDescription(BaseTest):
 
     """Test add_description()."""
@@ -162,6 +195,74 @@ class TestAddMultipleDescriptions(BaseTest):
         )
 
 
+class TestSlimLoading(BaseTest):
+
+    """Test loading of items restricted to certain props and languages."""
+
+    def setUp(self):
+        super(TestSlimLoading, self).setUp()
+        self.wd_stuff.props = ['claims', 'labels', 'aliases']
+        self.wd_stuff.languages = ['en', 'sv']
+
+        load_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.ItemPreloader.load')
+        label_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.editLabels')
+        self.mock_load = load_patcher.start()
+        self.mock_edit_label = label_patcher.start()
+        self.addCleanup(load_patcher.stop)
+        self.addCleanup(label_patcher.stop)
+
+    def test_load_item_uses_preloader(self):
+        item = pywikibot.ItemPage(self.repo, 'Q1')
+        self.wd_stuff.load_item(item)
+        self.mock_load.assert_called_once_with(item)
+
+    def test_load_item_already_loaded(self):
+        self.wd_stuff.load_item(self.wd_page)
+        self.mock_load.assert_not_called()
+
+    def test_make_preloader(self):
+        preloader = self.wd_stuff.make_preloader()
+        self.assertEqual(preloader.props, self.wd_stuff.props)
+        self.assertEqual(preloader.languages, self.wd_stuff.languages)
+
+    def test_add_label_in_loaded_language(self):
+        with mock.patch('wikidatastuff.wikidata_stuff.pywikibot.ItemPage.'
+                        'editAliases') as mock_edit_alias:
+            self.wd_stuff.add_multiple_label_or_alias(
+                {'sv': 'sv_label_2', 'en': 'en_label'}, self.wd_page)
+            mock_edit_alias.assert_called_once_with(
+                {'en': ['en_alias_1'], 'sv': ['sv_label_2']},
+                summary='Added [sv] alias to [[-1]]')
+        self.mock_edit_label.assert_not_called()
+
+    def test_add_label_in_unloaded_language(self):
+        with self.assertRaises(pywikibot.Error) as e:
+            self.wd_stuff.add_multiple_label_or_alias(
+                {'fi': 'fi_label', 'de': 'de_label', 'en': 'en_label'},
+                self.wd_page)
+        self.assertEqual(
+            str(e.exception),
+            'Cannot add labels in [de, fi] since these languages are not '
+            'loaded')
+
+    def test_add_description_unloaded_prop(self):
+        with self.assertRaises(pywikibot.Error) as e:
+            self.wd_stuff.add_multiple_descriptions(
+                {'en': 'en_desc'}, self.wd_page)
+        self.assertEqual(
+            str(e.exception),
+            'Cannot add descriptions since these are not loaded')
+
+    def test_no_terms_unloaded_prop(self):
+        self.wd_stuff.props = ['claims']
+        self.wd_stuff.add_multiple_descriptions({}, self.wd_page)
+        self.wd_stuff.add_multiple_label_or_alias({}, self.wd_page)
+        plan = self.wd_stuff.plan_item_update(self.wd_page, {})
+        self.assertTrue(plan.is_empty())
+
+
 class TestAddLabelOrAlias(BaseTest):
 
     """Test add_label_or_alias()."""
@@ -420,12 +521,63 @@ class TestHasClaim(BaseTest):
     def test_has_claim_match_wbtime_type(self):
         prop = 'P74'
         itis = pywikibot.WbTime(year=2016, month=11, day=22, site=self.repo)
-        function = 'wikidatastuff.wikidata_stuff.WikidataStuff.compare_wbtime_claim'
+        expected = 'Q27399$ce31a263-4d6d-31b4-8915-c5084b457c77'
+
+        hits = self.wd_stuff.has_claim(prop, itis, self.wd_page)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(
+            hits[0].toJSON()['id'],
+            expected)
+
+    def test_has_claim_match_wbtime_regarding_precision(self):
+        prop = 'P74'
+        same_month = pywikibot.WbTime(
+            year=2016, month=11, day=22, precision='month', site=self.repo)
+        other_day = pywikibot.WbTime(
+            year=2016, month=11, day=23, site=self.repo)
+
+        self.assertEqual(
+            self.wd_stuff.has_claim(prop, other_day, self.wd_page), [])
+        # a claim with another precision is not a match
+        self.assertEqual(
+            self.wd_stuff.has_claim(prop, same_month, self.wd_page), [])
 
-        with mock.patch(function, autospec=True) as mock_compare_WbTime:
-            self.wd_stuff.has_claim(prop, itis, self.wd_page)
-            mock_compare_WbTime.assert_called_once_with(
-                self.wd_stuff, itis, itis)
+    def test_has_claim_match_wbtime_coarse_precision(self):
+        prop = 'P74'
+        claim = pywikibot.Claim(self.repo, prop)
+        claim.setTarget(pywikibot.WbTime(
+            year=1990, precision='decade', site=self.repo))
+        self.wd_page.claims[prop].append(claim)
+        ClaimIndex.invalidate(self.wd_page)
+        same_decade = pywikibot.WbTime(
+            year=1995, precision='decade', site=self.repo)
+        other_decade = pywikibot.WbTime(
+            year=2005, precision='decade', site=self.repo)
+
+        self.assertEqual(
+            self.wd_stuff.has_claim(prop, same_decade, self.wd_page), [claim])
+        self.assertEqual(
+            self.wd_stuff.has_claim(prop, other_decade, self.wd_page), [])
+        self.assertTrue(
+            self.wd_stuff.compare_wbtime_claim(claim.getTarget(), same_decade))
+        self.assertFalse(
+            self.wd_stuff.compare_wbtime_claim(
+                claim.getTarget(), other_decade))
+
+    def test_has_claim_match_values(self):
+        item_hits = self.wd_stuff.has_claim(
+            'P84', ItemValue('Q1341'), self.wd_page)
+        time_hits = self.wd_stuff.has_claim(
+            'P74', TimeValue(2016, 11, 22), self.wd_page)
+        self.assertEqual(
+            [hit.toJSON()['id'] for hit in item_hits],
+            ['Q27399$58a0a8bc-46e4-3dc6-16fe-e7c364103c9b'])
+        self.assertEqual(
+            [hit.toJSON()['id'] for hit in time_hits],
+            ['Q27399$ce31a263-4d6d-31b4-8915-c5084b457c77'])
+        self.assertEqual(
+            self.wd_stuff.has_claim(
+                'P74', TimeValue(2016, 11), self.wd_page), [])
 
     def test_has_claim_match_independent_of_qualifier(self):
         prop = 'P174'
@@ -518,6 +670,54 @@ class TestHasQualifier(BaseTest):
         self.assertTrue(self.wd_stuff.has_qualifier(expect_qual_2, claim))
         self.assertFalse(self.wd_stuff.has_qualifier(unexpected_qual, claim))
 
+    def test_has_qualifier_wbtime_regarding_precision(self):
+        claim = self.claim_no_qual.copy()
+        q_claim = pywikibot.Claim(self.repo, 'P74', is_qualifier=True)
+        q_claim.setTarget(pywikibot.WbTime(
+            year=2016, month=11, day=22, hour=10, precision='day',
+            site=self.repo))
+        claim.qualifiers['P74'] = [q_claim]
+
+        same_day = Qualifier('P74', pywikibot.WbTime(
+            year=2016, month=11, day=22, hour=12, precision='day',
+            site=self.repo))
+        same_month = Qualifier('P74', pywikibot.WbTime(
+            year=2016, month=11, day=22, precision='month', site=self.repo))
+        other_day = Qualifier('P74', pywikibot.WbTime(
+            year=2016, month=11, day=23, precision='day', site=self.repo))
+        self.assertTrue(self.wd_stuff.has_qualifier(same_day, claim))
+        self.assertFalse(self.wd_stuff.has_qualifier(same_month, claim))
+        self.assertFalse(self.wd_stuff.has_qualifier(other_day, claim))
+
+    def test_has_qualifier_quantity_regardless_of_bounds(self):
+        claim = self.claim_no_qual.copy()
+        q_claim = pywikibot.Claim(
+            self.repo, 'P69', datatype='quantity', is_qualifier=True)
+        q_claim.setTarget(pywikibot.WbQuantity(
+            amount=5, error=1, site=self.repo))
+        claim.qualifiers['P69'] = [q_claim]
+
+        same_amount = Qualifier(
+            'P69', pywikibot.WbQuantity(amount=5, site=self.repo))
+        other_amount = Qualifier(
+            'P69', pywikibot.WbQuantity(amount=6, site=self.repo))
+        self.assertTrue(self.wd_stuff.has_qualifier(same_amount, claim))
+        self.assertFalse(self.wd_stuff.has_qualifier(other_amount, claim))
+        # consistent with the matching of claims
+        self.assertEqual(
+            self.wd_stuff.has_all_qualifiers([same_amount], claim),
+            (True, True))
+
+    def test_has_qualifier_value(self):
+        self.assertTrue(
+            self.wd_stuff.has_qualifier(
+                Qualifier('P174', StringValue('A qualifier')),
+                self.claim_one_qual))
+        self.assertFalse(
+            self.wd_stuff.has_qualifier(
+                Qualifier('P174', StringValue('Unmatched')),
+                self.claim_one_qual))
+
 
 class TestHasAllQualifiers(BaseTest):
 
@@ -571,6 +771,28 @@ class TestHasAllQualifiers(BaseTest):
             self.wd_stuff.has_all_qualifiers(self.quals, self.claim),
             expected)
 
+    def test_has_all_qualifiers_duplicate_on_claim(self):
+        # one qualifier: P174:qualifier
+        claim = self.wd_page.claims['P664'][1]
+        claim.qualifiers['P174'].append(claim.qualifiers['P174'][0].copy())
+        self.quals.append(Qualifier('P174', 'qualifier'))
+        expected = (False, True)
+        self.assertEqual(
+            self.wd_stuff.has_all_qualifiers(self.quals, claim),
+            expected)
+
+    def test_has_all_qualifiers_after_attach_qualifier(self):
+        self.quals.append(self.qual_1)
+        self.assertEqual(
+            self.wd_stuff.has_all_qualifiers(self.quals, self.claim_no_qual),
+            (False, False))
+
+        q_claim = self.wd_stuff.make_simple_claim('P174', 'A qualifier')
+        self.wd_stuff.attach_qualifier(self.claim_no_qual, q_claim)
+        self.assertEqual(
+            self.wd_stuff.has_all_qualifiers(self.quals, self.claim_no_qual),
+            (True, True))
+
 
 class TestAddReference(BaseTest):
 
@@ -682,6 +904,17 @@ class TestAddReference(BaseTest):
                 ref=reference))
         self.mock_add_sources.assert_not_called()
 
+    def test_add_reference_detect_attached_sources(self):
+        reference = Reference(source_test=self.unmatched_ref)
+        self.wd_stuff.attach_sources(
+            self.claim_one_ref, [self.unmatched_ref.copy()])
+        self.assertFalse(
+            self.wd_stuff.add_reference(
+                item=self.wd_page,
+                claim=self.claim_one_ref,
+                ref=reference))
+        self.mock_add_sources.assert_not_called()
+
     def test_add_reference_add_when_multple_sources(self):
         reference = Reference(source_test=self.ref_2)
         self.assertTrue(
@@ -692,6 +925,24 @@ class TestAddReference(BaseTest):
         self.mock_add_sources.assert_called_once_with(
             [self.ref_2], summary=None)
 
+    def test_add_reference_qualifier_sources(self):
+        reference = Reference(
+            source_test=Qualifier('P174', StringValue('ref_1')))
+        self.assertFalse(
+            self.wd_stuff.add_reference(
+                item=self.wd_page,
+                claim=self.claim_one_ref,
+                ref=reference))
+        self.assertTrue(
+            self.wd_stuff.add_reference(
+                item=self.wd_page,
+                claim=self.claim_no_ref,
+                ref=reference))
+        self.mock_add_sources.assert_called_once_with(
+            [self.ref_1], summary=None)
+        source = self.mock_add_sources.call_args[0][0][0]
+        self.assertTrue(source.isReference)
+
 
 class TestAddQualifier(BaseTest):
 
@@ -782,7 +1033,7 @@ class TestAddNewClaim(BaseTest):
         add_reference_patcher = mock.patch(
             'wikidatastuff.wikidata_stuff.WikidataStuff.add_reference')
         add_claim_patcher = mock.patch(
-            'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.addClaim')
+            'wikidatastuff.wikidata_stuff.WikidataStuff.add_full_claim')
         self.mock_add_qualifier = add_qualifier_patcher.start()
         self.mock_add_reference = add_reference_patcher.start()
         self.mock_add_claim = add_claim_patcher.start()
@@ -791,7 +1042,9 @@ class TestAddNewClaim(BaseTest):
         self.addCleanup(add_claim_patcher.stop)
 
         # defaults
-        self.ref = None
+        ref_claim = pywikibot.Claim(self.repo, 'P174')
+        ref_claim.setTarget('Unmatched_ref')
+        self.ref = Reference(source_test=ref_claim)
         self.prop = 'P509'  # an unused property of type string
         self.value = 'A statement'
         self.qual_1 = Qualifier('P174', 'A qualifier')
@@ -805,7 +1058,28 @@ class TestAddNewClaim(BaseTest):
 
         self.mock_add_claim.assert_called_once()
         self.mock_add_qualifier.assert_not_called()
-        self.mock_add_reference.assert_called_once()
+        self.mock_add_reference.assert_not_called()
+
+    def test_add_new_claim_slim_loads_item(self):
+        self.wd_stuff.props = ['claims']
+        self.wd_stuff.languages = ['en']
+        item = pywikibot.ItemPage(self.repo, 'Q27399')
+        entity = dict(self.wd_page._content, id='Q27399')
+        with mock.patch('wikidatastuff.item_preloader.pywikibot.data.api.'
+                        'Request') as mock_request:
+            mock_request.return_value.submit.return_value = {
+                'entities': {'Q27399': entity}}
+            self.wd_stuff.add_new_claim(
+                self.prop, Statement(self.value), item, self.ref)
+
+        mock_request.assert_called_once_with(
+            site=self.repo,
+            parameters={
+                'action': 'wbgetentities',
+                'ids': 'Q27399',
+                'props': 'info|claims',
+                'languages': 'en'})
+        self.mock_add_claim.assert_called_once()
 
     def test_add_new_claim_old_property_new_value(self):
         self.prop = 'P174'
@@ -814,7 +1088,7 @@ class TestAddNewClaim(BaseTest):
 
         self.mock_add_claim.assert_called_once()
         self.mock_add_qualifier.assert_not_called()
-        self.mock_add_reference.assert_called_once()
+        self.mock_add_reference.assert_not_called()
 
     def test_add_new_claim_old_property_old_value(self):
         self.prop = 'P174'
@@ -838,8 +1112,9 @@ class TestAddNewClaim(BaseTest):
         self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
 
         self.mock_add_claim.assert_called_once()
-        self.assertEqual(self.mock_add_qualifier.call_count, 2)
-        self.mock_add_reference.assert_called_once()
+        self.assertEqual(len(self.mock_add_claim.call_args[0][2]), 2)
+        self.mock_add_qualifier.assert_not_called()
+        self.mock_add_reference.assert_not_called()
 
     def test_add_new_claim_old_property_new_value_with_quals(self):
         self.prop = 'P174'
@@ -848,8 +1123,9 @@ class TestAddNewClaim(BaseTest):
         self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
 
         self.mock_add_claim.assert_called_once()
-        self.assertEqual(self.mock_add_qualifier.call_count, 2)
-        self.mock_add_reference.assert_called_once()
+        self.assertEqual(len(self.mock_add_claim.call_args[0][2]), 2)
+        self.mock_add_qualifier.assert_not_called()
+        self.mock_add_reference.assert_not_called()
 
     def test_add_new_claim_old_property_old_value_without_quals(self):
         self.prop = 'P174'
@@ -874,8 +1150,9 @@ class TestAddNewClaim(BaseTest):
         self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
 
         self.mock_add_claim.assert_called_once()
-        self.assertEqual(self.mock_add_qualifier.call_count, 2)
-        self.mock_add_reference.assert_called_once()
+        self.assertEqual(len(self.mock_add_claim.call_args[0][2]), 2)
+        self.mock_add_qualifier.assert_not_called()
+        self.mock_add_reference.assert_not_called()
 
     def test_add_new_claim_old_property_old_value_with_same_quals(self):
         self.prop = 'P174'
@@ -886,7 +1163,7 @@ class TestAddNewClaim(BaseTest):
         self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
 
         self.mock_add_claim.assert_not_called()
-        self.assertEqual(self.mock_add_qualifier.call_count, 2)
+        self.mock_add_qualifier.assert_not_called()
         self.mock_add_reference.assert_called_once()
         self.assertEqual(
             self.mock_add_reference.call_args[0][1].toJSON()['id'],
@@ -940,9 +1217,9 @@ class TestAddNewClaim(BaseTest):
         statement.add_reference(self.mock_ref_2)
         self.wd_stuff.add_new_claim(
             self.prop, statement, self.wd_page, None)
-        self.mock_add_reference.assert_called_once()
+        self.mock_add_claim.assert_called_once()
         self.assertEqual(
-            self.mock_add_reference.call_args[0][2],
+            self.mock_add_claim.call_args[0][3],
             self.mock_ref_2)
 
     def test_add_new_claim_provided_ref_overrides_embedded_ref(self):
@@ -950,9 +1227,9 @@ class TestAddNewClaim(BaseTest):
         statement.add_reference(self.mock_ref_2)
         self.wd_stuff.add_new_claim(
             self.prop, statement, self.wd_page, self.mock_ref_1)
-        self.mock_add_reference.assert_called_once()
+        self.mock_add_claim.assert_called_once()
         self.assertEqual(
-            self.mock_add_reference.call_args[0][2],
+            self.mock_add_claim.call_args[0][3],
             self.mock_ref_1)
 
     def test_add_new_claim_raise_error_on_bad_ref(self):
@@ -977,6 +1254,438 @@ class TestAddNewClaim(BaseTest):
         self.mock_add_qualifier.assert_not_called()
         self.mock_add_reference.assert_not_called()
 
+    def test_add_new_claim_journaled(self):
+        statement = Statement(self.value)
+        self.wd_stuff.journal = mock.Mock()
+        self.wd_stuff.journal.is_done.return_value = True
+        self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
+
+        self.wd_stuff.journal.is_done.assert_called_once_with(
+            '-1', self.prop, statement, ref=self.ref)
+        self.mock_add_claim.assert_not_called()
+        self.wd_stuff.journal.record.assert_not_called()
+
+    def test_add_new_claim_journal_record(self):
+        statement = Statement(self.value)
+        self.wd_stuff.journal = mock.Mock()
+        self.wd_stuff.journal.is_done.return_value = False
+        self.mock_add_claim.return_value = True
+        self.wd_page.latest_revision_id = 123
+        self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
+
+        self.mock_add_claim.assert_called_once()
+        self.wd_stuff.journal.record.assert_called_once_with(
+            '-1', self.prop, statement, 123, ref=self.ref)
+
+    def test_add_new_claim_journal_not_recorded_on_failure(self):
+        statement = Statement(self.value)
+        self.wd_stuff.journal = mock.Mock()
+        self.wd_stuff.journal.is_done.return_value = False
+        self.mock_add_claim.return_value = False
+        self.wd_stuff.add_new_claim(self.prop, statement, self.wd_page, self.ref)
+
+        self.wd_stuff.journal.record.assert_not_called()
+
+
+class TestAddFullClaim(BaseTest):
+
+    """Test add_full_claim()."""
+
+    def setUp(self):
+        super(TestAddFullClaim, self).setUp()
+        self.wd_page.latest_revision_id = 123
+
+        save_claim_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.site.DataSite.save_claim')
+        add_claim_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.addClaim')
+        add_qualifier_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.Claim.addQualifier')
+        add_sources_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.Claim.addSources')
+        self.mock_save_claim = save_claim_patcher.start()
+        self.mock_add_claim = add_claim_patcher.start()
+        self.mock_add_qualifier = add_qualifier_patcher.start()
+        self.mock_add_sources = add_sources_patcher.start()
+        self.addCleanup(save_claim_patcher.stop)
+        self.addCleanup(add_claim_patcher.stop)
+        self.addCleanup(add_qualifier_patcher.stop)
+        self.addCleanup(add_sources_patcher.stop)
+
+        self.claim = pywikibot.Claim(self.repo, 'P509')
+        self.claim.setTarget('A statement')
+        self.quals = [
+            Qualifier('P174', 'A qualifier'),
+            Qualifier('P664', 'Another qualifier')]
+        ref_claim = pywikibot.Claim(self.repo, 'P174')
+        ref_claim.setTarget('ref_1')
+        self.ref = Reference(source_test=ref_claim)
+
+    def assert_single_write(self):
+        self.mock_save_claim.assert_called_once_with(
+            self.claim, summary=None)
+        self.mock_add_claim.assert_not_called()
+        self.mock_add_qualifier.assert_not_called()
+        self.mock_add_sources.assert_not_called()
+
+    def test_add_full_claim_plain(self):
+        self.assertTrue(
+            self.wd_stuff.add_full_claim(
+                self.wd_page, self.claim, [], None))
+        self.assert_single_write()
+        data = self.claim.toJSON()
+        self.assertTrue(data['id'].startswith('-1$'))
+        self.assertNotIn('qualifiers', data)
+        self.assertNotIn('references', data)
+        self.assertIn(self.claim, self.wd_page.claims['P509'])
+
+    def test_add_full_claim_with_qualifiers_and_reference(self):
+        self.assertTrue(
+            self.wd_stuff.add_full_claim(
+                self.wd_page, self.claim, self.quals, self.ref))
+        self.assert_single_write()
+        data = self.claim.toJSON()
+        self.assertEqual(
+            sorted(data['qualifiers'].keys()), ['P174', 'P664'])
+        self.assertEqual(len(data['references']), 1)
+        self.assertEqual(
+            list(data['references'][0]['snaks'].keys()), ['P174'])
+
+    def test_add_full_claim_with_summary(self):
+        self.wd_stuff.add_full_claim(
+            self.wd_page, self.claim, [], None, summary='test_me')
+        self.mock_save_claim.assert_called_once_with(
+            self.claim, summary='test_me')
+
+    def test_add_full_claim_modification_failed(self):
+        self.mock_save_claim.side_effect = pywikibot.data.api.APIError(
+            'modification-failed', 'info')
+        self.assertFalse(
+            self.wd_stuff.add_full_claim(
+                self.wd_page, self.claim, [], None))
+        self.assertNotIn('P509', self.wd_page.claims)
+        self.assertIsNone(self.claim.on_item)
+
+
+class TestPlanItemUpdate(BaseTest):
+
+    """Test plan_item_update() and apply_item_update()."""
+
+    def setUp(self):
+        super(TestPlanItemUpdate, self).setUp()
+
+        # mock all writing calls
+        self.mocks = {}
+        for target in ('editEntity', 'editLabels', 'editAliases',
+                       'editDescriptions', 'addClaim'):
+            patcher = mock.patch(
+                'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.' + target)
+            self.mocks[target] = patcher.start()
+            self.addCleanup(patcher.stop)
+        for target in ('addQualifier', 'addSources'):
+            patcher = mock.patch(
+                'wikidatastuff.wikidata_stuff.pywikibot.Claim.' + target)
+            self.mocks[target] = patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.site.DataSite.save_claim')
+        self.mocks['save_claim'] = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # mock all redirect look-ups
+        self.wd_stuff.redirect_cache = RedirectCache()
+        redirect_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.isRedirectPage')
+        fetch_patcher = mock.patch(
+            'wikidatastuff.redirect_cache.RedirectCache._fetch')
+        self.mock_is_redirect = redirect_patcher.start()
+        self.mock_fetch = fetch_patcher.start()
+        self.addCleanup(redirect_patcher.stop)
+        self.addCleanup(fetch_patcher.stop)
+        self.mock_fetch.return_value = {}
+
+        ref_claim = pywikibot.Claim(self.repo, 'P174')
+        ref_claim.setTarget('Unmatched_ref')
+        self.ref = Reference(source_test=ref_claim)
+        self.qual_1 = Qualifier('P174', 'A qualifier')
+        self.qual_2 = Qualifier('P664', 'Another qualifier')
+
+    def test_plan_item_update_no_writes(self):
+        statement = Statement('A statement').add_qualifier(self.qual_1)
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statement},
+            labels={'fi': 'fi_label', 'en': 'en_alias_2'},
+            descriptions={'fi': 'fi_desc', 'en': 'new_desc'},
+            ref=self.ref)
+
+        for mocked in self.mocks.values():
+            mocked.assert_not_called()
+        self.mock_is_redirect.assert_not_called()
+        self.assertFalse(plan.is_empty())
+        self.assertEqual(plan.labels, (('fi', 'fi_label'), ))
+        self.assertEqual(
+            plan.aliases, (('en', ('en_alias_1', 'en_alias_2')), ))
+        self.assertEqual(plan.descriptions, (('fi', 'fi_desc'), ))
+        self.assertEqual(len(plan.claims), 1)
+        self.assertTrue(plan.claims[0].is_new())
+        self.assertEqual(plan.claims[0].qualifiers, (self.qual_1, ))
+        self.assertEqual(plan.claims[0].ref, self.ref)
+
+    def test_plan_item_update_item_untouched(self):
+        self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': Statement('A statement')},
+            labels={'fi': 'fi_label', 'en': 'en_alias_2'},
+            descriptions={'fi': 'fi_desc'})
+
+        self.assertNotIn('fi', self.wd_page.labels)
+        self.assertEqual(self.wd_page.aliases['en'], ['en_alias_1'])
+        self.assertNotIn('fi', self.wd_page.descriptions)
+        self.assertNotIn('P509', self.wd_page.claims)
+
+    def test_plan_item_update_existing_claim(self):
+        statement = Statement('A string').add_qualifier(self.qual_1)
+        expected_claim = 'Q27399$3f62d521-4efe-e8de-8f2d-0d8a10e024cf'
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P174': [statement]}, ref=self.ref)
+
+        change = plan.claims[0]
+        self.assertFalse(change.is_new())
+        self.assertEqual(change.claim.toJSON()['id'], expected_claim)
+        self.assertEqual(change.qualifiers, (self.qual_1, ))
+        self.assertEqual(change.ref, self.ref)
+
+    def test_plan_item_update_nothing_to_do(self):
+        statement = Statement('A string entry with many qualifiers')
+        statement.add_qualifier(self.qual_1).add_qualifier(self.qual_2)
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P174': statement},
+            labels={'en': 'en_label'}, descriptions={'en': 'new_desc'})
+
+        self.assertTrue(plan.is_empty())
+        self.assertEqual(plan.claims, ())
+
+    def test_plan_item_update_duplicate_statements(self):
+        statements = [
+            Statement('A statement').add_qualifier(self.qual_1),
+            Statement('A statement').add_qualifier(self.qual_1)]
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statements}, ref=self.ref)
+
+        self.assertEqual(len(plan.claims), 1)
+        self.wd_stuff.apply_item_update(plan)
+        self.mocks['save_claim'].assert_called_once()
+        self.assertEqual(len(self.wd_page.claims['P509']), 1)
+
+    def test_plan_item_update_fold_into_planned_claim(self):
+        statements = [
+            Statement('A statement').add_qualifier(self.qual_1),
+            Statement('A statement').add_qualifier(self.qual_1).add_reference(
+                self.ref)]
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statements})
+
+        self.assertEqual(len(plan.claims), 2)
+        first, second = plan.claims
+        self.assertTrue(first.is_new())
+        self.assertFalse(second.is_new())
+        self.assertIsNone(second.claim)
+        self.assertEqual(second.new_claim, first.new_claim)
+        self.assertEqual(second.qualifiers, ())
+        self.assertEqual(second.ref, self.ref)
+
+        self.wd_stuff.apply_item_update(plan)
+        self.mocks['save_claim'].assert_called_once()
+        self.mocks['addSources'].assert_called_once()
+        saved_claim = self.mocks['save_claim'].call_args[0][0]
+        self.assertEqual(self.wd_page.claims['P509'], [saved_claim])
+
+    def test_plan_item_update_fold_after_failed_creation(self):
+        statements = [
+            Statement('A statement'),
+            Statement('A statement').add_qualifier(self.qual_1, force=True)]
+        self.mocks['save_claim'].side_effect = pywikibot.data.api.APIError(
+            'modification-failed', 'info')
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statements})
+        self.wd_stuff.apply_item_update(plan)
+
+        self.mocks['addQualifier'].assert_not_called()
+        self.assertNotIn('P509', self.wd_page.claims)
+
+    def test_apply_item_update_twice(self):
+        statement = Statement('A statement').add_qualifier(self.qual_1)
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statement}, ref=self.ref)
+        self.mocks['save_claim'].side_effect = [
+            pywikibot.data.api.APIError('modification-failed', 'info'),
+            None]
+        self.wd_stuff.apply_item_update(plan)
+        self.wd_stuff.apply_item_update(plan)
+
+        self.assertEqual(self.mocks['save_claim'].call_count, 2)
+        for call in self.mocks['save_claim'].call_args_list:
+            claim = call[0][0]
+            self.assertEqual(list(claim.qualifiers.keys()), ['P174'])
+            self.assertEqual(len(claim.qualifiers['P174']), 1)
+            self.assertEqual(len(claim.sources), 1)
+        self.assertIsNone(plan.claims[0].claim)
+        self.assertEqual(len(self.wd_page.claims['P509']), 1)
+
+    def test_plan_item_update_fold_in_edit_session(self):
+        statements = [
+            Statement('A statement'),
+            Statement('A statement').add_qualifier(self.qual_1, force=True)]
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statements}, ref=self.ref)
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.apply_item_update(plan)
+
+        self.mocks['editEntity'].assert_called_once()
+        data = self.mocks['editEntity'].call_args[0][0]
+        self.assertEqual(len(data['claims']), 1)
+        self.assertEqual(
+            list(data['claims'][0]['qualifiers'].keys()), ['P174'])
+        self.assertEqual(len(data['claims'][0]['references']), 1)
+
+    def test_apply_item_update(self):
+        statement = Statement('A statement').add_qualifier(self.qual_1)
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statement},
+            labels={'fi': 'fi_label'}, descriptions={'fi': 'fi_desc'},
+            ref=self.ref)
+        self.wd_stuff.apply_item_update(plan)
+
+        self.mocks['editLabels'].assert_called_once_with(
+            {'en': 'en_label', 'sv': 'sv_label', 'fi': 'fi_label'},
+            summary='Added [fi] label to [[-1]]')
+        self.mocks['editDescriptions'].assert_called_once_with(
+            {'fi': 'fi_desc'},
+            summary='Added [fi] description to [[-1]]')
+        self.mocks['editAliases'].assert_not_called()
+        self.mocks['save_claim'].assert_called_once()
+        self.assertEqual(len(self.wd_page.claims['P509']), 1)
+
+    def test_apply_item_update_journal_ref(self):
+        self.wd_stuff.journal = mock.Mock()
+        self.wd_stuff.journal.is_done.return_value = False
+        statement = Statement('A statement')
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statement}, ref=self.ref)
+        self.wd_stuff.journal.is_done.assert_called_once_with(
+            '-1', 'P509', statement, ref=self.ref)
+        self.wd_stuff.apply_item_update(plan)
+        self.wd_stuff.journal.record.assert_called_once_with(
+            '-1', 'P509', statement, self.wd_page.latest_revision_id,
+            ref=self.ref)
+
+    def test_apply_item_update_in_edit_session(self):
+        statement = Statement('A statement').add_qualifier(self.qual_1)
+        plan = self.wd_stuff.plan_item_update(
+            self.wd_page, {'P509': statement},
+            labels={'fi': 'fi_label'}, ref=self.ref)
+        with self.wd_stuff.edit_session(self.wd_page):
+            self.wd_stuff.apply_item_update(plan)
+
+        self.mocks['editEntity'].assert_called_once()
+        self.mocks['editLabels'].assert_not_called()
+        self.mocks['save_claim'].assert_not_called()
+
+
+class TestBypassRedirect(BaseTest):
+
+    """Test bypass_redirect(), resolve_redirects() and prefetch_targets()."""
+
+    def setUp(self):
+        super(TestBypassRedirect, self).setUp()
+        self.wd_stuff.redirect_cache = RedirectCache()
+
+        redirect_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.isRedirectPage')
+        target_patcher = mock.patch(
+            'wikidatastuff.wikidata_stuff.pywikibot.ItemPage.'
+            'getRedirectTarget')
+        fetch_patcher = mock.patch(
+            'wikidatastuff.redirect_cache.RedirectCache._fetch')
+        self.mock_is_redirect = redirect_patcher.start()
+        self.mock_get_target = target_patcher.start()
+        self.mock_fetch = fetch_patcher.start()
+        self.addCleanup(redirect_patcher.stop)
+        self.addCleanup(target_patcher.stop)
+        self.addCleanup(fetch_patcher.stop)
+
+        self.mock_is_redirect.return_value = True
+        self.mock_get_target.return_value = pywikibot.ItemPage(
+            self.repo, 'Q2')
+
+    def test_bypass_redirect_non_item(self):
+        self.assertEqual(self.wd_stuff.bypass_redirect('Q1'), 'Q1')
+        self.mock_is_redirect.assert_not_called()
+
+    def test_bypass_redirect_looked_up_once(self):
+        item = pywikibot.ItemPage(self.repo, 'Q1')
+        expected = pywikibot.ItemPage(self.repo, 'Q2')
+        self.assertEqual(self.wd_stuff.bypass_redirect(item), expected)
+        self.assertEqual(
+            self.wd_stuff.bypass_redirect(
+                pywikibot.ItemPage(self.repo, 'Q1')),
+            expected)
+        self.mock_is_redirect.assert_called_once()
+
+    def test_bypass_redirect_not_redirect(self):
+        self.mock_is_redirect.return_value = False
+        item = pywikibot.ItemPage(self.repo, 'Q1')
+        self.assertIs(self.wd_stuff.bypass_redirect(item), item)
+
+    def test_resolve_redirects(self):
+        self.mock_fetch.return_value = {'Q1': 'Q2'}
+        items = [pywikibot.ItemPage(self.repo, 'Q1'),
+                 pywikibot.ItemPage(self.repo, 'Q3'),
+                 'not an item']
+        result = self.wd_stuff.resolve_redirects(items)
+
+        self.mock_fetch.assert_called_once_with(self.repo, ['Q1', 'Q3'])
+        self.assertEqual(result['Q1'], pywikibot.ItemPage(self.repo, 'Q2'))
+        self.assertIs(result['Q3'], items[1])
+
+        # no further look-ups needed
+        self.assertEqual(
+            self.wd_stuff.bypass_redirect(items[0]),
+            pywikibot.ItemPage(self.repo, 'Q2'))
+        self.mock_is_redirect.assert_not_called()
+
+    def test_prefetch_targets(self):
+        claim = self.wd_stuff.make_simple_claim(
+            'P84', pywikibot.ItemPage(self.repo, 'Q1'))
+        self.wd_stuff.attach_qualifier(
+            claim, self.wd_stuff.make_simple_claim(
+                'P84', pywikibot.ItemPage(self.repo, 'Q2')))
+        self.wd_stuff.attach_sources(
+            claim, [self.wd_stuff.make_simple_claim(
+                'P84', pywikibot.ItemPage(self.repo, 'Q3'))])
+        self.wd_page.claims['P84'].append(claim)
+        self.mock_fetch.return_value = {}
+
+        self.wd_stuff.prefetch_targets(self.wd_page)
+        self.mock_fetch.assert_called_once_with(
+            self.repo, ['Q1341', 'Q505', 'Q1', 'Q2', 'Q3'])
+
+        # only done once per revision
+        self.wd_stuff.prefetch_targets(self.wd_page)
+        self.mock_fetch.assert_called_once()
+
+    def test_add_new_claim_prefetch(self):
+        self.wd_stuff.prefetch = True
+        self.mock_fetch.return_value = {}
+        statement = Statement(pywikibot.ItemPage(self.repo, 'Q1341'))
+        with mock.patch(
+                'wikidatastuff.wikidata_stuff.WikidataStuff.add_reference'):
+            self.wd_stuff.add_new_claim(
+                'P84', statement, self.wd_page, None)
+
+        self.mock_fetch.assert_called_once_with(
+            self.repo, ['Q1341', 'Q505'])
+        self.mock_is_redirect.assert_not_called()
+
 
 class TestMatchClaim(BaseTest):
 
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding: utf-8  -*-
+"""Unit tests for WriteScheduler."""
+from __future__ import unicode_literals
+import mock
+import unittest
+
+import pywikibot
+
+from wikidatastuff.write_scheduler import WriteScheduler
+
+
+class TestWriteScheduler(unittest.TestCase):
+
+    """Test WriteScheduler."""
+
+    def setUp(self):
+        self.scheduler = WriteScheduler(max_concurrency=4, recovery=2)
+
+        # silence output and don't actually wait
+        output_patcher = mock.patch(
+            'wikidatastuff.write_scheduler.pywikibot.output')
+        wait_patcher = mock.patch.object(self.scheduler, '_condition')
+        self.mock_output = output_patcher.start()
+        self.mock_condition = wait_patcher.start()
+        self.addCleanup(output_patcher.stop)
+        self.addCleanup(wait_patcher.stop)
+
+        time_patcher = mock.patch('wikidatastuff.write_scheduler.time.time')
+        self.mock_time = time_patcher.start()
+        self.mock_time.return_value = 1000
+        self.addCleanup(time_patcher.stop)
+
+        self.maxlag_error = pywikibot.data.api.APIError(
+            'maxlag', 'Waiting for db1: 7 seconds lagged', lag=7)
+
+    def test_write_scheduler_run(self):
+        func = mock.Mock(return_value='result')
+        self.assertEqual(
+            self.scheduler.run(func, 'a', summary='b'), 'result')
+        func.assert_called_once_with('a', summary='b')
+        self.assertEqual(self.scheduler.rate, 1)
+        self.assertEqual(self.scheduler._active, 0)
+
+    def test_write_scheduler_other_error_not_retried(self):
+        func = mock.Mock(side_effect=pywikibot.data.api.APIError(
+            'modification-failed', 'fail'))
+        with self.assertRaises(pywikibot.data.api.APIError):
+            self.scheduler.run(func)
+        func.assert_called_once()
+        self.assertEqual(self.scheduler.delay, 0)
+        self.assertEqual(self.scheduler._active, 0)
+
+    def test_write_scheduler_lag_retried(self):
+        self.mock_time.side_effect = [1000, 1000, 1020, 1020]
+        func = mock.Mock(side_effect=[self.maxlag_error, 'result'])
+        self.assertEqual(self.scheduler.run(func), 'result')
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(self.scheduler.lag, 7)
+        self.assertEqual(self.scheduler.concurrency, 2)
+        self.assertEqual(self.scheduler._paused_until, 1007)
+        self.assertEqual(self.scheduler.delay, 0.9)
+
+    def test_write_scheduler_retry_after_from_site(self):
+        self.mock_time.side_effect = [1000, 1000, 1020, 1020]
+        site = mock.Mock()
+        site.throttle.retry_after = 12
+        func = mock.Mock(side_effect=[self.maxlag_error, 'result'])
+        self.assertEqual(self.scheduler.run_on(site, func, 'a'), 'result')
+        func.assert_called_with('a')
+        self.assertEqual(self.scheduler.lag, 7)
+        self.assertEqual(self.scheduler._paused_until, 1012)
+
+    def test_write_scheduler_lag_max_retries(self):
+        self.scheduler.max_retries = 2
+        self.mock_time.return_value = 0
+        func = mock.Mock(side_effect=self.maxlag_error)
+        with mock.patch.object(self.scheduler, '_acquire'):
+            with self.assertRaises(pywikibot.data.api.APIError):
+                self.scheduler.run(func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_write_scheduler_report_lag_and_recover(self):
+        self.scheduler.report_lag(lag=3, retry_after=5)
+        self.assertEqual(self.scheduler._paused_until, 1005)
+        self.assertEqual(self.scheduler.delay, 1.0)
+        self.assertEqual(self.scheduler.concurrency, 2)
+
+        self.scheduler.report_lag(lag=3)
+        self.assertEqual(self.scheduler.delay, 2.0)
+        self.assertEqual(self.scheduler.concurrency, 1)
+
+        self.scheduler.report_success()
+        self.scheduler.report_success()
+        self.assertAlmostEqual(self.scheduler.delay, 1.62)
+        self.assertEqual(self.scheduler.concurrency, 2)
+
+    def test_write_scheduler_get_lag(self):
+        self.assertEqual(WriteScheduler.get_lag(self.maxlag_error), (7, None))
+        self.assertEqual(
+            WriteScheduler.get_lag(pywikibot.data.api.APIError(
+                'maxlag', 'Waiting for db1: 2.5 seconds lagged')),
+            (2.5, None))
+        self.assertIsNone(WriteScheduler.get_lag(ValueError('a')))
+
+    def test_write_scheduler_get_lag_retry_after(self):
+        site = mock.Mock()
+        site.throttle.retry_after = 5
+        self.assertEqual(
+            WriteScheduler.get_lag(self.maxlag_error, site), (7, 5))
+        site.throttle.retry_after = 0
+        self.assertEqual(
+            WriteScheduler.get_lag(self.maxlag_error, site), (7, None))
+        self.assertIsNone(WriteScheduler.get_lag(ValueError('a'), site))
+
+    def test_write_scheduler_status(self):
+        self.scheduler.run(mock.Mock())
+        self.assertEqual(
+            self.scheduler.status(),
+            {'delay': 0, 'concurrency': 4, 'rate': 1, 'lag': None})
+
+    def test_write_scheduler_watch(self):
+        site = mock.Mock()
+        site.throttle = mock.Mock(spec=['lag', 'retry_after'])
+        original_lag = site.throttle.lag
+        site.throttle.retry_after = 10
+        self.scheduler.watch(site)
+        self.scheduler.watch(site)  # watching twice has no effect
+
+        site.throttle.lag(4)
+        original_lag.assert_called_once_with(4)
+        self.assertEqual(self.scheduler.lag, 4)
+        self.assertEqual(self.scheduler._paused_until, 1010)
+        self.assertEqual(self.scheduler.concurrency, 2)
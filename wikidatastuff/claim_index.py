@@ -0,0 +1,257 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Index the claims of an item by property and target value."""
+from __future__ import unicode_literals
+from builtins import dict, object
+from collections import Counter
+
+import wikidatastuff.helpers as helpers
+from wikidatastuff.item_update_plan import PlannedClaim
+
+
+class ClaimIndex(object):
+    """
+    Index of the claims on a single item revision.
+
+    Maps (property, target key) to the matching claims, see
+    helpers.target_key(), as well as (property, snak type) to claims. Each
+    property is only indexed the first time it is looked up.
+
+    The index is stored on the item itself and should be accessed through
+    ClaimIndex.for_item() which rebuilds it whenever the revision of the
+    item, or its claims, changed. Any change to the claims of an item which
+    does not result in a new revision (e.g. local changes in an edit session)
+    must be followed by a call to ClaimIndex.invalidate().
+    """
+
+    ATTRIBUTE = '_wds_claim_index'
+    QUALIFIERS_ATTRIBUTE = '_wds_qualifier_keys'
+    SOURCES_ATTRIBUTE = '_wds_source_keys'
+
+    def __init__(self, item):
+        """
+        Initialise an empty index for an item.
+
+        @param item: the item to index
+        @type item: pywikibot.ItemPage
+        """
+        self.claims = item.claims
+        self.revision = ClaimIndex.get_revision(item)
+        self._targets = dict()  # prop: {target_key: [(claim, target)]}
+        self._unkeyed = dict()  # prop: [(claim, target)] for all claims
+        self._snaktypes = dict()  # prop: {snaktype: [claim]}
+        self.prefetched = False  # if all item targets have been resolved
+
+    @classmethod
+    def for_item(cls, item):
+        """
+        Get an up to date index for an item, creating it if needed.
+
+        @param item: the item to index
+        @type item: pywikibot.ItemPage
+        @rtype: ClaimIndex
+        """
+        index = getattr(item, cls.ATTRIBUTE, None)
+        if index is None or not index.is_current(item):
+            index = cls(item)
+            setattr(item, cls.ATTRIBUTE, index)
+        return index
+
+    @classmethod
+    def invalidate(cls, item):
+        """
+        Drop any index stored on an item.
+
+        @param item: the indexed item
+        @type item: pywikibot.ItemPage
+        """
+        if getattr(item, cls.ATTRIBUTE, None) is not None:
+            setattr(item, cls.ATTRIBUTE, None)
+
+    @staticmethod
+    def snak_key(prop, target):
+        """
+        Make a key for a snak (a qualifier or source claim).
+
+        @param prop: the property id of the snak, with "P" prefix
+        @type prop: basestring
+        @param target: the (resolved) target of the snak
+        @type target: object
+        @rtype: tuple
+        """
+        return (prop, helpers.target_key(target) or ('value', target))
+
+    @classmethod
+    def _cached_claim_keys(cls, claim, attribute, make_keys):
+        """
+        Get keys stored on a claim, (re)computing them if needed.
+
+        The keys are recomputed if missing or if made for another revision
+        of the item holding the claim.
+        """
+        revision = None
+        if getattr(claim, 'on_item', None) is not None:
+            revision = ClaimIndex.get_revision(claim.on_item)
+        cached = getattr(claim, attribute, None)
+        if cached is None or cached[0] != revision:
+            cached = (revision, make_keys())
+            setattr(claim, attribute, cached)
+        return cached[1]
+
+    @classmethod
+    def qualifier_keys(cls, claim, resolve):
+        """
+        Get the multiset of qualifier keys of a claim, computing it if needed.
+
+        Each qualifier is keyed on its property and the key of its (resolved)
+        target, see snak_key(). The keys are stored on the claim itself, for
+        the current revision of its item, so any local change to the
+        qualifiers must be followed by a call to ClaimIndex.invalidate_claim().
+
+        For a PlannedClaim the keys of the planned qualifiers are used.
+
+        @param claim: the claim
+        @type claim: pywikibot.Claim|PlannedClaim
+        @param resolve: function applied to each qualifier target before it
+            is keyed, e.g. for bypassing redirects
+        @type resolve: callable
+        @return: the number of qualifiers per key
+        @rtype: Counter
+        """
+        if isinstance(claim, PlannedClaim):
+            return claim.qualifier_keys
+
+        def make_keys():
+            return Counter(
+                cls.snak_key(prop, resolve(qualifier.getTarget()))
+                for prop, qualifiers in claim.qualifiers.items()
+                for qualifier in qualifiers)
+
+        return cls._cached_claim_keys(
+            claim, cls.QUALIFIERS_ATTRIBUTE, make_keys)
+
+    @classmethod
+    def source_keys(cls, claim, resolve):
+        """
+        Get the set of keys of all source claims of a claim.
+
+        Each source claim, in any of the references, is keyed on its property
+        and the key of its (resolved) target, see snak_key(). The keys are
+        stored as for qualifier_keys().
+
+        For a PlannedClaim the keys of the planned sources are used.
+
+        @param claim: the claim
+        @type claim: pywikibot.Claim|PlannedClaim
+        @param resolve: function applied to each source target before it is
+            keyed, e.g. for bypassing redirects
+        @type resolve: callable
+        @rtype: frozenset
+        """
+        if isinstance(claim, PlannedClaim):
+            return frozenset(claim.source_keys)
+
+        def make_keys():
+            return frozenset(
+                cls.snak_key(prop, resolve(snak.getTarget()))
+                for source in claim.sources
+                for prop, snaks in source.items()
+                for snak in snaks)
+
+        return cls._cached_claim_keys(
+            claim, cls.SOURCES_ATTRIBUTE, make_keys)
+
+    @classmethod
+    def invalidate_claim(cls, claim):
+        """
+        Drop any keys stored on a claim.
+
+        @param claim: the claim
+        @type claim: pywikibot.Claim
+        """
+        for attribute in (cls.QUALIFIERS_ATTRIBUTE, cls.SOURCES_ATTRIBUTE):
+            if getattr(claim, attribute, None) is not None:
+                setattr(claim, attribute, None)
+
+    @staticmethod
+    def get_revision(item):
+        """
+        Get the revision id of a loaded item, without triggering a look-up.
+
+        @param item: the item
+        @type item: pywikibot.ItemPage
+        @rtype: int|None
+        """
+        # latest_revision_id triggers an API call if the item lacks it
+        return getattr(item, '_revid', None)
+
+    def is_current(self, item):
+        """
+        Check if the index is still valid for the item.
+
+        @param item: the indexed item
+        @type item: pywikibot.ItemPage
+        @rtype: bool
+        """
+        return (self.claims is item.claims and
+                self.revision == ClaimIndex.get_revision(item))
+
+    def _index_targets(self, prop, resolve):
+        """Index all claims for a property by their (resolved) target."""
+        targets = dict()
+        unkeyed = []
+        for claim in self.claims.get(prop, []):
+            target = resolve(claim.getTarget())
+            unkeyed.append((claim, target))
+            targets.setdefault(
+                helpers.target_key(target), []).append((claim, target))
+        self._targets[prop] = targets
+        self._unkeyed[prop] = unkeyed
+
+    def _index_snaktypes(self, prop):
+        """Index all claims for a property by their snak type."""
+        snaktypes = dict()
+        for claim in self.claims.get(prop, []):
+            snaktypes.setdefault(claim.getSnakType(), []).append(claim)
+        self._snaktypes[prop] = snaktypes
+
+    def find(self, prop, itis, resolve):
+        """
+        Find the claims whose target shares the key of a given value.
+
+        The candidates are returned in the same order as on the item.
+
+        @param prop: the property id for the claim, with "P" prefix
+        @type prop: basestring
+        @param itis: the value to look for
+        @type itis: object
+        @param resolve: function applied to each claim target before it is
+            indexed, e.g. for bypassing redirects
+        @type resolve: callable
+        @return: the candidate claims together with their resolved target
+        @rtype: list of (pywikibot.Claim, object)
+        """
+        if prop not in self._targets:
+            self._index_targets(prop, resolve)
+        key = helpers.target_key(itis)
+        if key is None:
+            return self._unkeyed[prop]
+        return self._targets[prop].get(key, [])
+
+    def find_snaktype(self, prop, snaktype):
+        """
+        Find the claims with a given snak type.
+
+        @param prop: the property id for the claim, with "P" prefix
+        @type prop: basestring
+        @param snaktype: the snak type, e.g. 'somevalue' or 'novalue'
+        @type snaktype: basestring
+        @rtype: list of pywikibot.Claim
+        """
+        if prop not in self._snaktypes:
+            self._index_snaktypes(prop)
+        return self._snaktypes[prop].get(snaktype, [])
@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Compact integer ids of Wikibase entities (items, properties, lexemes)."""
+from __future__ import unicode_literals
+from builtins import dict
+
+ENTITY_URI = 'http://www.wikidata.org/entity/'
+
+# avoids having to use from past.builtins import basestring
+# (helpers.is_str cannot be used as helpers depends on this module)
+try:
+    STRING_TYPES = (basestring, )  # attempt to evaluate basestring
+except NameError:
+    STRING_TYPES = (str, )
+
+
+class EntityId(int):
+    """
+    The id of an entity, stored as its number tagged with the entity type.
+
+    Behaves as the plain number (e.g. in arithmetic, str() and format()) so
+    it can replace the numeric ids previously handed out by e.g.
+    fill_cache_wdqs(). Use the id property for the prefixed form.
+
+    Ids of different types never compare equal, even if they share the same
+    number.
+
+        EntityId.parse('http://www.wikidata.org/entity/Q42')  # ItemId(Q42)
+        EntityId.parse('wd:P31')  # PropertyId(P31)
+        ItemId(42).id  # 'Q42'
+    """
+
+    __slots__ = ()
+    PREFIX = None
+    TYPES = dict()  # prefix: subclass, filled in below
+
+    def __new__(cls, value):
+        """
+        Make an id from a number, or parse it from a string.
+
+        @param value: the number of the id or anything accepted by parse()
+        @type value: int|basestring|EntityId
+        @rtype: EntityId
+        """
+        if (cls.PREFIX is not None and isinstance(value, int) and
+                not isinstance(value, (bool, EntityId))):
+            if value <= 0:
+                raise ValueError(
+                    '{} is not a valid {}id.'.format(value, cls.PREFIX))
+            return int.__new__(cls, value)
+        return cls.parse(value)
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Parse an id from an entity URI, a (prefixed) string or a number.
+
+        Parsing through a subclass, e.g. ItemId.parse(), only accepts ids of
+        that type but also accepts unprefixed numbers and strings.
+
+        @param value: e.g. 'http://www.wikidata.org/entity/Q42', 'wd:Q42',
+            'Q42' or (only through a subclass) 42 and '42'
+        @type value: basestring|int|EntityId
+        @raises ValueError: if the value is not a valid id
+        @rtype: EntityId
+        """
+        if isinstance(value, EntityId):
+            if cls.PREFIX is not None and value.PREFIX != cls.PREFIX:
+                raise ValueError(
+                    '{} is not a valid {}id.'.format(value.id, cls.PREFIX))
+            return value
+
+        typ = cls
+        if isinstance(value, STRING_TYPES):
+            # strip any URI or namespace prefix, e.g. "wd:"
+            number = value[max(value.rfind('/'), value.rfind(':')) + 1:]
+            prefix = number[:1]
+            if prefix in EntityId.TYPES:
+                typ = EntityId.TYPES[prefix]
+                number = number[1:]
+                if cls.PREFIX is not None and typ is not cls:
+                    typ = None
+            if typ is None or not number.isdigit():
+                raise ValueError('{} is not a valid {}id.'.format(
+                    value, cls.PREFIX or 'entity '))
+            number = int(number)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            number = value
+        else:
+            raise ValueError('{} is not a valid {}id.'.format(
+                value, cls.PREFIX or 'entity '))
+
+        if typ.PREFIX is None or number <= 0:
+            raise ValueError('{} is not a valid {}id.'.format(
+                value, cls.PREFIX or 'entity '))
+        return int.__new__(typ, number)
+
+    @property
+    def id(self):
+        """Return the prefixed id, e.g. 'Q42'."""
+        return '{}{:d}'.format(self.PREFIX, self)
+
+    @property
+    def uri(self):
+        """Return the entity URI."""
+        return '{}{}'.format(ENTITY_URI, self.id)
+
+    def __str__(self):
+        """Return the plain number, as for an int."""
+        return int.__repr__(self)
+
+    def __repr__(self):
+        """Return a more complete string representation."""
+        return '{}({})'.format(type(self).__name__, self.id)
+
+    def __eq__(self, other):
+        """Ids of different types are never equal."""
+        if isinstance(other, EntityId) and other.PREFIX != self.PREFIX:
+            return False
+        return int.__eq__(self, other)
+
+    def __ne__(self, other):
+        """Implement non-equality comparison."""
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = int.__hash__
+
+
+class ItemId(EntityId):
+    """The id of an item, e.g. Q42."""
+
+    __slots__ = ()
+    PREFIX = 'Q'
+
+
+class PropertyId(EntityId):
+    """The id of a property, e.g. P31."""
+
+    __slots__ = ()
+    PREFIX = 'P'
+
+
+class LexemeId(EntityId):
+    """The id of a lexeme, e.g. L7."""
+
+    __slots__ = ()
+    PREFIX = 'L'
+
+
+EntityId.TYPES.update(
+    (cls.PREFIX, cls) for cls in (ItemId, PropertyId, LexemeId))
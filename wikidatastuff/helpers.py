@@ -9,6 +9,7 @@ Methods commonly shared by WikidataStuff bots which are:
 """
 from __future__ import unicode_literals
 from builtins import dict, open, str
+import hashlib
 import os
 import json
 import requests  # for dbpedia_2_wikidata
@@ -18,6 +19,9 @@ from datetime import datetime  # for today_as_WbTime
 import pywikibot
 from pywikibot import pagegenerators
 
+from wikidatastuff.entity_id import EntityId, ItemId
+from wikidatastuff.values import Value, time_key, unit_key
+
 START_P = 'P580'  # start date
 END_P = 'P582'  # end date
 INSTANCE_OF_P = 'P31'
@@ -65,7 +69,8 @@ def load_json_file(filename, force_path=None):
 
 # @todo: Move to wdqs since import here is cyclical?
 # @todo: skip going via WdqToWdqs?
-def fill_cache_wdqs(pid, queryoverride=None, no_strip=False):
+def fill_cache_wdqs(pid, queryoverride=None, no_strip=False, ttl=None,
+                    bypass_cache=False):
     """
     Query Wikidata to fill the cache of entities which contain the id.
 
@@ -75,32 +80,40 @@ def fill_cache_wdqs(pid, queryoverride=None, no_strip=False):
     @type queryoverride: anything
     @param no_strip: Don't strip the Q prefix
     @type no_strip: bool
-    @return: Dictionary of IDno to Qno (without Q prefix)
+    @param ttl: the maximum age, in seconds, of a cached result, see
+        wdqs_lookup.WdqsClient.query()
+    @type ttl: int|float|None
+    @param bypass_cache: if any cached result should be ignored
+    @type bypass_cache: bool
+    @return: Dictionary of IDno to Qno (as ItemIds, which behave as the plain
+        number, unless no_strip)
     @rtype: dict
     """
     import wikidatastuff.wdq_to_wdqs as wdq_backport  # to avoid cyclic import
-    pid = pid.lstrip('P')  # standardise input
+    pid = std_p(pid)  # standardise input
     result = dict()
     if queryoverride:
         query = queryoverride
         raise NotImplementedError('querryoverride has not been implemented')
     else:
-        query = 'CLAIM[{}]'.format(pid)  # for error
-        item_ids = wdq_backport.make_claim_wdqs_search(
-            'P{}'.format(pid), get_values=True, allow_multiple=True)
+        query = 'CLAIM[{}]'.format(pid[1:])  # for error
+        # streamed, to avoid holding all of the rows in memory
+        rows = wdq_backport.make_claim_wdqs_search(
+            pid, get_values=True, raw=True, stream=True, ttl=ttl,
+            bypass_cache=bypass_cache)
 
     # invert and check existence and uniqueness
-    for q_id, values in item_ids.items():
-        for value in values:
-            if value in result:
-                pywikibot.output(
-                    'Double ids in Wikidata: {0}, {1} ({2})'.format(
-                        q_id, result[value], query))
-            if no_strip:
-                result[value] = q_id
-            else:
-                result[value] = int(q_id.lstrip('Q'))  # for wdq compatibility
-
+    for row in rows:
+        q_id = ItemId.parse(row['item'])
+        value = row['value']
+        if value in result and result[value] != q_id:
+            pywikibot.output(
+                'Double ids in Wikidata: {0}, {1} ({2})'.format(
+                    q_id.id, result[value].id, query))
+        result[value] = q_id
+
+    if no_strip:
+        result = {value: q_id.id for value, q_id in result.items()}
     return result
 
 
@@ -355,6 +368,26 @@ def bundle_values(values):
     return bundle
 
 
+def chunks(values, size):
+    """
+    Split an iterable into lists of at most a given size.
+
+    @param values: the values to split
+    @type values: iterable
+    @param size: the maximum length of each chunk
+    @type size: int
+    @rtype: generator of list
+    """
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 def reorder_names(name):
     """
     Detect a "Last, First" string and return as "First Last".
@@ -418,6 +451,7 @@ def dbpedia_2_wikidata(dbpedia):
     @return: Q-value of matching wikidata entry
     @rtype: str
     """
+    from wikidatastuff.wdqs_lookup import default_client  # cyclic import
     url = (
         'http://dbpedia.org/sparql?'
         'default-graph-uri=http%3A%2F%2Fdbpedia.org&query=DESCRIBE+%3C{}'
@@ -425,14 +459,12 @@ def dbpedia_2_wikidata(dbpedia):
             requests.utils.quote(dbpedia.encode('utf-8')))
 
     try:
-        r = requests.get(url)
-        r.raise_for_status()
+        r = default_client.get(url)
     except Exception:
         pywikibot.output('dbpedia is complaining so sleeping for 10s')
         time.sleep(10)
         try:
-            r = requests.get(url)
-            r.raise_for_status()
+            r = default_client.get(url)
         except Exception as e:
             pywikibot.output('dbpedia is still complaining about {}, '
                              'skipping'.format(dbpedia))
@@ -572,13 +604,15 @@ def _std_val(value, prefix):
     """
     Ensure a value is always given a specific prefix.
 
-    Validates that the value is either a positive integer or already a prefixed
-    string.
+    Validates that the value is either a positive integer, an EntityId of the
+    right type or already a prefixed string.
     """
-    if is_pos_int(value) or (is_str(value) and value.startswith(prefix)):
+    if isinstance(value, EntityId):
+        if value.PREFIX == prefix:
+            return value.id
+    elif is_pos_int(value) or (is_str(value) and value.startswith(prefix)):
         return '{}{}'.format(prefix, str(value).lstrip(prefix))
-    else:
-        raise ValueError('{} is not a valid {}id.'.format(value, prefix))
+    raise ValueError('{} is not a valid {}id.'.format(value, prefix))
 
 
 def std_p(pid):
@@ -601,3 +635,100 @@ def std_q(qid):
     @rtype: str
     """
     return _std_val(qid, 'Q')
+
+
+def target_key(value):
+    """
+    Make a hashable key for the target of a claim.
+
+    Targets which are considered identical by WikidataStuff share the same
+    key. Items (and other entities) are keyed on their id, WbTimes on their
+    precision, calendar model and the date fields relevant for the precision,
+    quantities on their amount and the id of their unit (so that the key does
+    not depend on the concept URI of the repo) and monolingual texts on their
+    language and text. Lightweight values (see wikidatastuff.values) share
+    the key of the corresponding pywikibot object. Other hashable values are
+    used as their own key.
+
+    Note that two targets sharing a key are not necessarily identical (e.g.
+    quantities with different bounds) so any match should still be verified.
+
+    @param value: the target of a claim
+    @type value: object
+    @return: a hashable key or None if no key could be made
+    @rtype: tuple|None
+    """
+    if isinstance(value, pywikibot.page.WikibasePage):
+        return ('entity', value.getID())
+    elif isinstance(value, pywikibot.WbTime):
+        return ('time', ) + wbtime_key(value)
+    elif isinstance(value, pywikibot.WbQuantity):
+        return ('quantity', value.amount, unit_key(value.unit))
+    elif isinstance(value, pywikibot.WbMonolingualText):
+        return ('monolingual', value.language, value.text)
+    elif isinstance(value, Value):
+        return value.target_key()
+
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return ('value', value)
+
+
+def wbtime_key(wbtime):
+    """
+    Make a canonical, hashable, key for a WbTime.
+
+    The key consists of the precision, the calendar model and those date
+    fields relevant for the precision. Two WbTimes share the same key if they
+    are the same date, regarding precision (see T107870). For precisions more
+    coarse than a year the year is reduced to the relevant decade, century
+    etc., so e.g. 1990 and 1995 share the same key at decade precision and
+    1901 and 2000 (the 20th century) at century precision.
+
+    @param wbtime: the time to make a key for
+    @type wbtime: pywikibot.WbTime
+    @rtype: tuple
+    """
+    return time_key(wbtime)
+
+
+def canonical_json(key):
+    """
+    Serialise a key, e.g. from target_key(), into a stable JSON string.
+
+    Unlike hash() the outcome is the same between runs, and Python versions,
+    making it suitable for storing.
+
+    @param key: the key to serialise
+    @type key: tuple
+    @rtype: str
+    """
+    return json.dumps(
+        _jsonable(key), sort_keys=True, separators=(',', ':'))
+
+
+def _jsonable(value):
+    """Convert a key, or part of a key, into something JSON serialisable."""
+    if isinstance(value, (tuple, list)):
+        return [_jsonable(v) for v in value]
+    elif isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    elif value is None or isinstance(value, (bool, int, float)) or \
+            is_str(value):
+        return value
+    elif hasattr(value, 'toWikibase'):
+        return _jsonable(value.toWikibase())
+    return str(value)
+
+
+def fingerprint(key):
+    """
+    Make a short, stable, fingerprint of a key.
+
+    @param key: the key to fingerprint, see canonical_json()
+    @type key: tuple
+    @rtype: str
+    """
+    return hashlib.sha1(canonical_json(key).encode('utf-8')).hexdigest()
@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""An append-only journal of imported statements, for resuming imports."""
+from __future__ import unicode_literals
+from builtins import dict, object, open
+import json
+import os
+import threading
+
+import pywikibot
+
+import wikidatastuff.helpers as helpers
+
+
+class ImportJournal(object):
+    """
+    Append-only journal of the statements which have been imported.
+
+    Each committed statement is recorded as a line of JSON, with the item
+    id, property, statement fingerprint (see Statement.fingerprint(), this
+    includes the reference used with the statement) and the revision id of
+    the item after the statement was committed. When an import is restarted
+    with the same journal any already journaled statements can be skipped
+    without loading their items.
+
+    The journal is flushed after every record so at most the last line can
+    be lost, or truncated, in a crash. Truncated lines are ignored.
+
+        journal = ImportJournal('import.jsonl')
+        wd_stuff = WikidataStuff(repo, journal=journal)
+        for qid, protoclaims in data:
+            protoclaims = journal.filter(qid, protoclaims)
+            if protoclaims:
+                ...
+    """
+
+    def __init__(self, filename):
+        """
+        Open a journal, loading any previously journaled statements.
+
+        @param filename: path to the journal file, created if not present
+        @type filename: basestring
+        """
+        self.filename = filename
+        self._done = set()  # (qid, prop, fingerprint)
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(filename, 'a', encoding='utf-8')
+        if self._truncated:
+            self._file.write('\n')  # don't append to the truncated line
+
+    def _load(self):
+        """Load the entries of an existing journal file."""
+        self._truncated = False
+        if not os.path.isfile(self.filename):
+            return
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._truncated = not line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                    self._done.add(
+                        (entry['qid'], entry['prop'], entry['fingerprint']))
+                except (ValueError, KeyError, TypeError):
+                    pywikibot.warning(
+                        'Skipping malformed line in import journal {0}: '
+                        '{1}'.format(self.filename, line.strip()))
+
+    def __len__(self):
+        """Return the number of journaled statements."""
+        return len(self._done)
+
+    def close(self):
+        """Close the journal file."""
+        with self._lock:
+            self._file.close()
+
+    def is_done(self, qid, prop, statement, ref=None):
+        """
+        Check if a statement has already been journaled for an item.
+
+        @param qid: the id of the item
+        @type qid: basestring
+        @param prop: the property id, with "P" prefix
+        @type prop: basestring
+        @param statement: the statement
+        @type statement: Statement
+        @param ref: the reference used with the statement, overriding the
+            embedded one
+        @type ref: Reference|None
+        @rtype: bool
+        """
+        key = (helpers.std_q(qid), helpers.std_p(prop),
+               statement.fingerprint(ref))
+        return key in self._done
+
+    def filter(self, qid, protoclaims, ref=None):
+        """
+        Remove all already journaled statements for an item.
+
+        @param qid: the id of the item
+        @type qid: basestring
+        @param protoclaims: dict of Statements (or lists of Statements) per
+            (P-prefixed) property-id
+        @type protoclaims: dict
+        @param ref: the reference used with every statement, overriding the
+            embedded ones
+        @type ref: Reference|None
+        @return: the statements which still need to be imported, in the same
+            format but without any empty properties
+        @rtype: dict
+        """
+        remaining = dict()
+        for prop, statements in protoclaims.items():
+            if isinstance(statements, list):
+                statements = [s for s in statements
+                              if not self.is_done(qid, prop, s, ref)]
+                if statements:
+                    remaining[prop] = statements
+            elif not self.is_done(qid, prop, statements, ref):
+                remaining[prop] = statements
+        return remaining
+
+    def record(self, qid, prop, statement, revid, ref=None):
+        """
+        Record that a statement has been committed to an item.
+
+        @param qid: the id of the item
+        @type qid: basestring
+        @param prop: the property id, with "P" prefix
+        @type prop: basestring
+        @param statement: the statement
+        @type statement: Statement
+        @param revid: the revision id of the item after the statement was
+            committed
+        @type revid: int|None
+        @param ref: the reference used with the statement, overriding the
+            embedded one
+        @type ref: Reference|None
+        """
+        qid = helpers.std_q(qid)
+        prop = helpers.std_p(prop)
+        fingerprint = statement.fingerprint(ref)
+        line = json.dumps({
+            'qid': qid,
+            'prop': prop,
+            'fingerprint': fingerprint,
+            'revid': revid}, sort_keys=True)
+        with self._lock:
+            if (qid, prop, fingerprint) in self._done:
+                return
+            self._file.write('{}\n'.format(line))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._done.add((qid, prop, fingerprint))
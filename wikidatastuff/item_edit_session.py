@@ -0,0 +1,278 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Bundle all changes to a single item into one wbeditentity call."""
+from __future__ import unicode_literals
+from builtins import dict, object
+import uuid
+
+import pywikibot
+
+from wikidatastuff.claim_index import ClaimIndex
+
+
+class ItemEditSession(object):
+    """
+    Collect all changes made to an item and save them as a single edit.
+
+    While the session is open every label, alias, description, claim,
+    qualifier and reference added to the item through the associated
+    WikidataStuff instance is only applied to the local ItemPage. When the
+    session is closed all of the changes are sent in one wbeditentity call.
+
+    Should be used as a context manager, preferably through
+    WikidataStuff.edit_session():
+
+        with wd_stuff.edit_session(item):
+            wd_stuff.add_multiple_label_or_alias(labels, item)
+            for prop, statement in protoclaims.items():
+                wd_stuff.add_new_claim(prop, statement, item, ref)
+
+    If an exception is raised inside the with-block nothing is saved and the
+    local ItemPage should be considered dirty.
+    """
+
+    def __init__(self, wd_stuff, item, summary=None):
+        """
+        Initialise an edit session for a single item.
+
+        @param wd_stuff: the WikidataStuff instance through which changes are
+            made
+        @type wd_stuff: WikidataStuff
+        @param item: the item to which all changes are made
+        @type item: pywikibot.ItemPage
+        @param summary: summary to append to the auto-generated edit summary.
+            Summaries passed to the individual WikidataStuff methods are
+            ignored while the session is open.
+        @type summary: basestring|None
+        """
+        self.wd_stuff = wd_stuff
+        self.item = item
+        self.summary = summary or wd_stuff.edit_summary
+
+        self.labels = dict()
+        self.aliases = dict()
+        self.descriptions = dict()
+        self.claims = []  # new or modified claims, in order of change
+        self._claim_ids = set()  # id() of the claims in self.claims
+        self.num_new_claims = 0
+        self.num_qualifiers = 0
+        self.num_references = 0
+        self.journal_entries = []  # (prop, statement, ref) to journal once saved
+
+    def __enter__(self):
+        """Register the session with WikidataStuff."""
+        self.wd_stuff.register_edit_session(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Unregister the session and, unless crashing, save the changes."""
+        self.wd_stuff.unregister_edit_session(self)
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def has_changes(self):
+        """Check if there are any changes waiting to be saved."""
+        return bool(self.labels or self.aliases or self.descriptions or
+                    self.claims)
+
+    def set_labels(self, labels):
+        """
+        Record new labels.
+
+        @param labels: dictionary of language-label pairs
+        @type labels: dict
+        """
+        self._update_item_terms('labels', labels)
+        self.labels.update(labels)
+
+    def set_aliases(self, aliases):
+        """
+        Record new aliases.
+
+        Note that the full list of aliases must be provided for each language
+        since these replace any pre-existing aliases.
+
+        @param aliases: dictionary of language-list of aliases pairs
+        @type aliases: dict
+        """
+        self._update_item_terms('aliases', aliases)
+        self.aliases.update(aliases)
+
+    def set_descriptions(self, descriptions):
+        """
+        Record new descriptions.
+
+        @param descriptions: dictionary of language-description pairs
+        @type descriptions: dict
+        """
+        self._update_item_terms('descriptions', descriptions)
+        self.descriptions.update(descriptions)
+
+    def _update_item_terms(self, attr, data):
+        """Apply new labels/aliases/descriptions to the local item."""
+        if getattr(self.item, attr) is None:
+            setattr(self.item, attr, dict())
+        getattr(self.item, attr).update(data)
+
+    def add_claim(self, claim):
+        """
+        Record a new claim.
+
+        Any qualifiers or references should already be attached to the claim.
+        The claim is given a GUID so that it can be identified in later edits
+        without having to reload the item.
+
+        @param claim: the claim to add to the item
+        @type claim: pywikibot.Claim
+        """
+        claim.snak = '{0}${1}'.format(self.item.getID(), uuid.uuid4())
+        self.item.claims.setdefault(claim.getID(), []).append(claim)
+        ClaimIndex.invalidate(self.item)
+        claim.on_item = self.item
+        self.num_new_claims += 1
+        self._mark_claim(claim)
+
+    def add_qualifier(self, claim, qualifier):
+        """
+        Record a new qualifier on a new or pre-existing claim.
+
+        @param claim: the claim to qualify
+        @type claim: pywikibot.Claim
+        @param qualifier: the qualifier to add
+        @type qualifier: pywikibot.Claim
+        """
+        self.wd_stuff.attach_qualifier(claim, qualifier)
+        self.num_qualifiers += 1
+        self._mark_claim(claim)
+
+    def add_sources(self, claim, sources):
+        """
+        Record a new reference on a new or pre-existing claim.
+
+        @param claim: the claim to source
+        @type claim: pywikibot.Claim
+        @param sources: the claims making up the reference
+        @type sources: list of pywikibot.Claim
+        """
+        self.wd_stuff.attach_sources(claim, sources)
+        self.num_references += 1
+        self._mark_claim(claim)
+
+    def add_journal_entry(self, prop, statement, ref=None):
+        """
+        Record a statement to journal once the session has been saved.
+
+        @param prop: property id, with "P" prefix
+        @type prop: basestring
+        @param statement: the statement
+        @type statement: Statement
+        @param ref: the reference used with the statement, overriding the
+            embedded one
+        @type ref: Reference|None
+        """
+        self.journal_entries.append((prop, statement, ref))
+
+    def _mark_claim(self, claim):
+        """Register a claim as needing to be saved."""
+        if id(claim) not in self._claim_ids:
+            self._claim_ids.add(id(claim))
+            self.claims.append(claim)
+
+    def to_json(self):
+        """
+        Make the data for the wbeditentity call.
+
+        New claims are sent with the GUID given to them in add_claim() and
+        pre-existing, but modified, claims are sent in full with their id.
+
+        @rtype: dict
+        """
+        data = dict()
+        if self.labels:
+            data['labels'] = self.labels
+        if self.aliases:
+            data['aliases'] = self.aliases
+        if self.descriptions:
+            data['descriptions'] = self.descriptions
+        if self.claims:
+            data['claims'] = [claim.toJSON() for claim in self.claims]
+        return data
+
+    def make_summary(self):
+        """Make an edit summary describing all of the recorded changes."""
+        parts = []
+        for typ, data in (('label', self.labels),
+                          ('alias', self.aliases),
+                          ('description', self.descriptions)):
+            if data:
+                parts.append('[{0}] {1}'.format(
+                    ', '.join(sorted(data.keys())), typ))
+        for typ, num in (('claim', self.num_new_claims),
+                         ('qualifier', self.num_qualifiers),
+                         ('reference', self.num_references)):
+            if num:
+                parts.append('{0} {1}{2}'.format(
+                    num, typ, 's' if num > 1 else ''))
+
+        edit_summary = 'Added {0} to [[{1}]]'.format(
+            ', '.join(parts), self.item.title())
+        if self.summary:
+            edit_summary = '{0}, {1}'.format(edit_summary, self.summary)
+        return edit_summary
+
+    def reset(self):
+        """Forget all recorded changes."""
+        self.labels = dict()
+        self.aliases = dict()
+        self.descriptions = dict()
+        self.claims = []
+        self._claim_ids = set()
+        self.num_new_claims = 0
+        self.num_qualifiers = 0
+        self.num_references = 0
+        self.journal_entries = []
+
+    def write_journal(self):
+        """Record the journal entries in the journal of WikidataStuff."""
+        for prop, statement, ref in self.journal_entries:
+            self.wd_stuff.journal.record(
+                self.item.getID(), prop, statement,
+                ClaimIndex.get_revision(self.item), ref=ref)
+
+    def flush(self):
+        """
+        Save all recorded changes to the item in a single edit.
+
+        @return: if an edit was made
+        @rtype: bool
+        """
+        if not self.has_changes():
+            self.write_journal()
+            self.reset()
+            return False
+
+        edit_summary = self.make_summary()
+        try:
+            # writes to database
+            self.wd_stuff.write(
+                self.item.editEntity, self.to_json(), summary=edit_summary)
+            pywikibot.output(edit_summary)
+            self.write_journal()
+            return True
+        except pywikibot.data.api.APIError as e:
+            if e.code == 'modification-failed':
+                pywikibot.output(
+                    'modification-failed error: edit session on {0}'.format(
+                        self.item))
+                return False
+            else:
+                raise pywikibot.Error(
+                    'Something went very wrong trying to save '
+                    'an edit session: {}'.format(e))
+        finally:
+            self.reset()
@@ -0,0 +1,208 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Preload items in bulk, in the background, for mass imports."""
+from __future__ import unicode_literals
+from builtins import dict, object
+import queue
+import sys
+import threading
+
+import pywikibot
+
+import wikidatastuff.helpers as helpers
+
+MAX_IDS = 50  # maximum number of ids per wbgetentities call
+
+
+class ItemPreloader(object):
+    """
+    Load many items using as few, and as parallel, requests as possible.
+
+    Items are fetched in chunks using wbgetentities. The fetching is done in
+    a background thread so that the next chunk is being fetched while the
+    items of the current chunk are being processed. The number of fetched,
+    but not yet processed, chunks is bounded.
+
+    Usage:
+
+        preloader = ItemPreloader(repo)
+        for item, payload in preloader.preload(entries):
+            ...
+    """
+
+    def __init__(self, repo, chunk_size=MAX_IDS, max_chunks=2, props=None,
+                 languages=None):
+        """
+        Initialise the preloader.
+
+        @param repo: the Wikibase site to load the items from
+        @type repo: pywikibot.site.DataSite
+        @param chunk_size: number of items to fetch per request, at most 50.
+        @type chunk_size: int
+        @param max_chunks: maximum number of fetched chunks waiting to be
+            processed.
+        @type max_chunks: int
+        @param props: the entity data to fetch, e.g. ['claims', 'labels'].
+            "info" is always fetched since it holds the revision id. If None
+            then all data is fetched.
+        @type props: list of basestring|None
+        @param languages: the languages for which to fetch labels, aliases
+            and descriptions. If None then all languages are fetched.
+        @type languages: list of basestring|None
+        """
+        if not 0 < chunk_size <= MAX_IDS:
+            raise ValueError(
+                'chunk_size must be between 1 and {}'.format(MAX_IDS))
+        self.repo = repo
+        self.chunk_size = chunk_size
+        self.max_chunks = max(1, max_chunks)
+        self.props = props
+        self.languages = languages
+
+    def make_request(self, qids):
+        """
+        Make the wbgetentities request for a chunk of items.
+
+        @param qids: ids of the items to fetch
+        @type qids: list of basestring
+        @rtype: pywikibot.data.api.Request
+        """
+        parameters = {
+            'action': 'wbgetentities',
+            'ids': '|'.join(qids)}
+        if self.props is not None:
+            props = ['info'] + [prop for prop in self.props if prop != 'info']
+            parameters['props'] = '|'.join(props)
+        if self.languages is not None:
+            parameters['languages'] = '|'.join(self.languages)
+        return pywikibot.data.api.Request(site=self.repo, parameters=parameters)
+
+    def fetch_entities(self, qids):
+        """
+        Fetch the entity data for a chunk of items in a single request.
+
+        Redirects are followed, in which case the data is that of the target
+        of the redirect.
+
+        @param qids: ids of the items to fetch
+        @type qids: list of basestring
+        @return: the entity data, or None if it does not exist, per item id
+        @rtype: dict
+        """
+        data = self.make_request(qids).submit()
+
+        entities = dict()
+        for key, entity in data.get('entities', {}).items():
+            if 'redirects' in entity:
+                key = entity['redirects']['from']
+            entities[key] = entity
+
+        results = dict()
+        for qid in qids:
+            entity = entities.get(qid)
+            if entity is None or 'missing' in entity:
+                entity = None
+            results[qid] = entity
+        return results
+
+    def fetch(self, qids):
+        """
+        Fetch and load a chunk of items in a single request.
+
+        Redirects are followed, in which case the returned item is the target
+        of the redirect.
+
+        @param qids: ids of the items to fetch
+        @type qids: list of basestring
+        @return: the loaded item, or None if it does not exist, per item id
+        @rtype: dict
+        """
+        items = dict()
+        for qid, entity in self.fetch_entities(qids).items():
+            if entity is None:
+                items[qid] = None
+                continue
+            item = pywikibot.ItemPage(self.repo, entity['id'])
+            item._content = entity  # prevents get() from making an API call
+            item.get()
+            items[qid] = item
+        return items
+
+    def load(self, item):
+        """
+        Load the contents of a single, not yet loaded, item.
+
+        As opposed to item.get() this only fetches the configured props and
+        languages. Like item.get() a redirect results in the content of the
+        target being loaded (and the item being flagged as a redirect).
+
+        @param item: the item to load
+        @type item: pywikibot.ItemPage
+        """
+        qid = item.getID()
+        entity = self.fetch_entities([qid])[qid]
+        if entity is None:
+            item._content = {'id': qid, 'missing': ''}
+            return
+        item._content = entity  # prevents get() from making an API call
+        item.get(get_redirect=True)
+
+    def preload(self, entries):
+        """
+        Preload the items of an iterable of (qid, payload) entries.
+
+        Yields each entry, in the original order, with the qid replaced by
+        the loaded item (or None if the item does not exist).
+
+        @param entries: the items to load and the payload to pass along with
+            each of them
+        @type entries: iterable of (basestring, object)
+        @rtype: generator of (pywikibot.ItemPage|None, object)
+        """
+        chunk_queue = queue.Queue(maxsize=self.max_chunks)
+        stop = threading.Event()
+        end = object()  # sentinel marking that all chunks were fetched
+
+        def put(value):
+            """Put a value on the queue unless the consumer has stopped."""
+            while not stop.is_set():
+                try:
+                    chunk_queue.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            """Fetch all chunks and put them, or any error, on the queue."""
+            try:
+                for chunk in helpers.chunks(entries, self.chunk_size):
+                    chunk = [(helpers.std_q(qid), payload)
+                             for qid, payload in chunk]
+                    items = self.fetch([qid for qid, payload in chunk])
+                    if not put((chunk, items, None)):
+                        return
+            except Exception:
+                put((None, None, sys.exc_info()[1]))
+                return
+            put((end, None, None))
+
+        thread = threading.Thread(target=produce)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                chunk, items, error = chunk_queue.get()
+                if error is not None:
+                    raise error
+                if chunk is end:
+                    break
+                for qid, payload in chunk:
+                    yield items[qid], payload
+        finally:
+            stop.set()
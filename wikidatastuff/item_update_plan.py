@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Immutable descriptions of the changes to be made to an item."""
+from __future__ import unicode_literals
+from builtins import object
+from collections import Counter, namedtuple
+
+
+class ClaimChange(namedtuple(
+        'ClaimChange', ['prop', 'statement', 'claim', 'qualifiers', 'ref',
+                        'new_claim', 'folded'])):
+    """
+    The changes needed for a single Statement to be present on an item.
+
+    @ivar prop: property id, with "P" prefix
+    @type prop: basestring
+    @ivar statement: the statement being imported
+    @type statement: Statement
+    @ivar claim: the pre-existing claim to update or None if the claim is
+        not yet on the item
+    @type claim: pywikibot.Claim|None
+    @ivar qualifiers: qualifiers to add to the claim. For a new claim these
+        are all of the qualifiers of the statement.
+    @type qualifiers: tuple of Qualifier
+    @ivar ref: reference to add to the claim or None if no reference is
+        needed
+    @type ref: Reference|None
+    @ivar new_claim: plan-local id of the new claim made, or updated, by the
+        change or None if not part of a plan
+    @type new_claim: int|None
+    @ivar folded: whether the statement is folded into a new claim made by
+        an earlier change (with the same new_claim id) of the plan
+    @type folded: bool
+    """
+
+    __slots__ = ()
+
+    def is_new(self):
+        """Whether a new claim needs to be made."""
+        return self.claim is None and not self.folded
+
+    def is_empty(self):
+        """Whether the statement is already fully present on the item."""
+        return not (self.is_new() or self.qualifiers or self.ref)
+
+
+class PlannedClaim(object):
+    """
+    Stand-in for a new claim while planning the changes to an item.
+
+    Only holds the keys of the qualifiers and sources planned for the claim
+    so that later statements can be matched against it, as if it had already
+    been written. It is never part of the finished plan.
+
+    @ivar new_claim: plan-local id of the new claim
+    @type new_claim: int
+    @ivar qualifier_keys: the number of planned qualifiers per key, see
+        Qualifier.canonical_key()
+    @type qualifier_keys: Counter
+    @ivar source_keys: the keys of all planned source claims, see
+        ClaimIndex.snak_key()
+    @type source_keys: set
+    """
+
+    def __init__(self, new_claim):
+        """
+        Initialise a PlannedClaim without any qualifiers or sources.
+
+        @param new_claim: plan-local id of the new claim
+        @type new_claim: int
+        """
+        self.new_claim = new_claim
+        self.qualifier_keys = Counter()
+        self.source_keys = set()
+
+    @property
+    def qualifiers(self):
+        """Return the properties of the planned qualifiers."""
+        return set(prop for prop, _ in self.qualifier_keys)
+
+    @property
+    def sources(self):
+        """Return the keys of the planned sources."""
+        return self.source_keys
+
+    def add_qualifiers(self, quals):
+        """
+        Plan some more qualifiers for the claim.
+
+        @param quals: the qualifiers
+        @type quals: list of Qualifier
+        """
+        self.qualifier_keys.update(qual.canonical_key() for qual in quals)
+
+    def add_source_keys(self, keys):
+        """
+        Plan some more source claims for the claim.
+
+        @param keys: the keys of the source claims, see ClaimIndex.snak_key()
+        @type keys: iterable
+        """
+        self.source_keys.update(keys)
+
+
+class ItemUpdatePlan(namedtuple(
+        'ItemUpdatePlan', ['item', 'labels', 'aliases', 'descriptions',
+                           'claims', 'ref'])):
+    """
+    All of the changes needed to update a single item.
+
+    Produced by WikidataStuff.plan_item_update() and consumed by
+    WikidataStuff.apply_item_update(). Making the plan only reads from the
+    (loaded) item so that the planning and the writing can be separated.
+
+    @ivar item: the item to update
+    @type item: pywikibot.ItemPage
+    @ivar labels: new labels as (language, label) pairs
+    @type labels: tuple of (basestring, basestring)
+    @ivar aliases: new aliases as (language, all aliases) pairs
+    @type aliases: tuple of (basestring, tuple of basestring)
+    @ivar descriptions: new descriptions as (language, description) pairs
+    @type descriptions: tuple of (basestring, basestring)
+    @ivar claims: the changes per statement
+    @type claims: tuple of ClaimChange
+    @ivar ref: the reference given for every claim, overriding any reference
+        embedded in the statements, or None
+    @type ref: Reference|None
+    """
+
+    __slots__ = ()
+
+    def is_empty(self):
+        """Whether applying the plan would not change the item."""
+        return not (self.labels or self.aliases or self.descriptions or
+                    any(not c.is_empty() for c in self.claims))
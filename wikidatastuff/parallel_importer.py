@@ -0,0 +1,156 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Process many items concurrently using a pool of worker threads."""
+from __future__ import unicode_literals
+from builtins import dict, object, range
+import queue
+import sys
+import threading
+
+import wikidatastuff.helpers as helpers
+
+
+class ParallelImporter(object):
+    """
+    Process many items concurrently on a number of worker threads.
+
+    All workers share the same WikidataStuff instance, and thereby the same
+    repo with its property type cache as well as the process-wide redirect
+    cache. Each item is only handled by one worker at a time, entries for an
+    item already being handled wait until that worker is done. Writes still
+    pass through the (thread safe) write throttle of pywikibot so the edit
+    rate limit is respected regardless of the number of workers.
+
+    Each worker loads the item of an entry and passes it, together with the
+    payload of the entry, to a process function:
+
+        def process(item, payload):
+            wd_stuff.add_new_claim(prop, payload, item, ref)
+
+        importer = ParallelImporter(wd_stuff, num_workers=4)
+        importer.run(entries, process)
+    """
+
+    def __init__(self, wd_stuff, num_workers=4):
+        """
+        Initialise the importer.
+
+        @param wd_stuff: the WikidataStuff instance shared by all workers
+        @type wd_stuff: WikidataStuff
+        @param num_workers: the number of worker threads
+        @type num_workers: int
+        """
+        if num_workers < 1:
+            raise ValueError('num_workers must be at least 1')
+        self.wd_stuff = wd_stuff
+        self.num_workers = num_workers
+        self._item_locks = dict()  # qid: [lock, number of users]
+        self._item_locks_lock = threading.Lock()
+
+    def acquire_item(self, qid):
+        """
+        Wait until no other worker is handling the item, then claim it.
+
+        @param qid: the id of the item
+        @type qid: basestring
+        """
+        with self._item_locks_lock:
+            entry = self._item_locks.setdefault(qid, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def release_item(self, qid):
+        """
+        Release an item claimed through acquire_item().
+
+        @param qid: the id of the item
+        @type qid: basestring
+        """
+        with self._item_locks_lock:
+            entry = self._item_locks[qid]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._item_locks[qid]
+        entry[0].release()
+
+    def process_entry(self, qid, payload, process):
+        """
+        Load the item of a single entry and process it.
+
+        @param qid: the id of the item
+        @type qid: basestring
+        @param payload: passed on to the process function
+        @param process: function taking the loaded item and the payload
+        @type process: callable
+        @return: the outcome of the process function
+        """
+        self.acquire_item(qid)
+        try:
+            item = self.wd_stuff.q_to_itempage(qid)
+            self.wd_stuff.load_item(item)
+            return process(item, payload)
+        finally:
+            self.release_item(qid)
+
+    def run(self, entries, process):
+        """
+        Process all entries using the worker threads.
+
+        If any entry raises an error then no further entries are started and
+        the (first) error is re-raised once all workers have stopped.
+
+        @param entries: the items to process and the payload to pass along
+            with each of them
+        @type entries: iterable of (basestring|int, object)
+        @param process: function taking the loaded item and the payload
+        @type process: callable
+        @return: the outcome of the process function for each entry, in the
+            original order
+        @rtype: list
+        """
+        task_queue = queue.Queue(maxsize=2 * self.num_workers)
+        stop = threading.Event()
+        results = dict()
+        errors = []
+
+        def work():
+            """Process entries until told to stop."""
+            while True:
+                task = task_queue.get()
+                if task is None:
+                    return
+                if stop.is_set():
+                    continue
+                i, qid, payload = task
+                try:
+                    results[i] = self.process_entry(qid, payload, process)
+                except Exception:
+                    errors.append(sys.exc_info()[1])
+                    stop.set()
+
+        workers = [threading.Thread(target=work)
+                   for _ in range(self.num_workers)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        try:
+            num_entries = 0
+            for i, (qid, payload) in enumerate(entries):
+                if stop.is_set():
+                    break
+                task_queue.put((i, helpers.std_q(qid), payload))
+                num_entries += 1
+        finally:
+            for worker in workers:
+                task_queue.put(None)
+            for worker in workers:
+                worker.join()
+
+        if errors:
+            raise errors[0]
+        return [results[i] for i in range(num_entries)]
@@ -9,7 +9,15 @@ from collections import OrderedDict
 import pywikibot
 
 import wikidatastuff.helpers as helpers
+from wikidatastuff.qualifier import Qualifier
 from wikidatastuff.statement import Statement
+from wikidatastuff.values import (
+    ItemValue,
+    MonolingualTextValue,
+    QuantityValue,
+    StringValue,
+    TimeValue
+)
 
 
 class PreviewItem(object):
@@ -157,7 +165,9 @@ class PreviewItem(object):
 
     @staticmethod
     def format_claim(claim):
-        """Create a preview for a single pywikibot.Claim."""
+        """Create a preview for a single pywikibot.Claim (or Qualifier)."""
+        if isinstance(claim, Qualifier):
+            return PreviewItem.format_qual(claim)
         special = False
         itis = claim.getTarget()
         if claim.getSnakType() != 'value':
@@ -189,6 +199,8 @@ class PreviewItem(object):
 
         if isinstance(itis, pywikibot.ItemPage):
             return PreviewItem.make_wikidata_template(itis)
+        elif isinstance(itis, ItemValue):
+            return PreviewItem.make_wikidata_template(itis.id.id)
         elif special:
             return PreviewItem.make_wikidata_template(itis, special=True)
         elif isinstance(itis, pywikibot.WbQuantity):
@@ -197,8 +209,19 @@ class PreviewItem(object):
             if unit:
                 unit = PreviewItem.make_wikidata_template(unit)
             return '{} {}'.format(amount, unit).strip()
+        elif isinstance(itis, QuantityValue):
+            unit = ''
+            if itis.unit is not None:
+                unit = PreviewItem.make_wikidata_template(itis.unit.id)
+            return '{} {}'.format(itis.amount, unit).strip()
         elif isinstance(itis, pywikibot.WbTime):
             return itis.toTimestr()
+        elif isinstance(itis, TimeValue):
+            return itis.to_timestr()
+        elif isinstance(itis, MonolingualTextValue):
+            return '{} ({})'.format(itis.text, itis.language)
+        elif isinstance(itis, StringValue):
+            return itis.text
         else:
             return str(itis)
 
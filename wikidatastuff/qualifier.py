@@ -7,8 +7,10 @@
 """A class for encoding the contents of a qualifier."""
 from __future__ import unicode_literals
 from builtins import object
+from collections import Counter, OrderedDict
+import threading
 
-from wikidatastuff.helpers import std_p
+from wikidatastuff.helpers import std_p, target_key
 
 
 class Qualifier(object):
@@ -18,21 +20,97 @@ class Qualifier(object):
     Essentially pywikibot.Claim without having to provide an instantiated
     repo.
 
+    Qualifiers are immutable, use Qualifier.of() to share a single instance
+    between many statements.
+
     @todo: redo as SimpleClaim (if so reuse in Reference) or
            retire in favor of pywikibot.Claim
     """
 
+    __slots__ = ('_prop', '_itis', '_key', '_hash')
+
+    MAX_CACHED = 10000  # max number of shared instances kept by of()
+    _cache = OrderedDict()  # (prop, target key): Qualifier
+    _props = dict()  # raw prop: standardised prop
+    _cache_lock = threading.Lock()
+
     def __init__(self, prop, itis):
         """
         Make a correctly formatted qualifier object for claims.
 
+        @param prop: the property (with or without "P")
+        @type prop: basestring
+        @param itis: a valid claim target e.g. pywikibot.ItemPage or a
+            lightweight value from wikidatastuff.values
+        @type itis: object
+        """
+        self._prop = std_p(prop)
+        self._itis = itis
+        self._key = None
+        self._hash = None
+
+    @classmethod
+    def of(cls, prop, itis):
+        """
+        Get a shared Qualifier, creating it if needed.
+
+        The most recently used qualifiers are kept in a bounded cache keyed
+        on the property and the target key, see helpers.target_key().
+        Qualifiers with unkeyable targets are never shared.
+
         @param prop: the property (with or without "P")
         @type prop: basestring
         @param itis: a valid claim target e.g. pywikibot.ItemPage
         @type itis: object
+        @rtype: Qualifier
         """
-        self.prop = std_p(prop)
-        self.itis = itis
+        std_prop = cls._props.get(prop)
+        if std_prop is None:
+            std_prop = cls._props.setdefault(prop, std_p(prop))
+        key = target_key(itis)
+        if key is None:
+            return cls(std_prop, itis)
+
+        key = (std_prop, key)
+        with cls._cache_lock:
+            qual = cls._cache.pop(key, None)
+            # a shared key does not guarantee an identical target
+            if qual is None or qual.itis != itis:
+                qual = cls(std_prop, itis)
+            cls._cache[key] = qual
+            while len(cls._cache) > cls.MAX_CACHED:
+                cls._cache.popitem(last=False)
+        return qual
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop all shared qualifiers."""
+        with cls._cache_lock:
+            cls._cache.clear()
+
+    @property
+    def prop(self):
+        """Return the property, with "P" prefix."""
+        return self._prop
+
+    @property
+    def itis(self):
+        """Return the target of the qualifier."""
+        return self._itis
+
+    def canonical_key(self):
+        """
+        Return a canonical key for the qualifier.
+
+        Qualifiers considered identical by WikidataStuff share the same key,
+        see helpers.target_key().
+
+        @rtype: tuple
+        """
+        if self._key is None:
+            self._key = (
+                self._prop, target_key(self._itis) or ('value', self._itis))
+        return self._key
 
     def __repr__(self):
         """Return a more complete string representation."""
@@ -41,7 +119,8 @@ class Qualifier(object):
     def __eq__(self, other):
         """Implement equality comparison."""
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self is other or (self._prop == other._prop and
+                                     self._itis == other._itis)
         return NotImplemented
 
     def __ne__(self, other):
@@ -50,4 +129,18 @@ class Qualifier(object):
 
     def __hash__(self):
         """Implement hash to allow for e.g. sorting and sets."""
-        return hash((self.prop, self.itis))
+        if self._hash is None:
+            self._hash = hash(self.canonical_key())
+        return self._hash
+
+
+def qualifier_keys(quals):
+    """
+    Make the multiset of canonical keys of some qualifiers.
+
+    @param quals: the qualifiers
+    @type quals: iterable of Qualifier
+    @return: the number of qualifiers per key
+    @rtype: Counter
+    """
+    return Counter(qual.canonical_key() for qual in quals)
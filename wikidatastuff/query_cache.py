@@ -0,0 +1,176 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""An on-disk cache of SPARQL query results."""
+from __future__ import unicode_literals
+from builtins import object
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+# string literals and IRIs, inside which whitespace is significant
+LITERAL_PATTERN = re.compile(
+    r'"""(?:[^\\]|\\.)*?"""|\'\'\'(?:[^\\]|\\.)*?\'\'\'|'
+    r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>\s]*>',
+    re.DOTALL)
+
+
+def normalise_query(query):
+    """
+    Normalise the whitespace of a SPARQL query.
+
+    Runs of whitespace are collapsed into a single space, except inside
+    string literals and IRIs.
+
+    @param query: the query
+    @type query: str
+    @rtype: str
+    """
+    parts = []
+    end = 0
+    for match in LITERAL_PATTERN.finditer(query):
+        parts.append(' '.join(query[end:match.start()].split()))
+        parts.append(match.group())
+        end = match.end()
+    parts.append(' '.join(query[end:].split()))
+    return ' '.join(part for part in parts if part)
+
+
+class QueryCache(object):
+    """
+    An sqlite backed cache of the raw responses to SPARQL queries.
+
+    Responses are keyed on a hash of the endpoint and the normalised query
+    (see normalise_query()) and stored compressed. Entries older than the
+    time-to-live are ignored, and once the total size exceeds max_size the
+    least recently used entries are evicted. The cache file can be shared
+    between processes.
+
+        cache = QueryCache('wdqs_cache.sqlite', ttl=24 * 3600)
+        wdqs_lookup.default_client = WdqsClient(cache=cache)
+    """
+
+    def __init__(self, filename, ttl=None, max_size=256 * 1024 * 1024):
+        """
+        Open a cache, creating the file if needed.
+
+        @param filename: path to the sqlite file, or ':memory:'
+        @type filename: basestring
+        @param ttl: the default time-to-live of entries, in seconds, or None
+            for entries never to expire
+        @type ttl: int|float|None
+        @param max_size: the maximum total (compressed) size of the cached
+            responses, in bytes
+        @type max_size: int
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            filename, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, created REAL, accessed REAL, '
+                'size INTEGER, data BLOB)')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS results_accessed '
+                'ON results (accessed)')
+
+    @staticmethod
+    def make_key(endpoint, query, result_format=None):
+        """
+        Make the cache key of a query.
+
+        @param endpoint: the SPARQL endpoint
+        @type endpoint: basestring
+        @param query: the query
+        @type query: str
+        @param result_format: the format of the response, if not the default
+        @type result_format: basestring|None
+        @rtype: str
+        """
+        text = '{0}\n{1}'.format(endpoint, normalise_query(query))
+        if result_format:
+            text = '{0}\n{1}'.format(result_format, text)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, key, ttl=None):
+        """
+        Get a cached response, unless missing or expired.
+
+        @param key: the cache key, see make_key()
+        @type key: str
+        @param ttl: the time-to-live, in seconds, overriding the default
+        @type ttl: int|float|None
+        @return: the raw response or None if not cached
+        @rtype: str|None
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                'SELECT created, data FROM results WHERE key = ?',
+                (key, )).fetchone()
+            if row is None or (ttl is not None and row[0] + ttl < now):
+                return None
+            self._db.execute(
+                'UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+        return zlib.decompress(bytes(row[1])).decode('utf-8')
+
+    def set(self, key, text):
+        """
+        Store a response, evicting the least recently used if needed.
+
+        @param key: the cache key, see make_key()
+        @type key: str
+        @param text: the raw response
+        @type text: str
+        """
+        data = zlib.compress(text.encode('utf-8'))
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                (key, now, now, len(data), sqlite3.Binary(data)))
+            self._evict()
+
+    def _evict(self):
+        """Drop the least recently used entries exceeding max_size."""
+        total = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_size:
+            return
+        rows = self._db.execute(
+            'SELECT key, size FROM results ORDER BY accessed DESC').fetchall()
+        keep = 0
+        dropped = []
+        for key, size in rows:
+            if dropped or keep + size > self.max_size:
+                dropped.append((key, ))
+            else:
+                keep += size
+        self._db.executemany('DELETE FROM results WHERE key = ?', dropped)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM results')
+
+    def __len__(self):
+        """Return the number of cached responses."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        """Close the cache file."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Process-wide cache of entity redirects."""
+from __future__ import unicode_literals
+from builtins import dict, object
+from collections import OrderedDict
+import threading
+import time
+
+import pywikibot
+
+import wikidatastuff.helpers as helpers
+
+MAX_IDS = 50  # maximum number of ids per wbgetentities call
+
+
+class RedirectCache(object):
+    """
+    Cache of which entities are redirects, and to where.
+
+    Entries are keyed on the entity id and store the id of the redirect
+    target (or the entity id itself if it is not a redirect). Entries expire
+    after a given time and the least recently used entries are dropped once
+    the cache grows beyond a given size.
+
+    The cache is thread safe. A process-wide instance is available as
+    redirect_cache.redirect_cache.
+    """
+
+    def __init__(self, max_size=100000, ttl=24 * 60 * 60):
+        """
+        Initialise an empty cache.
+
+        @param max_size: maximum number of entries to keep
+        @type max_size: int
+        @param ttl: number of seconds after which an entry expires. If None
+            then entries never expire.
+        @type ttl: int|None
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache = OrderedDict()  # entity id: (target id, timestamp)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of entries in the cache."""
+        return len(self._cache)
+
+    def get(self, entity_id):
+        """
+        Get the redirect target of an entity.
+
+        @param entity_id: id of the entity, e.g. "Q42"
+        @type entity_id: basestring
+        @return: id of the redirect target, the entity id if it is not a
+            redirect or None if the entity is not in the cache.
+        @rtype: basestring|None
+        """
+        with self._lock:
+            entry = self._cache.pop(entity_id, None)
+            if entry is None:
+                return None
+            target, timestamp = entry
+            if self.ttl is not None and time.time() - timestamp > self.ttl:
+                return None
+            self._cache[entity_id] = entry  # mark as most recently used
+            return target
+
+    def set(self, entity_id, target):
+        """
+        Store the redirect target of an entity.
+
+        @param entity_id: id of the entity, e.g. "Q42"
+        @type entity_id: basestring
+        @param target: id of the redirect target, or the entity id itself if
+            it is not a redirect.
+        @type target: basestring
+        """
+        with self._lock:
+            self._cache.pop(entity_id, None)
+            self._cache[entity_id] = (target, time.time())
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._cache.clear()
+
+    def resolve(self, repo, entity_ids):
+        """
+        Resolve the redirect targets of many entities.
+
+        Any entities not already in the cache are looked up using as few
+        wbgetentities calls as possible and the results are cached.
+
+        @param repo: the Wikibase site to look up the entities on
+        @type repo: pywikibot.site.DataSite
+        @param entity_ids: ids of the entities to look up
+        @type entity_ids: iterable of basestring
+        @return: the redirect target for each of the entities, see get()
+        @rtype: dict
+        """
+        results = dict()
+        unknown = []
+        for entity_id in entity_ids:
+            if entity_id in results:
+                continue
+            target = self.get(entity_id)
+            results[entity_id] = target
+            if target is None:
+                unknown.append(entity_id)
+
+        for chunk in helpers.chunks(unknown, MAX_IDS):
+            targets = self._fetch(repo, chunk)
+            for entity_id in chunk:
+                target = targets.get(entity_id, entity_id)
+                self.set(entity_id, target)
+                results[entity_id] = target
+
+        return results
+
+    @staticmethod
+    def _fetch(repo, entity_ids):
+        """
+        Look up redirects for at most MAX_IDS entities.
+
+        @return: redirect targets for those entities which are redirects
+        @rtype: dict
+        """
+        request = pywikibot.data.api.Request(
+            site=repo,
+            parameters={
+                'action': 'wbgetentities',
+                'ids': '|'.join(entity_ids),
+                'props': 'info'})
+        data = request.submit()
+
+        targets = dict()
+        for entity in data.get('entities', {}).values():
+            if 'redirects' in entity:
+                targets[entity['redirects']['from']] = \
+                    entity['redirects']['to']
+        return targets
+
+
+redirect_cache = RedirectCache()
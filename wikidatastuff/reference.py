@@ -7,10 +7,14 @@
 """A class for encoding the contents of a reference."""
 from __future__ import unicode_literals
 from builtins import object
+from collections import Counter
+import threading
+import weakref
 
 import pywikibot
 
 import wikidatastuff.helpers as helpers
+from wikidatastuff.qualifier import Qualifier
 
 
 class Reference(object):
@@ -24,18 +28,33 @@ class Reference(object):
     want to compare sources on the URL but not the date.
 
     A comparison will fail if ANY of the source_test sources are present.
+
+    Two References are equal if they have the same source_test and the same
+    source_notest claims, regardless of order. Use Reference.intern() to
+    share a single instance between all equal references.
+
+    The sources may be given as pywikibot.Claims or, if no repo should be
+    needed to build the Reference, as Qualifiers (e.g. holding values from
+    wikidatastuff.values). The latter are converted to claims when written.
+
+    The sources should not be modified once the Reference has been created.
     """
 
+    __slots__ = ('source_test', 'source_notest', '_key', '__weakref__')
+
+    _interned = weakref.WeakValueDictionary()
+    _intern_lock = threading.Lock()
+
     def __init__(self, source_test=None, source_notest=None):
         """
         Make a Reference object from the provided sources.
 
         @param source_test: claims which should be included in
           comparison tests
-        @type source_test: pywikibot.Claim|list of pywikibot.Claim
+        @type source_test: pywikibot.Claim|Qualifier|list of those
         @param source_notest: claims which should be excluded from
           comparison tests
-        @type source_notest: pywikibot.Claim|list of pywikibot.Claim
+        @type source_notest: pywikibot.Claim|Qualifier|list of those
         """
         # avoid mutable default arguments
         source_test = source_test or []
@@ -44,6 +63,7 @@ class Reference(object):
         # standardise the two types of allowed input
         self.source_test = helpers.listify(source_test)
         self.source_notest = helpers.listify(source_notest)
+        self._key = None
 
         # validate input
         self.validate_sources()
@@ -54,15 +74,104 @@ class Reference(object):
         if not sources:
             raise pywikibot.Error(
                 'You tried to create a reference without any sources')
-        if not all(isinstance(s, pywikibot.Claim) for s in sources):
+        if not all(isinstance(s, (pywikibot.Claim, Qualifier))
+                   for s in sources):
             raise pywikibot.Error(
                 'You tried to create a reference with a non-Claim source')
 
+    @classmethod
+    def intern(cls, source_test=None, source_notest=None):
+        """
+        Make a Reference, or reuse an existing equal one.
+
+        The shared instance lives as long as anyone holds on to it, and must
+        not be modified.
+
+        @param source_test: claims which should be included in
+          comparison tests
+        @type source_test: pywikibot.Claim|Qualifier|list of those
+        @param source_notest: claims which should be excluded from
+          comparison tests
+        @type source_notest: pywikibot.Claim|Qualifier|list of those
+        @rtype: Reference
+        """
+        ref = cls(source_test, source_notest)
+        key = ref._value_key()
+        with cls._intern_lock:
+            shared = cls._interned.get(key)
+            if shared is None:
+                cls._interned[key] = shared = ref
+        return shared
+
+    @staticmethod
+    def get_snak(source):
+        """
+        Return the property, snak type and target of a source.
+
+        @param source: a source of the Reference
+        @type source: pywikibot.Claim|Qualifier
+        @rtype: tuple of (basestring, basestring, object)
+        """
+        if isinstance(source, Qualifier):
+            return (source.prop, 'value', source.itis)
+        return (source.getID(), source.getSnakType(), source.getTarget())
+
+    @staticmethod
+    def _snak_key(source):
+        """Make a hashable key for the value of a source."""
+        prop, snaktype, target = Reference.get_snak(source)
+        if isinstance(target, pywikibot.page.WikibasePage):
+            target = target.getID()
+        return (prop, snaktype, target)
+
+    def _value_key(self):
+        """Make an order independent key for the sources, for comparisons."""
+        if self._key is None:
+            self._key = tuple(
+                frozenset(Counter(
+                    Reference._snak_key(source) for source in sources
+                ).items())
+                for sources in (self.source_test, self.source_notest))
+        return self._key
+
     def get_all_sources(self):
         """Return all the sources of a Reference."""
         return self.source_test + self.source_notest
 
+    def canonical_key(self):
+        """
+        Return a canonical, order independent, key for the reference.
+
+        @return: the (property, target key) pairs of the tested and untested
+            sources, see helpers.target_key()
+        @rtype: tuple
+        """
+        def source_keys(sources):
+            keys = []
+            for source in sources:
+                prop, _, target = Reference.get_snak(source)
+                keys.append(
+                    (prop, helpers.target_key(target) or ('value', target)))
+            return tuple(sorted(keys, key=helpers.canonical_json))
+
+        return (source_keys(self.source_test),
+                source_keys(self.source_notest))
+
     def __repr__(self):
         """Return a more complete string representation."""
         return 'WD.Reference(test: {0}, no_test: {1})'.format(
             self.source_test, self.source_notest)
+
+    def __eq__(self, other):
+        """Two References are equal if they have the same sources."""
+        if isinstance(other, self.__class__):
+            return self is other or self._value_key() == other._value_key()
+        return NotImplemented
+
+    def __ne__(self, other):
+        """Implement non-equality comparison."""
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        """Implement hash to allow for e.g. sets and interning."""
+        return hash(self._value_key())
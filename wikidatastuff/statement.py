@@ -12,11 +12,21 @@ import pywikibot
 
 import wikidatastuff.helpers as helpers
 from wikidatastuff.reference import Reference
-from wikidatastuff.qualifier import Qualifier
+from wikidatastuff.qualifier import Qualifier, qualifier_keys
 
 
 class Statement(object):
-    """A representation of a statement (value, qualifiers, references)."""
+    """
+    A representation of a statement (value, qualifiers, references).
+
+    The value and type of a statement are fixed on creation. Qualifiers and
+    a reference may be added while building the statement, but it should be
+    treated as immutable once in use (e.g. as a key or set member) since its
+    hash is cached.
+    """
+
+    __slots__ = ('_itis', '_quals', '_ref', '_special', '_force',
+                 '_quals_list', '_hash')
 
     def __init__(self, itis, special=False):
         """
@@ -24,7 +34,8 @@ class Statement(object):
 
         @todo: itis test
 
-        @param itis: a valid claim target e.g. pywikibot.ItemPage
+        @param itis: a valid claim target e.g. pywikibot.ItemPage or a
+            lightweight value from wikidatastuff.values
         @type itis: object
         @param special: if itis is actually a snakvalue
         @type special: bool
@@ -33,11 +44,43 @@ class Statement(object):
             raise pywikibot.Error(
                 'You tried to create a special statement with a '
                 'non-allowed snakvalue: {}'.format(itis))
-        self.itis = itis
-        self._quals = set()
-        self.ref = None
-        self.special = special
-        self.force = False
+        self._itis = itis
+        self._quals = frozenset()
+        self._ref = None
+        self._special = special
+        self._force = False
+        self._changed()
+
+    def _changed(self):
+        """Drop any values cached for the previous contents."""
+        self._quals_list = None
+        self._hash = None
+
+    @property
+    def itis(self):
+        """Return the value of the statement."""
+        return self._itis
+
+    @property
+    def special(self):
+        """Return if the value is actually a snakvalue."""
+        return self._special
+
+    @property
+    def ref(self):
+        """Return the reference, if any."""
+        return self._ref
+
+    @property
+    def force(self):
+        """Return if qualifiers should be added even to sourced claims."""
+        return self._force
+
+    @force.setter
+    def force(self, value):
+        """Set if qualifiers should be added even to sourced claims."""
+        self._force = value
+        self._changed()
 
     def add_qualifier(self, qual, force=False):
         """
@@ -62,7 +105,9 @@ class Statement(object):
                 'than a Qualifier|None object: {}'.format(qual))
 
         # register qualifier
-        self._quals.add(qual)
+        if qual not in self._quals:
+            self._quals = self._quals | frozenset((qual, ))
+            self._changed()
         if force:
             self.force = True
         return self
@@ -88,7 +133,8 @@ class Statement(object):
                 'add_reference was called with something other '
                 'than a Reference object: {}'.format(ref))
         else:
-            self.ref = ref
+            self._ref = ref
+            self._changed()
 
         return self
 
@@ -98,8 +144,60 @@ class Statement(object):
 
     @property
     def quals(self):
-        """Return the list of qualifiers."""
-        return list(self._quals)
+        """
+        Return the list of qualifiers.
+
+        The list is shared between calls and must not be modified.
+        """
+        if self._quals_list is None:
+            self._quals_list = list(self._quals)
+        return self._quals_list
+
+    def qualifier_keys(self):
+        """
+        Return the multiset of canonical keys of the qualifiers.
+
+        @rtype: Counter
+        """
+        return qualifier_keys(self._quals)
+
+    def canonical_key(self, ref=None):
+        """
+        Return a canonical, qualifier order independent, key for the contents.
+
+        The force flag is not considered part of the contents.
+
+        @param ref: the reference used with the statement, overriding the
+            embedded one (as in WikidataStuff.add_new_claim())
+        @type ref: Reference|None
+        @rtype: tuple
+        """
+        itis = self._itis_key()
+        quals = tuple(sorted(
+            (qual.canonical_key() for qual in self._quals),
+            key=helpers.canonical_json))
+        ref = ref or self.ref
+        ref = ref.canonical_key() if ref else None
+        return (itis, quals, ref)
+
+    def _itis_key(self):
+        """Return a canonical key for the value, see helpers.target_key()."""
+        if self.special:
+            return ('special', self.itis)
+        return helpers.target_key(self.itis) or ('value', self.itis)
+
+    def fingerprint(self, ref=None):
+        """
+        Return a stable fingerprint of the contents, e.g. for journaling.
+
+        Unlike hash() the fingerprint is the same between runs.
+
+        @param ref: the reference used with the statement, overriding the
+            embedded one
+        @type ref: Reference|None
+        @rtype: str
+        """
+        return helpers.fingerprint(self.canonical_key(ref))
 
     def __repr__(self):
         """Return a more complete string representation."""
@@ -108,16 +206,24 @@ class Statement(object):
                     self.itis, self.quals, self.ref, self.special,
                     self.force))
 
+    def _contents(self):
+        """Return the contents on which equality is based."""
+        return (self._itis, self._quals, self._ref, self._special,
+                self._force)
+
     def __eq__(self, other):
         """Two Statements are equal if same up to qualifier order."""
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return (self is other or
+                    self._contents() == other._contents())
         return NotImplemented
 
     def __hash__(self):
         """Implement hash to allow for e.g. sorting and sets."""
-        return hash((self.itis, frozenset(self._quals), self.ref,
-                     self.special, self.force))
+        if self._hash is None:
+            self._hash = hash((self._itis_key(), self._quals, self._ref,
+                               self._special, self._force))
+        return self._hash
 
     def __ne__(self, other):
         """Implement non-equality comparison."""
@@ -146,12 +252,12 @@ def add_start_end_qualifiers(statement, start_val, end_val):
     quals = []
     if start_val:
         quals.append(
-            Qualifier(
+            Qualifier.of(
                 prop=helpers.START_P,
                 itis=helpers.iso_to_WbTime(start_val)))
     if end_val:
         quals.append(
-            Qualifier(
+            Qualifier.of(
                 prop=helpers.END_P,
                 itis=helpers.iso_to_WbTime(end_val)))
     for q in quals:
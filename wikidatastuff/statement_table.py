@@ -0,0 +1,361 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""A compact, columnar, table of statements for large batch imports."""
+from __future__ import unicode_literals
+from builtins import dict, object, range
+from array import array
+
+import pywikibot
+
+import wikidatastuff.helpers as helpers
+from wikidatastuff.entity_id import ItemId, PropertyId
+from wikidatastuff.qualifier import Qualifier
+from wikidatastuff.reference import Reference
+from wikidatastuff.statement import Statement
+from wikidatastuff.values import TimeValue
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None
+
+
+def _int64_array():
+    """Return an empty array of (at least) 64-bit signed integers."""
+    try:
+        return array(str('q'))
+    except ValueError:  # Python 2 lacks 'q'
+        return array(str('l'))
+
+
+class StatementTable(object):
+    """
+    A columnar table of (item, property, statement) rows.
+
+    Each row is stored in a handful of array columns: the numeric item and
+    property ids, the kind of value, the value itself (a numeric item id, a
+    compact date or an index into a list of other values) and the indexes
+    of its (shared) qualifier group and reference. Statement objects are
+    only made on demand, e.g. per item through iter_items().
+
+        table = StatementTable(repo)
+        table.add('Q42', 'P31', pywikibot.ItemPage(repo, 'Q5'), ref=ref)
+        for qid, protoclaims in table.iter_items():
+            item = wd_stuff.q_to_itempage(qid)
+            wd_stuff.apply_item_update(
+                wd_stuff.plan_item_update(item, protoclaims))
+
+    Dates are stored compactly if they are in the default calendar model of
+    the repo and lack any time, timezone or bounds. If numpy is installed
+    it is used for grouping the rows by item.
+    """
+
+    # kinds of values
+    OBJECT = 0
+    ITEM = 1
+    DATE = 2
+    SOMEVALUE = 3
+    NOVALUE = 4
+    FORCE = 0x80  # flag for forced statements, combined with the kind
+
+    NO_GROUP = -1
+
+    def __init__(self, repo):
+        """
+        Initialise an empty table.
+
+        @param repo: the repo used when making the targets of statements
+        @type repo: pywikibot.site.DataSite
+        """
+        self.repo = repo
+        self.calendarmodel = repo.calendarmodel()
+        self.items = array(str('l'))  # numeric item ids
+        self.props = array(str('l'))  # numeric property ids
+        self.kinds = array(str('B'))  # kind of value (and FORCE flag)
+        self.values = _int64_array()  # numeric id, date or object index
+        self.qual_groups = array(str('l'))  # index in _qual_groups
+        self.ref_groups = array(str('l'))  # index in _refs
+
+        self._objects = []  # other values
+        self._object_index = dict()  # (type, value): index in _objects
+        self._qual_groups = []  # tuples of Qualifiers
+        self._qual_group_index = dict()  # frozenset: index in _qual_groups
+        self._refs = []  # References
+        self._ref_index = dict()  # Reference: index in _refs
+        self._group_keys = dict()  # (qual group, ref): canonical key parts
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.items)
+
+    @staticmethod
+    def encode_date(wbtime):
+        """
+        Encode the date of a WbTime as a single integer.
+
+        @param wbtime: the time to encode, lacking time, timezone and bounds
+        @type wbtime: pywikibot.WbTime
+        @rtype: int
+        """
+        return (((wbtime.year * 100 + wbtime.month) * 100 + wbtime.day) *
+                100 + wbtime.precision)
+
+    def decode_date(self, value):
+        """
+        Decode a date encoded by encode_date().
+
+        @param value: the encoded date
+        @type value: int
+        @rtype: pywikibot.WbTime
+        """
+        value, precision = divmod(value, 100)
+        value, day = divmod(value, 100)
+        year, month = divmod(value, 100)
+        return pywikibot.WbTime(
+            year=year, month=month, day=day, precision=precision,
+            calendarmodel=self.calendarmodel, site=self.repo)
+
+    def _is_compact_date(self, wbtime):
+        """Check if a WbTime can be stored using encode_date()."""
+        return (wbtime.precision <= pywikibot.WbTime.PRECISION['day'] and
+                wbtime.calendarmodel == self.calendarmodel and
+                not (wbtime.hour or wbtime.minute or wbtime.second or
+                     wbtime.timezone or wbtime.before or wbtime.after))
+
+    def _encode_value(self, itis, special):
+        """Return the kind and encoded value of a statement target."""
+        if special:
+            if itis == 'somevalue':
+                return (self.SOMEVALUE, 0)
+            return (self.NOVALUE, 0)
+        elif isinstance(itis, pywikibot.ItemPage):
+            return (self.ITEM, int(itis.getID(numeric=True)))
+        elif (isinstance(itis, pywikibot.WbTime) and
+                self._is_compact_date(itis)):
+            return (self.DATE, self.encode_date(itis))
+
+        key = (type(itis), itis)  # e.g. 1 and True are not the same value
+        try:
+            index = self._object_index.get(key)
+        except TypeError:  # unhashable
+            self._objects.append(itis)
+            return (self.OBJECT, len(self._objects) - 1)
+        if index is None:
+            index = len(self._objects)
+            self._objects.append(itis)
+            self._object_index[key] = index
+        return (self.OBJECT, index)
+
+    def _decode_value(self, kind, value):
+        """Return the target of a statement, and if it is special."""
+        if kind == self.ITEM:
+            return (pywikibot.ItemPage(self.repo, 'Q{}'.format(value)), False)
+        elif kind == self.DATE:
+            return (self.decode_date(value), False)
+        elif kind == self.SOMEVALUE:
+            return ('somevalue', True)
+        elif kind == self.NOVALUE:
+            return ('novalue', True)
+        return (self._objects[value], False)
+
+    def _qual_group(self, quals):
+        """Return the index of a (new or existing) qualifier group."""
+        if not quals:
+            return self.NO_GROUP
+        key = frozenset(quals)
+        index = self._qual_group_index.get(key)
+        if index is None:
+            index = len(self._qual_groups)
+            self._qual_groups.append(tuple(
+                Qualifier.of(qual.prop, qual.itis) for qual in quals))
+            self._qual_group_index[key] = index
+        return index
+
+    def _ref_group(self, ref):
+        """Return the index of a (new or existing) reference."""
+        if ref is None:
+            return self.NO_GROUP
+        index = self._ref_index.get(ref)
+        if index is None:
+            index = len(self._refs)
+            self._refs.append(ref)
+            self._ref_index[ref] = index
+        return index
+
+    def add(self, qid, prop, itis, quals=None, ref=None, special=False,
+            force=False):
+        """
+        Add a statement to the table.
+
+        @param qid: the id of the item (with or without "Q")
+        @type qid: basestring|int
+        @param prop: the property id (with or without "P")
+        @type prop: basestring|int
+        @param itis: a valid claim target e.g. pywikibot.ItemPage
+        @type itis: object
+        @param quals: the qualifiers of the statement
+        @type quals: list of Qualifier|None
+        @param ref: the reference of the statement
+        @type ref: Reference|None
+        @param special: if itis is actually a snakvalue
+        @type special: bool
+        @param force: whether qualifiers should be added even to already
+            sourced claims
+        @type force: bool
+        """
+        if special and itis not in ('somevalue', 'novalue'):
+            raise pywikibot.Error(
+                'You tried to create a special statement with a '
+                'non-allowed snakvalue: {}'.format(itis))
+        if ref is not None and not isinstance(ref, Reference):
+            raise pywikibot.Error(
+                'add was called with something other '
+                'than a Reference object: {}'.format(ref))
+
+        kind, value = self._encode_value(itis, special)
+        if force:
+            kind |= self.FORCE
+        self.items.append(ItemId.parse(qid))
+        self.props.append(PropertyId.parse(prop))
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.qual_groups.append(self._qual_group(quals))
+        self.ref_groups.append(self._ref_group(ref))
+
+    def add_statement(self, qid, prop, statement):
+        """
+        Add a Statement to the table.
+
+        @param qid: the id of the item (with or without "Q")
+        @type qid: basestring|int
+        @param prop: the property id (with or without "P")
+        @type prop: basestring|int
+        @param statement: the statement to add
+        @type statement: Statement
+        """
+        self.add(qid, prop, statement.itis, quals=statement.quals,
+                 ref=statement.ref, special=statement.special,
+                 force=statement.force)
+
+    def statement(self, row):
+        """
+        Make the Statement of a row.
+
+        @param row: the index of the row
+        @type row: int
+        @rtype: Statement
+        """
+        kind = self.kinds[row]
+        itis, special = self._decode_value(
+            kind & ~self.FORCE, self.values[row])
+        statement = Statement(itis, special=special)
+        qual_group = self.qual_groups[row]
+        if qual_group != self.NO_GROUP:
+            for qual in self._qual_groups[qual_group]:
+                statement.add_qualifier(qual)
+        ref_group = self.ref_groups[row]
+        if ref_group != self.NO_GROUP:
+            statement.add_reference(self._refs[ref_group])
+        if kind & self.FORCE:
+            statement.force = True
+        return statement
+
+    def fingerprint(self, row):
+        """
+        Return the fingerprint of the Statement of a row.
+
+        This is identical to Statement.fingerprint() but avoids making the
+        target and the Statement, e.g. for checking an ImportJournal.
+
+        @param row: the index of the row
+        @type row: int
+        @rtype: str
+        """
+        kind = self.kinds[row] & ~self.FORCE
+        value = self.values[row]
+        if kind == self.ITEM:
+            itis_key = ('entity', 'Q{}'.format(value))
+        elif kind == self.DATE:
+            # a TimeValue shares the key of the WbTime, see values.time_key()
+            value, precision = divmod(value, 100)
+            value, day = divmod(value, 100)
+            year, month = divmod(value, 100)
+            itis_key = TimeValue(
+                year, month, day, precision=precision,
+                calendarmodel=self.calendarmodel).target_key()
+        else:
+            itis, special = self._decode_value(kind, value)
+            itis_key = Statement(itis, special=special)._itis_key()
+        return helpers.fingerprint(
+            (itis_key, ) + self._group_key(
+                self.qual_groups[row], self.ref_groups[row]))
+
+    def _group_key(self, qual_group, ref_group):
+        """Return the canonical key parts of a qualifier group and ref."""
+        key = self._group_keys.get((qual_group, ref_group))
+        if key is None:
+            quals = ()
+            if qual_group != self.NO_GROUP:
+                quals = tuple(sorted(
+                    (qual.canonical_key()
+                     for qual in self._qual_groups[qual_group]),
+                    key=helpers.canonical_json))
+            ref = None
+            if ref_group != self.NO_GROUP:
+                ref = self._refs[ref_group].canonical_key()
+            key = self._group_keys[(qual_group, ref_group)] = (quals, ref)
+        return key
+
+    def item_order(self):
+        """
+        Return the row indexes sorted (stably) by item.
+
+        @rtype: list of int
+        """
+        if numpy is not None and len(self):
+            dtype = str('i{}'.format(self.items.itemsize))
+            return numpy.argsort(
+                numpy.frombuffer(self.items, dtype=dtype),
+                kind='stable').tolist()
+        return sorted(range(len(self)), key=self.items.__getitem__)
+
+    def iter_rows(self):
+        """
+        Yield the row indexes grouped by item.
+
+        @return: the item id and the indexes of its rows, in order of
+            addition, for each item, in order of numeric id
+        @rtype: generator of (str, list of int)
+        """
+        current = None
+        rows = []
+        for row in self.item_order():
+            item = self.items[row]
+            if item != current:
+                if rows:
+                    yield ('Q{}'.format(current), rows)
+                current = item
+                rows = []
+            rows.append(row)
+        if rows:
+            yield ('Q{}'.format(current), rows)
+
+    def iter_items(self):
+        """
+        Yield the statements grouped by item, made lazily per item.
+
+        @return: the item id and the statements of the item, as a dict of
+            lists of Statements per (P-prefixed) property id, for each item
+        @rtype: generator of (str, dict)
+        """
+        for qid, rows in self.iter_rows():
+            protoclaims = dict()
+            for row in rows:
+                protoclaims.setdefault(
+                    'P{}'.format(self.props[row]), []).append(
+                        self.statement(row))
+            yield (qid, protoclaims)
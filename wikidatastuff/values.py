@@ -0,0 +1,319 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Lightweight, repo-free, values which can be used as claim targets."""
+from __future__ import unicode_literals
+from builtins import object
+from collections import namedtuple
+from decimal import Decimal
+
+import pywikibot
+
+from wikidatastuff.entity_id import ItemId
+
+GREGORIAN = 'http://www.wikidata.org/entity/Q1985727'
+
+
+class Value(object):
+    """
+    Base class for the lightweight values.
+
+    The values are immutable, hashable and picklable and can be used in
+    place of the corresponding pywikibot objects as the target of a
+    Statement, Qualifier or (Qualifier based) Reference source. They are
+    only converted to pywikibot objects, through to_pywikibot(), once a
+    claim is written.
+
+    Values of different types are never equal, even if they share the same
+    fields.
+    """
+
+    __slots__ = ()
+
+    def to_pywikibot(self, repo):
+        """
+        Convert the value to the corresponding pywikibot object.
+
+        @param repo: the repo to which the claim will be written
+        @type repo: pywikibot.site.DataSite
+        @rtype: object
+        """
+        raise NotImplementedError
+
+    def target_key(self):
+        """
+        Return the key shared with the corresponding pywikibot object.
+
+        See helpers.target_key().
+
+        @rtype: tuple
+        """
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        """Values are only equal to values of the same type."""
+        return type(self) is type(other) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        """Implement non-equality comparison."""
+        return not self.__eq__(other)
+
+    __hash__ = tuple.__hash__
+
+
+class ItemValue(Value, namedtuple('ItemValue', 'id')):
+    """
+    A reference to an item.
+
+        ItemValue('Q42')
+        ItemValue('http://www.wikidata.org/entity/Q42')
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, qid):
+        """
+        Make a reference to an item.
+
+        @param qid: the id of the item, see ItemId.parse()
+        @type qid: basestring|int|ItemId
+        """
+        return super(ItemValue, cls).__new__(cls, ItemId.parse(qid))
+
+    def to_pywikibot(self, repo):
+        """Convert the value to a pywikibot.ItemPage."""
+        return pywikibot.ItemPage(repo, self.id.id)
+
+    def target_key(self):
+        """Return the key shared with the corresponding pywikibot object."""
+        return ('entity', self.id.id)
+
+    def __repr__(self):
+        """Return a more complete string representation."""
+        return 'ItemValue({})'.format(self.id.id)
+
+
+class TimeValue(Value, namedtuple('TimeValue', (
+        'year', 'month', 'day', 'hour', 'minute', 'second', 'precision',
+        'calendarmodel'))):
+    """
+    A point in time, as pywikibot.WbTime but without timezone and bounds.
+
+    As for pywikibot.WbTime the precision defaults to that of the most
+    precise field given. The calendar model defaults to the proleptic
+    Gregorian calendar (the default on Wikidata) rather than to that of the
+    repo since the repo is not known until the value is written.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, year, month=None, day=None, hour=None, minute=None,
+                second=None, precision=None, calendarmodel=None):
+        """
+        Make a point in time.
+
+        @param year: the year, negative for BCE
+        @type year: int
+        @param precision: the precision, either as an int or its name, e.g.
+            'day'
+        @type precision: int|basestring|None
+        @param calendarmodel: URI identifying the calendar model
+        @type calendarmodel: basestring|None
+        """
+        if year is None:
+            raise ValueError('no year given')
+        fields = [month, day, hour, minute, second]
+        detected = pywikibot.WbTime.PRECISION['year']
+        for i, field in enumerate(fields):
+            if field is None:
+                break
+            detected = pywikibot.WbTime.PRECISION[
+                ('month', 'day', 'hour', 'minute', 'second')[i]]
+        fields = [1 if v is None else v for v in fields[:2]] + [
+            0 if v is None else v for v in fields[2:]]
+
+        if precision is None:
+            precision = detected
+        elif precision in pywikibot.WbTime.PRECISION:
+            precision = pywikibot.WbTime.PRECISION[precision]
+        elif precision not in pywikibot.WbTime.PRECISION.values():
+            raise ValueError('Invalid precision: "{}"'.format(precision))
+
+        return super(TimeValue, cls).__new__(
+            cls, year, *(fields + [precision, calendarmodel or GREGORIAN]))
+
+    def to_pywikibot(self, repo):
+        """Convert the value to a pywikibot.WbTime."""
+        return pywikibot.WbTime(
+            year=self.year, month=self.month, day=self.day, hour=self.hour,
+            minute=self.minute, second=self.second, precision=self.precision,
+            calendarmodel=self.calendarmodel, site=repo)
+
+    def target_key(self):
+        """Return the key shared with the corresponding pywikibot object."""
+        return ('time', ) + time_key(self)
+
+    def to_timestr(self):
+        """
+        Return the time as an ISO 8601 style timestamp, as WbTime.toTimestr.
+
+        @rtype: str
+        """
+        return '{0:+05d}-{1:02d}-{2:02d}T{3:02d}:{4:02d}:{5:02d}Z'.format(
+            self.year, self.month, self.day, self.hour, self.minute,
+            self.second)
+
+
+class QuantityValue(Value, namedtuple(
+        'QuantityValue', ('amount', 'unit', 'error'))):
+    """
+    A quantity with an optional unit and uncertainty.
+
+        QuantityValue('4.2', unit='Q11573', error='0.1')
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, amount, unit=None, error=None):
+        """
+        Make a quantity.
+
+        @param amount: the amount, converted via str to Decimal
+        @type amount: basestring|Decimal|int|float
+        @param unit: the item of the unit
+        @type unit: basestring|ItemId|None
+        @param error: the uncertainty of the amount, or a tuple of the upper
+            and lower uncertainty
+        @type error: same as amount|tuple|None
+        """
+        if amount is None:
+            raise ValueError('no amount given')
+        if unit is not None:
+            unit = ItemId.parse(unit)
+        if isinstance(error, tuple):
+            error = (Decimal(str(error[0])), Decimal(str(error[1])))
+        elif error is not None:
+            error = Decimal(str(error))
+        return super(QuantityValue, cls).__new__(
+            cls, Decimal(str(amount)), unit, error)
+
+    def to_pywikibot(self, repo):
+        """Convert the value to a pywikibot.WbQuantity."""
+        unit = None
+        if self.unit is not None:
+            unit = pywikibot.ItemPage(repo, self.unit.id)
+        return pywikibot.WbQuantity(
+            self.amount, unit=unit, error=self.error, site=repo)
+
+    def target_key(self):
+        """Return the key shared with the corresponding pywikibot object."""
+        unit = self.unit.id if self.unit is not None else '1'
+        return ('quantity', self.amount, unit)
+
+
+class MonolingualTextValue(Value, namedtuple(
+        'MonolingualTextValue', ('text', 'language'))):
+    """A text in a given language."""
+
+    __slots__ = ()
+
+    def to_pywikibot(self, repo):
+        """Convert the value to a pywikibot.WbMonolingualText."""
+        return pywikibot.WbMonolingualText(self.text, self.language)
+
+    def target_key(self):
+        """Return the key shared with the corresponding pywikibot object."""
+        return ('monolingual', self.language, self.text)
+
+
+class StringValue(Value, namedtuple('StringValue', 'text')):
+    """
+    A string, e.g. for string, external-id or url properties.
+
+    Plain strings can be used as targets directly, this only exists for
+    symmetry with the other values.
+    """
+
+    __slots__ = ()
+
+    def to_pywikibot(self, repo):
+        """Convert the value to a plain string."""
+        return self.text
+
+    def target_key(self):
+        """Return the key shared with the corresponding pywikibot object."""
+        return ('value', self.text)
+
+
+def time_key(time):
+    """
+    Make the canonical key of a point in time.
+
+    See helpers.wbtime_key() for details.
+
+    @param time: the time
+    @type time: pywikibot.WbTime|TimeValue
+    @rtype: tuple
+    """
+    precision = time.precision
+    key = (precision, time.calendarmodel,
+           _truncate_year(time.year, precision))
+    for field, level in _TIME_FIELDS:
+        if precision < level:
+            break
+        key += (getattr(time, field), )
+    return key
+
+
+def _truncate_year(year, precision):
+    """
+    Reduce a year to its decade, century etc. for a coarse precision.
+
+    Decades start on a year ending in 0 (1990-1999) whereas centuries and
+    millennia start on a year ending in 1 (1901-2000). BCE years are counted
+    the same way, away from zero.
+    """
+    if precision >= pywikibot.WbTime.PRECISION['year']:
+        return year
+    power = 10 ** (pywikibot.WbTime.PRECISION['year'] - precision)
+    sign = -1 if year < 0 else 1
+    if precision == pywikibot.WbTime.PRECISION['decade']:
+        return sign * (abs(year) // power)
+    return sign * ((abs(year) - 1) // power + 1)
+
+
+_TIME_FIELDS = tuple(
+    (field, pywikibot.WbTime.PRECISION[field])
+    for field in ('month', 'day', 'hour', 'minute', 'second'))
+
+
+def unit_key(unit):
+    """
+    Make the key of the unit of a quantity, independent of the repo.
+
+    @param unit: the unit URI, as in pywikibot.WbQuantity.unit, or '1' for
+        unitless quantities
+    @type unit: basestring
+    @return: the id of the unit item, or '1'
+    @rtype: str
+    """
+    return unit.rsplit('/', 1)[-1]
+
+
+def to_pywikibot(value, repo):
+    """
+    Convert a lightweight value to a pywikibot object, if needed.
+
+    @param value: the target of a claim
+    @type value: object
+    @param repo: the repo to which the claim will be written
+    @type repo: pywikibot.site.DataSite
+    @return: the value itself unless it is a Value
+    @rtype: object
+    """
+    if isinstance(value, Value):
+        return value.to_pywikibot(repo)
+    return value
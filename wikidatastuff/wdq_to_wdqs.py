@@ -8,9 +8,10 @@ The results are also formatted as WDQ reults.
        https://tools.wmflabs.org/wdq2sparql/w2s.php?wdq=<wdq_query>
 """
 from __future__ import unicode_literals
-from builtins import str
+from builtins import dict, str
 import pywikibot
 
+from wikidatastuff.entity_id import ItemId
 from wikidatastuff.helpers import std_p, std_q
 from wikidatastuff.wdqs_lookup import (
     make_select_wdqs_query,
@@ -91,7 +92,7 @@ def sanitize_to_wdq_result(data):
     @param data: data to sanitize
     @type data: list of str
     @return: sanitized data
-    @rtype: list of int
+    @rtype: list of ItemId (behaving as int)
     """
     if not isinstance(data, list):
         raise pywikibot.Error(
@@ -99,8 +100,8 @@ def sanitize_to_wdq_result(data):
             "strings not a '{}'".format(type(data)))
 
     for i, d in enumerate(data):
-        # convert Q123 to int 123
-        data[i] = int(d.lstrip('Q'))
+        # convert Q123 to (int) 123
+        data[i] = ItemId.parse(d)
     return data
 
 
@@ -216,7 +217,8 @@ def make_tree_sparql(item_1, prop_2, prop_3, item_label=None):
 #        todays get_values and None/str/int are todays q_value
 def make_claim_wdqs_search(prop, get_values=False, q_value=None,
                            qualifiers=None, optional_props=None,
-                           allow_multiple=False):
+                           allow_multiple=False, raw=False, stream=False,
+                           transport=None, ttl=None, bypass_cache=False):
     """
     Make a simple search for items with a certain property.
 
@@ -239,6 +241,20 @@ def make_claim_wdqs_search(prop, get_values=False, q_value=None,
     @param allow_multiple: if multiple values are allowed for each item.
         If True then each entry is a set of values.
     @type allow_multiple: bool
+    @param raw: whether to return the unprocessed rows, see
+        make_select_wdqs_query()
+    @type raw: bool
+    @param stream: whether to stream the results, see
+        make_select_wdqs_query()
+    @type stream: bool
+    @param transport: the format of the response, either 'json' or 'tsv',
+        see make_select_wdqs_query()
+    @type transport: str|None
+    @param ttl: the maximum age, in seconds, of a cached result, see
+        make_select_wdqs_query()
+    @type ttl: int|float|None
+    @param bypass_cache: if any cached result should be ignored
+    @type bypass_cache: bool
     @return: the resulting Q-ids, with Q prefix and values if requested
     @rtype: list of str or dict
     """
@@ -255,8 +271,19 @@ def make_claim_wdqs_search(prop, get_values=False, q_value=None,
         select_value = 'value'
 
     # make query
+    options = dict()
+    if raw:
+        options['raw'] = True
+    if stream:
+        options['stream'] = True
+    if transport:
+        options['transport'] = transport
+    if ttl is not None:
+        options['ttl'] = ttl
+    if bypass_cache:
+        options['bypass_cache'] = True
     return make_select_wdqs_query(query, 'item', select_value, qualifiers,
-                                  optional_props, allow_multiple)
+                                  optional_props, allow_multiple, **options)
 
 
 def make_claim_qualifiers_sparql(main_prop, qualifiers):
@@ -9,19 +9,406 @@ built from that perspective.
 @todo: Rebuild as more OOP
 """
 from __future__ import unicode_literals
-from builtins import dict, str
+from builtins import chr, dict, object, range, str
+from collections import OrderedDict
+import json
+import re
 import requests
 import pywikibot
 
 import wikidatastuff.helpers as helpers
+from wikidatastuff.entity_id import EntityId
+from wikidatastuff.query_cache import QueryCache
+
+
+ENDPOINT = 'https://query.wikidata.org/bigdata/namespace/wdq/sparql'
+BASE_URL = ENDPOINT + '?format=json&query='
+USER_AGENT = ('wikidataStuff '
+              '(https://github.com/lokal-profil/wikidata-stuff) '
+              'python-requests/{}'.format(requests.__version__))
+MAX_GET_LENGTH = 2000  # longer (url encoded) queries are POSTed
+VALUES_CHUNK_SIZE = 500  # values per sub-query, see make_values_wdqs_query
+STREAM_CHUNK_SIZE = 64 * 1024  # characters read at a time when streaming
+PREFIXES = (
+    "PREFIX wd: <http://www.wikidata.org/entity/>\n"
+    "PREFIX wdt: <http://www.wikidata.org/prop/direct/>\n"
+    "PREFIX p: <http://www.wikidata.org/prop/>\n"
+    "PREFIX pq: <http://www.wikidata.org/prop/qualifier/>\n"
+    "PREFIX pr: <http://www.wikidata.org/prop/reference/>\n")
+
+TRANSPORTS = {  # result format: Accept header
+    'json': 'application/sparql-results+json',
+    'tsv': 'text/tab-separated-values',
+}
+TSV_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f',
+               '"': '"', "'": "'", '\\': '\\'}
+TSV_ESCAPE_PATTERN = re.compile(
+    r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+
+BINDINGS_PATTERN = re.compile(r'"bindings"\s*:\s*\[')
+VARS_PATTERN = re.compile(r'"vars"\s*:\s*(\[[^\]]*\])')
+SEPARATOR_PATTERN = re.compile(r'[\s,]*')
+
+
+class WdqsClient(object):
+    """
+    A client for the query service, reusing pooled connections.
+
+    All look-ups made through this module (and through wdq_to_wdqs and
+    helpers.fill_cache_wdqs()) go through the module level default_client,
+    so that jobs doing thousands of small look-ups don't pay for setting up
+    a new connection for each one. Replace default_client to change the
+    settings, e.g.
+
+        wdqs_lookup.default_client = WdqsClient(
+            pool_size=20, user_agent='MyBot/1.0 (User:MyBot)',
+            cache=QueryCache('wdqs_cache.sqlite', ttl=24 * 3600))
+
+    If the client has a QueryCache then repeated queries are answered from
+    it, even between runs. Queries too long for a url are sent as POST.
+
+    Streamed results (see iter_query()) are by default transported as
+    SPARQL JSON. For large results the much more compact, and faster to
+    parse, tab-separated values can be used instead by setting transport to
+    'tsv'. The rows are identical for both transports.
+    """
+
+    def __init__(self, endpoint=ENDPOINT, pool_size=10, timeout=(10, 65),
+                 max_retries=2, user_agent=None, cache=None,
+                 max_get_length=MAX_GET_LENGTH, transport='json'):
+        """
+        Initialise the client and its session.
+
+        @param endpoint: the SPARQL endpoint
+        @type endpoint: basestring
+        @param pool_size: the maximum number of connections kept open per
+            host, should be at least the number of threads using the client
+        @type pool_size: int
+        @param timeout: the connect and read timeouts, in seconds. The read
+            timeout defaults to just above the 60s limit of the WDQS.
+        @type timeout: float|tuple of float
+        @param max_retries: the number of retries on failed connections
+        @type max_retries: int
+        @param user_agent: the User-Agent header, defaults to USER_AGENT
+        @type user_agent: basestring|None
+        @param cache: the cache of query results, if any
+        @type cache: QueryCache|None
+        @param max_get_length: the maximum length of the url encoded query
+            for it to be sent as GET rather than POST
+        @type max_get_length: int
+        @param transport: the default format of streamed results, either
+            'json' or 'tsv'
+        @type transport: str
+        """
+        self._check_transport(transport)
+        self.transport = transport
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.cache = cache
+        self.max_get_length = max_get_length
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=max_retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'User-Agent': user_agent or USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+    def get(self, url, **kwargs):
+        """
+        Make a GET request through the session.
+
+        @param url: the url to request
+        @type url: basestring
+        @param kwargs: any further arguments for requests.Session.get()
+        @raises requests.HTTPError: on an unsuccessful response
+        @rtype: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        r = self.session.get(url, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def post(self, url, **kwargs):
+        """
+        Make a POST request through the session.
+
+        @param url: the url to request
+        @type url: basestring
+        @param kwargs: any further arguments for requests.Session.post()
+        @raises requests.HTTPError: on an unsuccessful response
+        @rtype: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        r = self.session.post(url, **kwargs)
+        r.raise_for_status()
+        return r
+
+    def query(self, query, ttl=None, bypass_cache=False):
+        """
+        Run a SPARQL query and return the decoded JSON response.
+
+        @param query: the complete SPARQL query
+        @type query: str
+        @param ttl: the maximum age, in seconds, of a cached response,
+            overriding the default of the cache
+        @type ttl: int|float|None
+        @param bypass_cache: if any cached response should be ignored. The
+            fresh response still replaces the cached one.
+        @type bypass_cache: bool
+        @rtype: dict
+        """
+        key = None
+        if self.cache is not None:
+            key = QueryCache.make_key(self.endpoint, query)
+            if not bypass_cache:
+                text = self.cache.get(key, ttl)
+                if text is not None:
+                    return json.loads(text)
+
+        text = self._send(query, 'json').text
+        data = json.loads(text)
+        if key is not None:
+            self.cache.set(key, text)
+        return data
+
+    def iter_query(self, query, ttl=None, bypass_cache=False,
+                   transport=None):
+        """
+        Run a SPARQL query, yielding the result rows as they are received.
+
+        The response is parsed incrementally so that only the current row,
+        rather than the whole response, is held in memory. If the client has
+        a cache then the raw response is still collected, for storing, once
+        the last row has been read.
+
+        @param query: the complete SPARQL query
+        @type query: str
+        @param ttl: see query()
+        @type ttl: int|float|None
+        @param bypass_cache: see query()
+        @type bypass_cache: bool
+        @param transport: the format of the response, either 'json' or
+            'tsv', defaults to that of the client
+        @type transport: str|None
+        @return: the value of each variable (or None if unbound) per row
+        @rtype: generator of dict
+        """
+        transport = transport or self.transport
+        self._check_transport(transport)
+        parse = iter_tsv_results if transport == 'tsv' else iter_json_results
+
+        key = None
+        if self.cache is not None:
+            key = QueryCache.make_key(
+                self.endpoint, query,
+                transport if transport != 'json' else None)
+            if not bypass_cache:
+                text = self.cache.get(key, ttl)
+                if text is not None:
+                    for entry in parse([text]):
+                        yield entry
+                    return
+
+        r = self._send(query, transport, stream=True)
+        try:
+            if r.encoding is None:
+                r.encoding = 'utf-8'
+            chunks = r.iter_content(STREAM_CHUNK_SIZE, decode_unicode=True)
+            received = None
+            if key is not None:
+                received = []
+                chunks = _collect(chunks, received)
+            for entry in parse(chunks):
+                yield entry
+            if key is not None:
+                self.cache.set(key, ''.join(received))
+        finally:
+            r.close()
+
+    @staticmethod
+    def _check_transport(transport):
+        """Ensure that a transport is supported."""
+        if transport not in TRANSPORTS:
+            raise pywikibot.Error(
+                'The transport must be one of {0}, not "{1}"'.format(
+                    ', '.join(sorted(TRANSPORTS)), transport))
+
+    def _send(self, query, transport, **kwargs):
+        """Send a query as GET, or as POST if too long for a url."""
+        headers = {'Accept': TRANSPORTS[transport]}
+        params = dict()
+        if transport == 'json':  # a format parameter overrides Accept
+            params['format'] = 'json'
+        if len(requests.utils.quote(query.encode('utf-8'))) > \
+                self.max_get_length:
+            return self.post(
+                self.endpoint, params=params, data={'query': query},
+                headers=headers, **kwargs)
+        params['query'] = query
+        return self.get(
+            self.endpoint, params=params, headers=headers, **kwargs)
+
+    def close(self):
+        """Close all pooled connections, and the cache."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def _collect(chunks, received):
+    """Pass on the chunks of a response, while also collecting them."""
+    for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+
+
+def _make_entry(binding, hooks):
+    """Make a dict of the value of each variable in a result binding."""
+    entry = dict()
+    for hook in hooks:
+        if binding.get(hook):
+            entry[hook] = binding[hook]['value']
+        else:
+            entry[hook] = None
+    return entry
+
+
+def iter_json_results(chunks):
+    """
+    Incrementally parse SPARQL JSON results, yielding one row at a time.
+
+    The head (with the variables) must precede the results, as it does in
+    responses from the WDQS.
 
+    @param chunks: the consecutive pieces of the response text
+    @type chunks: iterable of str
+    @raises ValueError: if the response is malformed or truncated
+    @return: the value of each variable (or None if unbound) per row
+    @rtype: generator of dict
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buf = ''
+    match = None
+    while match is None:
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('No results found in the response.')
+        buf += chunk
+        match = BINDINGS_PATTERN.search(buf)
+    head = VARS_PATTERN.search(buf, 0, match.start())
+    if head is None:
+        raise ValueError('No variables found in the response.')
+    hooks = json.loads(head.group(1))
+
+    pos = match.end()
+    while True:
+        pos = SEPARATOR_PATTERN.match(buf, pos).end()
+        if pos < len(buf):
+            if buf[pos] == ']':
+                return
+            try:
+                binding, pos = decoder.raw_decode(buf, pos)
+            except ValueError:  # incomplete, unless at the end
+                pass
+            else:
+                yield _make_entry(binding, hooks)
+                continue
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('The response was truncated.')
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def _iter_lines(chunks):
+    """Split the chunks of a response into lines, without line breaks."""
+    rest = ''
+    for chunk in chunks:
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+def _unescape_tsv(match):
+    """Replace an escape sequence in a TSV string literal."""
+    code = match.group(1) or match.group(2)
+    if code:
+        return _unichr(int(code, 16))
+    return TSV_ESCAPES.get(match.group(3), match.group())
+
+
+def _unichr(code):
+    """Return the character of a code point, also on narrow Python 2."""
+    try:
+        return chr(code)
+    except ValueError:  # narrow build
+        return ('\\U%08x' % code).encode('ascii').decode('unicode-escape')
+
+
+def _tsv_value(term):
+    """
+    Convert an RDF term, as in a TSV result, into its plain value.
 
-BASE_URL = ('https://query.wikidata.org/bigdata/namespace/wdq/sparql?'
-            'format=json&query=')
+    This is the value the term would have had in a JSON result.
+    """
+    if not term:
+        return None  # unbound
+    first = term[0]
+    if first == '<':
+        return term[1:-1]
+    elif first == '"':
+        end = term.rfind('"')
+        if end < 1:
+            raise ValueError('Malformed literal: {}'.format(term))
+        value = term[1:end]
+        if '\\' in value:
+            value = TSV_ESCAPE_PATTERN.sub(_unescape_tsv, value)
+        return value
+    elif term.startswith('_:'):
+        return term[2:]
+    return term  # an abbreviated number or boolean
+
+
+def iter_tsv_results(chunks):
+    """
+    Parse SPARQL TSV results, yielding one row at a time.
+
+    The rows are identical to those which iter_json_results() would give for
+    the same results in JSON.
+
+    @param chunks: the consecutive pieces of the response text
+    @type chunks: iterable of str
+    @raises ValueError: if the response is malformed
+    @return: the value of each variable (or None if unbound) per row
+    @rtype: generator of dict
+    """
+    lines = _iter_lines(chunks)
+    header = next(lines, None)
+    if header is None:
+        raise ValueError('No variables found in the response.')
+    hooks = [hook.strip().lstrip('?$') for hook in header.split('\t')]
+    width = len(hooks)
+    for line in lines:
+        terms = line.rstrip('\r').split('\t')
+        if len(terms) != width:
+            raise ValueError('Malformed row: {}'.format(line))
+        yield dict(zip(hooks, map(_tsv_value, terms)))
+
+
+default_client = WdqsClient()
 
 
 # @todo: add tests
-def make_simple_wdqs_query(query, verbose=False):
+def make_simple_wdqs_query(query, verbose=False, client=None, ttl=None,
+                           bypass_cache=False, transport=None):
     """
     Make limited queries to the wdqs service for Wikidata.
 
@@ -32,43 +419,86 @@ def make_simple_wdqs_query(query, verbose=False):
     @type query: str
     @param verbose: if the query should be outputted
     @type verbose: bool
+    @param client: the client to use, defaults to default_client
+    @type client: WdqsClient|None
+    @param ttl: the maximum age, in seconds, of a cached result, see
+        WdqsClient.query()
+    @type ttl: int|float|None
+    @param bypass_cache: if any cached result should be ignored
+    @type bypass_cache: bool
+    @param transport: the format of the response, either 'json' or 'tsv',
+        defaults to that of the client (for 'json' the whole response is
+        decoded at once)
+    @type transport: str|None
     @return: results in the format [entry{hook:value}, ]
     @rtype: list of dicts
     """
-    prefix = (
-        "PREFIX wd: <http://www.wikidata.org/entity/>\n"
-        "PREFIX wdt: <http://www.wikidata.org/prop/direct/>\n"
-        "PREFIX p: <http://www.wikidata.org/prop/>\n"
-        "PREFIX pq: <http://www.wikidata.org/prop/qualifier/>\n"
-        "PREFIX pr: <http://www.wikidata.org/prop/reference/>\n")
+    client = client or default_client
+    if (transport or client.transport) == 'tsv':
+        return list(iter_wdqs_query(
+            query, verbose=verbose, client=client, ttl=ttl,
+            bypass_cache=bypass_cache, transport=transport))
 
     # perform query
     if verbose:
-        pywikibot.output(prefix + query)
+        pywikibot.output(PREFIXES + query)
 
-    r = requests.get(BASE_URL + requests.utils.quote(prefix + query))
-    r.raise_for_status()
-    j = r.json()
+    j = client.query(PREFIXES + query, ttl=ttl, bypass_cache=bypass_cache)
 
     try:
-        data = []
         hooks = j['head']['vars']
-        for binding in j['results']['bindings']:
-            entry = dict()
-            for hook in hooks:
-                if binding.get(hook):
-                    entry[hook] = binding[hook]['value']
-                else:
-                    entry[hook] = None
-            data.append(entry.copy())
+        data = [_make_entry(binding, hooks)
+                for binding in j['results']['bindings']]
     except:
         raise pywikibot.Error(
             'Shit went wrong with the wdqs query:\n{}'.format(query))
     return data
 
 
+def iter_wdqs_query(query, verbose=False, client=None, ttl=None,
+                    bypass_cache=False, transport=None):
+    """
+    Make a query to the wdqs service, yielding the results one at a time.
+
+    The streaming equivalent of make_simple_wdqs_query(). The response is
+    parsed as it is received so memory use stays flat regardless of the
+    size of the result. The output can be passed directly to e.g.
+    process_query_results().
+
+    @param query: a SELECT SPARQL query (i.e. no prefix)
+    @type query: str
+    @param verbose: if the query should be outputted
+    @type verbose: bool
+    @param client: the client to use, defaults to default_client
+    @type client: WdqsClient|None
+    @param ttl: the maximum age, in seconds, of a cached result, see
+        WdqsClient.query()
+    @type ttl: int|float|None
+    @param bypass_cache: if any cached result should be ignored
+    @type bypass_cache: bool
+    @param transport: the format of the response, either 'json' or 'tsv',
+        defaults to that of the client. The results are the same for both.
+    @type transport: str|None
+    @return: results in the format entry{hook:value}
+    @rtype: generator of dict
+    """
+    if verbose:
+        pywikibot.output(PREFIXES + query)
+
+    options = {'ttl': ttl, 'bypass_cache': bypass_cache}
+    if transport:
+        options['transport'] = transport
+    try:
+        for entry in (client or default_client).iter_query(
+                PREFIXES + query, **options):
+            yield entry
+    except ValueError:
+        raise pywikibot.Error(
+            'Shit went wrong with the wdqs query:\n{}'.format(query))
+
+
 def process_query_results(data, key, output_type, value_key=None,
-                          allow_multiple=False):
+                          allow_multiple=False, entity_ids=False):
     """
     Process results using sanitize_wdqs_result and list processing funtions.
 
@@ -76,8 +506,9 @@ def process_query_results(data, key, output_type, value_key=None,
     For 'dict' the key the key corresponding to the value to use as key for
         the new dict.
 
-    @param data: the list of dicts
-    @type data: list of dict
+    @param data: the list of dicts, or any iterable of them e.g. from
+        iter_wdqs_query()
+    @type data: iterable of dict
     @param key: the key to pass on to list processing
     @type key: str
     @param output_type: the desired output type. Either list or dict
@@ -89,6 +520,9 @@ def process_query_results(data, key, output_type, value_key=None,
     @param allow_multiple: if multiple values are allowed.
         If true 'value' is always a set.
     @type allow_multiple: bool
+    @param entity_ids: if entity URIs should be turned into EntityIds rather
+        than strings, see sanitize_wdqs_result()
+    @type entity_ids: bool
     @return: the dict of new key-value pairs
     @rtype: dict or list depending on output_type
     """
@@ -104,31 +538,50 @@ def process_query_results(data, key, output_type, value_key=None,
         processed_data = list_of_dict_to_dict(
             data, key, value_key, allow_multiple)
 
+    if entity_ids:
+        return sanitize_wdqs_result(processed_data, entity_ids=True)
     return sanitize_wdqs_result(processed_data)
 
 
-def sanitize_wdqs_result(data):
+def _sanitize_value(value, entity_ids):
+    """Strip the url component of a single value, see sanitize_wdqs_result."""
+    value = value.rpartition('/')[2]
+    if entity_ids:
+        try:
+            return EntityId.parse(value)
+        except ValueError:  # not an entity
+            pass
+    return value
+
+
+def sanitize_wdqs_result(data, entity_ids=False):
     """
     Strip url component out of wdqs results.
 
     I.e. strip out http://www.wikidata.org/entity/
     For dicts it is assumed that it is the key which should be sanitized
 
+    For large results entity_ids can be used to get compact EntityIds, e.g.
+    ItemId(Q42), rather than strings, e.g. 'Q42'. Any other values are still
+    returned as strings.
+
     @param data: data to sanitize
     @type data: str, or list of str or dict
+    @param entity_ids: if entities should be returned as EntityIds
+    @type entity_ids: bool
     @return: sanitized data
     @rtype: list of str
     """
     if helpers.is_str(data):
-        return data.split('/')[-1]
+        return _sanitize_value(data, entity_ids)
     elif isinstance(data, list):
         for i, d in enumerate(data):
-            data[i] = d.split('/')[-1]
+            data[i] = _sanitize_value(d, entity_ids)
         return data
     if isinstance(data, dict):
         new_data = dict()
         for k, v in data.items():
-            new_data[k.split('/')[-1]] = v
+            new_data[_sanitize_value(k, entity_ids)] = v
         return new_data
     else:
         raise pywikibot.Error(
@@ -142,8 +595,8 @@ def list_of_dict_to_list(data, key):
 
     Crashes badly if the key is not present in each dict entry.
 
-    @param data: the list of dicts
-    @type data: list of dict
+    @param data: the list of dicts, or any iterable of them
+    @type data: iterable of dict
     @param key: the key to look for in the dict
     @type key: str
     @return: the list of matching  values
@@ -158,8 +611,8 @@ def list_of_dict_to_dict(data, key_key, value_key=None, allow_multiple=False):
 
     Crashes badly if the key is not present in each dict entry.
 
-    @param data: the list of dicts
-    @type data: list of dict
+    @param data: the list of dicts, or any iterable of them
+    @type data: iterable of dict
     @param key_key: the key corresponding to the value to use as key for
         the new dict
     @type key_key: str
@@ -204,7 +657,8 @@ def list_of_dict_to_dict(data, key_key, value_key=None, allow_multiple=False):
 
 def make_select_wdqs_query(main_query, label=None, select_value=None,
                            qualifiers=None, optional_props=None,
-                           allow_multiple=False, raw=False):
+                           allow_multiple=False, raw=False, ttl=None,
+                           bypass_cache=False, stream=False, transport=None):
     """
     Put together a wdqs search query given a main query and any qualifiers.
 
@@ -227,6 +681,17 @@ def make_select_wdqs_query(main_query, label=None, select_value=None,
     @param raw: whether to return the raw data instead of runing it through
         process_query_results.
     @rtype raw: bool
+    @param ttl: the maximum age, in seconds, of a cached result, see
+        WdqsClient.query()
+    @type ttl: int|float|None
+    @param bypass_cache: if any cached result should be ignored
+    @type bypass_cache: bool
+    @param stream: whether to stream the results, see iter_wdqs_query().
+        Combined with raw the rows are returned as a generator.
+    @type stream: bool
+    @param transport: the format of the response, either 'json' or 'tsv',
+        see WdqsClient
+    @type transport: str|None
     """
     label = label or 'item'
     selects = []
@@ -261,7 +726,17 @@ def make_select_wdqs_query(main_query, label=None, select_value=None,
     query += " }"
 
     # make the query
-    data = make_simple_wdqs_query(query)
+    query_options = dict()
+    if ttl is not None:
+        query_options['ttl'] = ttl
+    if bypass_cache:
+        query_options['bypass_cache'] = True
+    if transport:
+        query_options['transport'] = transport
+    if stream:
+        data = iter_wdqs_query(query, **query_options)
+    else:
+        data = make_simple_wdqs_query(query, **query_options)
 
     # sanitize the data differently based on input
     output_type = None
@@ -281,6 +756,60 @@ def make_select_wdqs_query(main_query, label=None, select_value=None,
             data, label, output_type, value_key, allow_multiple)
 
 
+def make_values_sparql(variable, values):
+    """
+    Make a VALUES clause binding a variable to some values.
+
+    @param variable: the variable, with or without "?"
+    @type variable: str
+    @param values: the values, either EntityIds (given as e.g. wd:Q42) or
+        strings of sparql code, e.g. '"a string"' or 'wd:Q42'
+    @type values: iterable of EntityId|str
+    @rtype: str
+    """
+    values = ' '.join(
+        'wd:{}'.format(value.id) if isinstance(value, EntityId) else value
+        for value in values)
+    return 'VALUES ?%s { %s }' % (variable.lstrip('?'), values)
+
+
+def make_values_wdqs_query(query, variable, values, key, output_type,
+                           value_key=None, allow_multiple=False,
+                           entity_ids=False, chunk_size=None):
+    """
+    Run a query for many values, splitting the values over sub-queries.
+
+    The query is run once per chunk of values, with its "%s" replaced by a
+    VALUES clause (see make_values_sparql()) for that chunk. The results of
+    all of the sub-queries are merged before being processed, so the outcome
+    (including any error for conflicting values) is identical to that of
+    running a single query through process_query_results().
+
+    @param query: a SELECT SPARQL query (i.e. no prefix), containing a single
+        "%s" where the VALUES clause should go
+    @type query: str
+    @param variable: the variable to bind the values to, with or without "?"
+    @type variable: str
+    @param values: the values, see make_values_sparql(). Duplicates are only
+        queried for once.
+    @type values: iterable of EntityId|str
+    @param chunk_size: the maximum number of values per sub-query, defaults
+        to VALUES_CHUNK_SIZE
+    @type chunk_size: int|None
+    @return: the results, see process_query_results() for the other params
+    @rtype: dict or list depending on output_type
+    """
+    chunk_size = chunk_size or VALUES_CHUNK_SIZE
+    values = list(OrderedDict.fromkeys(values))
+    data = []
+    for i in range(0, len(values), chunk_size):
+        data += make_simple_wdqs_query(
+            query % make_values_sparql(variable, values[i:i + chunk_size]))
+    return process_query_results(
+        data, key, output_type, value_key, allow_multiple,
+        entity_ids=entity_ids)
+
+
 def make_sparql_triple(prop, value=None, item_label=None, qualifier=False):
     """
     Make sparql triple for a claim (either STRING or CLAIM).
@@ -7,12 +7,26 @@
 """Generally useful methods for interacting with Wikidata using pywikibot."""
 from __future__ import unicode_literals
 from builtins import dict, str, object
+from collections import OrderedDict
 import os.path  # Needed for WikidataStringSearch
+import uuid
 
 import pywikibot
 
 import wikidatastuff.helpers as helpers
+from wikidatastuff.claim_index import ClaimIndex
+from wikidatastuff.item_edit_session import ItemEditSession
+from wikidatastuff.item_preloader import ItemPreloader
+from wikidatastuff.item_update_plan import (
+    ClaimChange,
+    ItemUpdatePlan,
+    PlannedClaim
+)
+from wikidatastuff.qualifier import qualifier_keys
+from wikidatastuff.redirect_cache import redirect_cache
 from wikidatastuff.reference import Reference
+from wikidatastuff.values import Value, to_pywikibot
+from wikidatastuff.write_scheduler import default_scheduler
 
 
 class WikidataStuff(object):
@@ -20,8 +34,13 @@ class WikidataStuff(object):
 
     repo = None
     edit_summary = None
+    prefetch = False
+    props = None
+    languages = None
 
-    def __init__(self, repo, edit_summary=None, no_wdss=False):
+    def __init__(self, repo, edit_summary=None, no_wdss=False,
+                 prefetch=False, props=None, languages=None, scheduler=None,
+                 journal=None):
         """
         Initialise the WikidataStuff object with a data repository.
 
@@ -33,10 +52,40 @@ class WikidataStuff(object):
         @param no_wdss: if WikidataStringSearch should be disabled even if
             running on Labs. Default: False.
         @type no_wdss: bool
+        @param prefetch: if the targets of all claims, qualifiers and
+            references of an item should be resolved in bulk before matching
+            any statements against it. Default: False.
+        @type prefetch: bool
+        @param props: the entity data to fetch when loading items, e.g.
+            ['claims', 'labels', 'aliases', 'descriptions']. If None then all
+            data is fetched.
+        @type props: list of basestring|None
+        @param languages: the languages for which to fetch labels, aliases and
+            descriptions when loading items. Only these languages can then be
+            used with add_multiple_label_or_alias() and
+            add_multiple_descriptions(). If None then all languages are
+            fetched.
+        @type languages: list of basestring|None
+        @param scheduler: the scheduler through which all writes are made.
+            Defaults to the process-wide write_scheduler.default_scheduler.
+            To also adapt to lag handled by pywikibot itself the scheduler
+            must watch the repo, see WriteScheduler.watch().
+        @type scheduler: WriteScheduler|None
+        @param journal: journal in which to record each statement committed
+            through add_new_claim() or apply_item_update(). Already journaled
+            statements are skipped.
+        @type journal: ImportJournal|None
         """
         self.repo = repo
         if edit_summary:
             self.edit_summary = edit_summary
+        self.prefetch = prefetch
+        self.props = props
+        self.languages = languages
+        self.scheduler = scheduler or default_scheduler
+        self.journal = journal
+        self._edit_sessions = dict()
+        self.redirect_cache = redirect_cache
 
         # check if I am running on labs, for WikidataStringSearch
         if no_wdss:
@@ -54,6 +103,117 @@ class WikidataStuff(object):
         for q in self.wdss.search(text, language=language):
             yield self.q_to_itempage(q)
 
+    def write(self, func, *args, **kwargs):
+        """
+        Make a write to Wikidata through the write scheduler.
+
+        @param func: the pywikibot function making the write
+        @type func: callable
+        @return: the outcome of the function
+        """
+        return self.scheduler.run_on(self.repo, func, *args, **kwargs)
+
+    def edit_session(self, item, summary=None):
+        """
+        Make an edit session bundling all changes to an item into one edit.
+
+        @param item: the item to which all changes are made
+        @type item: pywikibot.ItemPage
+        @param summary: summary to append to the auto-generated edit summary
+        @type summary: basestring|None
+        @rtype: ItemEditSession
+        """
+        return ItemEditSession(self, item, summary=summary)
+
+    def register_edit_session(self, session):
+        """
+        Start routing all changes to an item through an edit session.
+
+        @param session: the session to register
+        @type session: ItemEditSession
+        """
+        key = id(session.item)
+        if key in self._edit_sessions:
+            raise pywikibot.Error(
+                'An edit session is already open for {}'.format(session.item))
+        self._edit_sessions[key] = session
+
+    def unregister_edit_session(self, session):
+        """
+        Stop routing changes to an item through an edit session.
+
+        @param session: the session to unregister
+        @type session: ItemEditSession
+        """
+        self._edit_sessions.pop(id(session.item), None)
+
+    def get_edit_session(self, item):
+        """
+        Return the open edit session for an item, if any.
+
+        @param item: the item to look up
+        @type item: pywikibot.ItemPage|None
+        @rtype: ItemEditSession|None
+        """
+        return self._edit_sessions.get(id(item))
+
+    def load_item(self, item):
+        """
+        Load the contents of an item, unless already loaded.
+
+        Only the configured props and languages are fetched.
+
+        @param item: the item to load
+        @type item: pywikibot.ItemPage
+        """
+        if hasattr(item, '_content'):
+            return
+        if self.props is None and self.languages is None:
+            item.exists()  # load contents
+        else:
+            self.make_preloader().load(item)
+
+    def make_preloader(self, chunk_size=50, max_chunks=2):
+        """
+        Make an ItemPreloader using the configured props and languages.
+
+        @param chunk_size: number of items to fetch per request, at most 50.
+        @type chunk_size: int
+        @param max_chunks: maximum number of fetched chunks waiting to be
+            processed.
+        @type max_chunks: int
+        @rtype: ItemPreloader
+        """
+        return ItemPreloader(
+            self.repo, chunk_size=chunk_size, max_chunks=max_chunks,
+            props=self.props, languages=self.languages)
+
+    def check_loaded_terms(self, languages, typ):
+        """
+        Ensure the terms being added were included when loading items.
+
+        Nothing is checked if no terms are being added.
+
+        @param languages: the languages of the terms
+        @type languages: iterable of basestring
+        @param typ: the type of terms, i.e. 'labels', 'aliases' or
+            'descriptions'
+        @type typ: basestring
+        @raises pywikibot.Error: if the terms are not loaded
+        """
+        languages = set(languages)
+        if not languages:
+            return
+        if self.props is not None and typ not in self.props:
+            raise pywikibot.Error(
+                'Cannot add {0} since these are not loaded'.format(typ))
+        if self.languages is not None:
+            unloaded = sorted(languages - set(self.languages))
+            if unloaded:
+                raise pywikibot.Error(
+                    'Cannot add {0} in [{1}] since these languages are not '
+                    'loaded'.format(typ, ', '.join(unloaded)))
+
     def add_description(self, lang, description, item, overwrite=False,
                         summary=None):
         """
@@ -82,14 +242,23 @@ class WikidataStuff(object):
             overwritten (when a new description is available in that language).
         @param summary: summary to append to auto-generated edit summary
         """
-        item.exists()  # load contents
+        self.load_item(item)
+        new_descriptions = self.plan_descriptions(
+            data, item, overwrite=overwrite)
+        self.write_descriptions(new_descriptions, item, summary=summary)
 
-        summary = summary or self.edit_summary
-        edit_summary = u'Added [{{lang}}] description to [[{qid}]]'.format(
-            qid=item.title())
-        if summary:
-            edit_summary = u'{0}, {1}'.format(edit_summary, summary)
+    def plan_descriptions(self, data, item, overwrite=False):
+        """
+        Determine which descriptions need to be added to an (loaded) item.
 
+        @param data: dictionary of language-description pairs
+        @param item: the item to which the descriptions should be added
+        @param overwrite: whether any pre-existing descriptions should be
+            overwritten (when a new description is available in that language).
+        @return: dictionary of the language-description pairs to add
+        @rtype: dict
+        """
+        self.check_loaded_terms(data.keys(), 'descriptions')
         new_descriptions = dict()
 
         for lang, desc in data.items():
@@ -98,11 +267,34 @@ class WikidataStuff(object):
                     overwrite):
                 new_descriptions[lang] = desc
 
-        if new_descriptions:
-            edit_summary = edit_summary.format(
-                lang=', '.join(sorted(new_descriptions.keys())))
-            item.editDescriptions(new_descriptions, summary=edit_summary)
-            pywikibot.output(edit_summary)
+        return new_descriptions
+
+    def write_descriptions(self, new_descriptions, item, summary=None):
+        """
+        Write the new descriptions to the item.
+
+        @param new_descriptions: dictionary of language-description pairs
+        @param item: the item to which the descriptions should be added
+        @param summary: summary to append to auto-generated edit summary
+        """
+        if not new_descriptions:
+            return
+
+        session = self.get_edit_session(item)
+        if session:
+            session.set_descriptions(new_descriptions)
+            return
+
+        summary = summary or self.edit_summary
+        edit_summary = u'Added [{lang}] description to [[{qid}]]'.format(
+            lang=', '.join(sorted(new_descriptions.keys())),
+            qid=item.title())
+        if summary:
+            edit_summary = u'{0}, {1}'.format(edit_summary, summary)
+
+        self.write(
+            item.editDescriptions, new_descriptions, summary=edit_summary)
+        pywikibot.output(edit_summary)
 
     def add_label_or_alias(self, lang, name, item, summary=None,
                            case_sensitive=False):
@@ -136,18 +328,34 @@ class WikidataStuff(object):
         @param summary: summary to append to auto-generated edit summary
         @param case_sensitive: if the comparison is case sensitive
         """
-        item.exists()  # load contents
+        self.load_item(item)
+        new_labels, new_aliases = self.plan_labels_or_aliases(
+            data, item, case_sensitive=case_sensitive)
+        self.write_labels_and_aliases(
+            new_labels, new_aliases, item, summary=summary)
 
-        summary = summary or self.edit_summary
-        edit_summary = 'Added [{{lang}}] {{typ}} to [[{qid}]]'.format(
-            qid=item.title())
-        if summary:
-            edit_summary = u'{0}, {1}'.format(edit_summary, summary)
+    def plan_labels_or_aliases(self, data, item, case_sensitive=False):
+        """
+        Determine which labels and aliases need to be added to a (loaded) item.
 
+        The item itself is left untouched.
+
+        @param data: dictionary of language-name pairs. The name can be either
+            a single name or a list of names.
+        @param item: the item to which the label/alias should be added
+        @param case_sensitive: if the comparison is case sensitive
+        @return: the new labels as a dictionary of language-label pairs and
+            the new aliases as a dictionary of language-list of all aliases
+            pairs (for the affected languages only)
+        @rtype: (dict, dict)
+        """
+        self.check_loaded_terms(data.keys(), 'labels')
+        self.check_loaded_terms(data.keys(), 'aliases')
         new_label_langs = []
-        labels = item.labels or dict()
+        labels = dict(item.labels or dict())
         new_alias_langs = []
-        aliases = item.aliases or dict()
+        aliases = dict(
+            (lang, list(names)) for lang, names in (item.aliases or {}).items())
 
         for lang, names in data.items():
             for name in helpers.listify(names):
@@ -169,19 +377,46 @@ class WikidataStuff(object):
                         aliases[lang].append(name)
                         new_alias_langs.append(lang)
 
-        new_label_langs = sorted(list(set(new_label_langs)))
-        new_alias_langs = sorted(list(set(new_alias_langs)))
+        new_labels = {lang: labels[lang] for lang in set(new_label_langs)}
+        new_aliases = {lang: aliases[lang] for lang in set(new_alias_langs)}
+        return new_labels, new_aliases
 
-        if new_label_langs:
+    def write_labels_and_aliases(self, new_labels, new_aliases, item,
+                                 summary=None):
+        """
+        Write the new labels and aliases to the item.
+
+        @param new_labels: dictionary of language-label pairs
+        @param new_aliases: dictionary of language-list of all aliases pairs
+        @param item: the item to which the labels/aliases should be added
+        @param summary: summary to append to auto-generated edit summary
+        """
+        session = self.get_edit_session(item)
+        if session:
+            session.set_labels(new_labels)
+            session.set_aliases(new_aliases)
+            return
+
+        summary = summary or self.edit_summary
+        edit_summary = 'Added [{{lang}}] {{typ}} to [[{qid}]]'.format(
+            qid=item.title())
+        if summary:
+            edit_summary = u'{0}, {1}'.format(edit_summary, summary)
+
+        if new_labels:
+            labels = dict(item.labels or dict())
+            labels.update(new_labels)
             label_summary = edit_summary.format(
-                lang=', '.join(new_label_langs), typ='label')
-            item.editLabels(labels, summary=label_summary)
+                lang=', '.join(sorted(new_labels.keys())), typ='label')
+            self.write(item.editLabels, labels, summary=label_summary)
             pywikibot.output(label_summary)
 
-        if new_alias_langs:
+        if new_aliases:
+            aliases = dict(item.aliases or dict())
+            aliases.update(new_aliases)
             alias_summary = edit_summary.format(
-                lang=', '.join(new_alias_langs), typ='alias')
-            item.editAliases(aliases, summary=alias_summary)
+                lang=', '.join(sorted(new_aliases.keys())), typ='alias')
+            self.write(item.editAliases, aliases, summary=alias_summary)
             pywikibot.output(alias_summary)
 
     # some more generic Wikidata methods
@@ -193,13 +428,10 @@ class WikidataStuff(object):
         @param itis: the source target value
         @param claim: the pywikibot.Claim to be checked
         """
-        if claim.sources:
-            for i, source in enumerate(claim.sources):
-                if prop in source:
-                    for s in source[prop]:
-                        if self.bypass_redirect(s.getTarget()) == itis:
-                            return True
-        return False
+        if not claim.sources:
+            return False
+        return ClaimIndex.snak_key(prop, itis) in ClaimIndex.source_keys(
+            claim, self.bypass_redirect)
 
     def add_reference(self, item, claim, ref, summary=None):
         """
@@ -218,13 +450,26 @@ class WikidataStuff(object):
         if ref is None:
             return False
 
-        if any(self.has_ref(source.getID(), source.getTarget(), claim)
-                for source in ref.source_test):
-            return False
+        if claim.sources:
+            test_keys = set(
+                ClaimIndex.snak_key(prop, target)
+                for prop, _, target in map(Reference.get_snak, ref.source_test))
+            if not test_keys.isdisjoint(
+                    ClaimIndex.source_keys(claim, self.bypass_redirect)):
+                return False
+
+        session = self.get_edit_session(item)
+        if session:
+            session.add_sources(claim, self.make_sources(ref))
+            pywikibot.output('Adding reference claim to {0} in {1}'.format(
+                claim.getID(), item))
+            return True
 
         try:
             # writes to database
-            claim.addSources(ref.get_all_sources(), summary=summary)
+            self.write(
+                claim.addSources, self.make_sources(ref), summary=summary)
+            ClaimIndex.invalidate_claim(claim)
             pywikibot.output('Adding reference claim to {0} in {1}'.format(
                 claim.getID(), item))
             return True
@@ -254,35 +499,43 @@ class WikidataStuff(object):
             the second that all the provided qualifiers are present.
         @rtype: (bool, bool)
         """
-        has_all = False
-        exact_match = False
-        for qual in quals:
-            if not self.has_qualifier(qual, claim):
-                return (exact_match, has_all)
-        has_all = True
+        return self.compare_qualifier_keys(qualifier_keys(quals), claim)
 
-        len_claim_quals = sum(len(v) for v in claim.qualifiers.values())
-        if len(quals) == len_claim_quals:
-            exact_match = True
+    def compare_qualifier_keys(self, keys, claim):
+        """
+        Compare the qualifier keys of a claim to some given keys.
 
-        return (exact_match, has_all)
+        @param keys: the multiset of qualifier keys to look for, see
+            qualifier.qualifier_keys()
+        @type keys: Counter
+        @param claim: Claim to check
+        @type claim: pywikibot.Claim
+        @return: Tuple of bools. First indicates an exact match of qualifiers,
+            the second that all the provided qualifiers are present.
+        @rtype: (bool, bool)
+        """
+        claim_keys = ClaimIndex.qualifier_keys(claim, self.bypass_redirect)
+        if any(key not in claim_keys for key in keys):
+            return (False, False)
+        return (keys == claim_keys, True)
 
     def has_qualifier(self, qual, claim):
         """
         Check if qualifier is already present.
 
+        Qualifiers are compared on their canonical keys, as in
+        compare_qualifier_keys(), so e.g. quantities are compared regardless
+        of their bounds.
+
         @param qual: Qualifier to look for
         @type qual: Qualifier
         @param claim: Claim to check
         @type claim: pywikibot.Claim
         """
-        if claim.qualifiers and qual.prop in claim.qualifiers:
-            for s in claim.qualifiers[qual.prop]:
-                if self.bypass_redirect(s.getTarget()) == qual.itis:
-                    return True
-                # else:
-                #    pywikibot.output(s.getTarget())
-        return False
+        if not (claim.qualifiers and qual.prop in claim.qualifiers):
+            return False
+        return qual.canonical_key() in ClaimIndex.qualifier_keys(
+            claim, self.bypass_redirect)
 
     def add_qualifier(self, item, claim, qual, summary=None):
         """
@@ -305,8 +558,17 @@ class WikidataStuff(object):
 
         q_claim = self.make_simple_claim(qual.prop, qual.itis)
 
+        session = self.get_edit_session(item)
+        if session:
+            session.add_qualifier(claim, q_claim)
+            pywikibot.output('Adding qualifier {0} to {1} in {2}'.format(
+                qual.prop, claim.getID(), item))
+            return True
+
         try:
-            claim.addQualifier(q_claim, summary=summary)  # writes to database
+            # writes to database
+            self.write(claim.addQualifier, q_claim, summary=summary)
+            ClaimIndex.invalidate_claim(claim)
             pywikibot.output('Adding qualifier {0} to {1} in {2}'.format(
                 qual.prop, claim.getID(), item))
             return True
@@ -326,7 +588,8 @@ class WikidataStuff(object):
         """
         Check if the claim already exists, if so returns any matching claim.
 
-        This only compares the target value and ignores any qualifiers.
+        This only compares the target value and ignores any qualifiers. The
+        look-up is done through a ClaimIndex of the item.
 
         @param prop: the property id for the claim, with "P" prefix
         @type prop: basestring
@@ -339,13 +602,16 @@ class WikidataStuff(object):
         """
         hits = []
         if prop in item.claims:
-            for claim in item.claims[prop]:
-                if isinstance(itis, pywikibot.WbTime):
-                    # WbTime compared differently
-                    if self.compare_wbtime_claim(claim.getTarget(), itis):
-                        hits.append(claim)
-                elif self.bypass_redirect(claim.getTarget()) == itis:
-                    hits.append(claim)
+            candidates = ClaimIndex.for_item(item).find(
+                prop, itis, self.bypass_redirect)
+            if isinstance(itis, (pywikibot.WbTime, Value)):
+                # WbTime compared regarding precision, Values by their key
+                key = helpers.target_key(itis)
+                hits = [claim for claim, target in candidates
+                        if helpers.target_key(target) == key]
+            else:
+                hits = [claim for claim, target in candidates
+                        if target == itis]
         return hits
 
     def has_special_claim(self, prop, snaktype, item):
@@ -363,12 +629,9 @@ class WikidataStuff(object):
         @return: list of matching claims
         @rtype: list of pywikibot.Claim
         """
-        hits = []
-        if prop in item.claims:
-            for claim in item.claims[prop]:
-                if claim.getSnakType() == snaktype:
-                    hits.append(claim)
-        return hits
+        if prop not in item.claims:
+            return []
+        return list(ClaimIndex.for_item(item).find_snaktype(prop, snaktype))
 
     def add_new_claim(self, prop, statement, item, ref, summary=None):
         """
@@ -390,16 +653,100 @@ class WikidataStuff(object):
         @param summary: summary to append to auto-generated edit summary
         @type summary: basestring|None
         """
-        claim = pywikibot.Claim(self.repo, prop)
-        summary = summary or self.edit_summary
+        if self.is_journaled(item, prop, statement, ref):
+            return
+
+        change = self.plan_claim(prop, statement, item, ref)
+        if change and self.apply_claim_change(change, item, summary=summary):
+            self.journal_statement(item, prop, statement, ref)
+
+    def is_journaled(self, item, prop, statement, ref=None):
+        """
+        Check if a statement has already been journaled for an item.
+
+        @param item: the item
+        @type item: pywikibot.ItemPage
+        @param prop: property id, with "P" prefix
+        @type prop: basestring
+        @param statement: the statement
+        @type statement: Statement
+        @param ref: reference used with the statement, overrides ref embedded
+            in statement.
+        @type ref: Reference|None
+        @rtype: bool
+        """
+        return bool(self.journal and self.journal.is_done(
+            item.getID(), prop, statement, ref=ref))
+
+    def journal_statement(self, item, prop, statement, ref=None):
+        """
+        Record a committed statement in the journal, if any.
+
+        If an edit session is open for the item the statement is only
+        recorded once the session has been saved.
+
+        @param item: the item
+        @type item: pywikibot.ItemPage
+        @param prop: property id, with "P" prefix
+        @type prop: basestring
+        @param statement: the statement
+        @type statement: Statement
+        @param ref: reference used with the statement, overrides ref embedded
+            in statement.
+        @type ref: Reference|None
+        """
+        if not self.journal:
+            return
+        session = self.get_edit_session(item)
+        if session:
+            session.add_journal_entry(prop, statement, ref)
+        else:
+            self.journal.record(
+                item.getID(), prop, statement, ClaimIndex.get_revision(item),
+                ref=ref)
+
+    def plan_claim(self, prop, statement, item, ref, planned=None):
+        """
+        Determine what is needed for a statement to be present on an item.
+
+        See add_new_claim() for details. Nothing is written.
+
+        When planning several statements at once the new claims planned for
+        the earlier statements are tracked in planned. Later statements are
+        then matched against these as well, as if the earlier claims had
+        already been written, and may be folded into them.
+
+        @param prop: property id, with "P" prefix
+        @type prop: basestring
+        @param statement: target statement for the claim
+        @type statement: Statement
+        @param item: the item being checked
+        @type item: pywikibot.ItemPage
+        @param ref: reference to add to the claim, overrides ref embedded in
+            statement.
+        @type ref: Reference|None
+        @param planned: the new claims planned so far, as lists of
+            PlannedClaims per (prop, target key). Updated in place.
+        @type planned: dict|None
+        @return: the needed changes or None if no claim could be selected (or
+            if the statement is already covered by a planned claim)
+        @rtype: ClaimChange|None
+        """
+        self.load_item(item)
+        if self.prefetch:
+            self.prefetch_targets(item)
 
         # handle special cases
         if statement.special:
-            claim.setSnakType(statement.itis)
             prior_claims = self.has_special_claim(prop, statement.itis, item)
+            planned_key = (prop, 'special', statement.itis)
         else:
-            claim.setTarget(statement.itis)
             prior_claims = self.has_claim(prop, statement.itis, item)
+            planned_key = (prop, helpers.target_key(statement.itis))
+
+        # include any new claims planned for earlier statements
+        if planned is not None:
+            prior_claims = prior_claims + planned.get(planned_key, [])
 
         # use ref embedded in statement unless external is explicitly provided
         if not ref and statement.ref:
@@ -417,18 +764,297 @@ class WikidataStuff(object):
         except pywikibot.Error as e:
             pywikibot.warning(
                 "Problem adding {0} claim to {1}: {2}".format(prop, item, e))
-            return
+            return None
 
-        if matching_claim:
-            for qual in statement.quals:
-                self.add_qualifier(item, matching_claim, qual, summary=summary)
-            self.add_reference(item, matching_claim, ref, summary=summary)
-        else:
-            item.addClaim(claim, summary=summary)
-            pywikibot.output('Adding {0} claim to {1}'.format(prop, item))
-            for qual in statement.quals:
-                self.add_qualifier(item, claim, qual, summary=summary)
-            self.add_reference(item, claim, ref, summary=summary)
+        if not matching_claim:
+            new_claim = None
+            if planned is not None:
+                new_claim = sum(len(claims) for claims in planned.values())
+                planned_claim = PlannedClaim(new_claim)
+                self.plan_additions(planned_claim, statement.quals, ref)
+                planned.setdefault(planned_key, []).append(planned_claim)
+            return ClaimChange(
+                prop, statement, None, tuple(statement.quals), ref,
+                new_claim=new_claim, folded=False)
+
+        new_quals = tuple(
+            qual for qual in statement.quals
+            if not self.has_qualifier(qual, matching_claim))
+        if ref and any(self.has_ref(source_prop, source_target, matching_claim)
+                       for source_prop, _, source_target in map(
+                           Reference.get_snak, ref.source_test)):
+            ref = None
+        if isinstance(matching_claim, PlannedClaim):
+            # fold into a new claim planned for an earlier statement
+            if not (new_quals or ref):
+                return None
+            self.plan_additions(matching_claim, new_quals, ref)
+            return ClaimChange(
+                prop, statement, None, new_quals, ref,
+                new_claim=matching_claim.new_claim, folded=True)
+        return ClaimChange(
+            prop, statement, matching_claim, new_quals, ref,
+            new_claim=None, folded=False)
+
+    def plan_additions(self, planned_claim, quals, ref):
+        """
+        Record qualifiers and a reference as planned for a new claim.
+
+        @param planned_claim: the planned claim
+        @type planned_claim: PlannedClaim
+        @param quals: the qualifiers to add
+        @type quals: list of Qualifier
+        @param ref: the reference to add
+        @type ref: Reference|None
+        """
+        planned_claim.add_qualifiers(quals)
+        if ref:
+            planned_claim.add_source_keys(
+                ClaimIndex.snak_key(source_prop, source_target)
+                for source_prop, _, source_target in map(
+                    Reference.get_snak, ref.source_test + ref.source_notest))
+
+    def make_new_claim(self, prop, statement):
+        """
+        Make the (unsaved) claim for a statement, without qualifiers or refs.
+
+        @param prop: property id, with "P" prefix
+        @type prop: basestring
+        @param statement: the statement
+        @type statement: Statement
+        @rtype: pywikibot.Claim
+        """
+        if statement.special:
+            claim = pywikibot.Claim(self.repo, prop)
+            claim.setSnakType(statement.itis)
+            return claim
+        return self.make_simple_claim(prop, statement.itis)
+
+    def apply_claim_change(self, change, item, summary=None, created=None):
+        """
+        Write a planned ClaimChange to an item.
+
+        The claims are only made here so that a change can safely be applied
+        again, e.g. after a failed write.
+
+        @param change: the change to write
+        @type change: ClaimChange
+        @param item: the item being changed
+        @type item: pywikibot.ItemPage
+        @param summary: summary to append to auto-generated edit summary
+        @type summary: basestring|None
+        @param created: the new claims created so far for the plan, per
+            plan-local id. Needed for applying folded changes, updated in
+            place.
+        @type created: dict|None
+        @return: if all of the writes succeeded
+        @rtype: bool
+        """
+        summary = summary or self.edit_summary
+        if change.is_new():
+            claim = self.make_new_claim(change.prop, change.statement)
+            if not self.add_full_claim(
+                    item, claim, change.qualifiers, change.ref,
+                    summary=summary):
+                return False
+            if created is not None and change.new_claim is not None:
+                created[change.new_claim] = claim
+            return True
+
+        claim = change.claim
+        if change.folded:
+            claim = (created or dict()).get(change.new_claim)
+            if claim is None:
+                # the claim to fold into was never created
+                return False
+
+        success = True
+        for qual in change.qualifiers:
+            if not self.add_qualifier(item, claim, qual, summary=summary):
+                success = False
+        if change.ref and not self.add_reference(
+                item, claim, change.ref, summary=summary):
+            success = False
+        return success
+
+    def plan_item_update(self, item, protoclaims, labels=None,
+                         descriptions=None, ref=None, case_sensitive=False,
+                         overwrite=False):
+        """
+        Determine all of the changes needed to update an item.
+
+        Runs the same logic as add_new_claim(), add_multiple_label_or_alias()
+        and add_multiple_descriptions() but, instead of writing, returns the
+        resulting changes. The item is loaded (see load_item()), and the
+        redirects of all items used on it resolved in bulk, up front after
+        which nothing is read or written, so that planning can be separated
+        from the (slow) writing.
+
+        Statements matching a new claim planned for an earlier statement are
+        folded into that claim, as if the statements had been added one by
+        one. The ClaimChanges of such statements share the plan-local id of
+        the new claim, which is created when the first of them is applied.
+
+        @param item: the item to update
+        @type item: pywikibot.ItemPage
+        @param protoclaims: dict of Statements (or lists of Statements) per
+            (P-prefixed) property-id
+        @type protoclaims: dict
+        @param labels: dictionary of language-name pairs. The name can be
+            either a single name or a list of names.
+        @type labels: dict|None
+        @param descriptions: dictionary of language-description pairs
+        @type descriptions: dict|None
+        @param ref: reference to add to every claim, overrides any reference
+            embedded in the statements.
+        @type ref: Reference|None
+        @param case_sensitive: if the label/alias comparison is case sensitive
+        @type case_sensitive: bool
+        @param overwrite: whether any pre-existing descriptions should be
+            overwritten
+        @type overwrite: bool
+        @rtype: ItemUpdatePlan
+        """
+        self.load_item(item)
+        if protoclaims:
+            self.prefetch_targets(item)
+        new_labels, new_aliases = self.plan_labels_or_aliases(
+            labels or dict(), item, case_sensitive=case_sensitive)
+        new_descriptions = self.plan_descriptions(
+            descriptions or dict(), item, overwrite=overwrite)
+
+        changes = []
+        planned = dict()
+        for prop in sorted(protoclaims.keys(), key=lambda p: int(p[1:])):
+            for statement in helpers.listify(protoclaims[prop]):
+                if self.is_journaled(item, prop, statement, ref):
+                    continue
+                change = self.plan_claim(
+                    prop, statement, item, ref, planned=planned)
+                if change and not change.is_empty():
+                    changes.append(change)
+
+        return ItemUpdatePlan(
+            item=item,
+            labels=tuple(sorted(new_labels.items())),
+            aliases=tuple(sorted(
+                (lang, tuple(names)) for lang, names in new_aliases.items())),
+            descriptions=tuple(sorted(new_descriptions.items())),
+            claims=tuple(changes),
+            ref=ref)
+
+    def apply_item_update(self, plan, summary=None):
+        """
+        Write all of the changes in an ItemUpdatePlan.
+
+        If an edit session is open for the item then all of the changes are
+        bundled into that session.
+
+        @param plan: the planned changes
+        @type plan: ItemUpdatePlan
+        @param summary: summary to append to auto-generated edit summary
+        @type summary: basestring|None
+        """
+        item = plan.item
+        self.write_labels_and_aliases(
+            dict(plan.labels),
+            dict((lang, list(names)) for lang, names in plan.aliases),
+            item, summary=summary)
+        self.write_descriptions(dict(plan.descriptions), item, summary=summary)
+        created = dict()
+        for change in plan.claims:
+            if self.apply_claim_change(
+                    change, item, summary=summary, created=created):
+                self.journal_statement(
+                    item, change.prop, change.statement, plan.ref)
+
+    def add_full_claim(self, item, claim, quals, ref, summary=None):
+        """
+        Add a new claim, including any qualifiers and reference, in one edit.
+
+        The qualifiers and reference are attached to the claim locally after
+        which the whole claim is saved using a single wbsetclaim call.
+
+        @param item: the item to which the claim should be added
+        @type item: pywikibot.ItemPage
+        @param claim: the new claim, with target or snaktype already set
+        @type claim: pywikibot.Claim
+        @param quals: the qualifiers to attach to the claim
+        @type quals: list of Qualifier
+        @param ref: the reference to attach to the claim
+        @type ref: Reference|None
+        @param summary: summary to append to auto-generated edit summary
+        @type summary: basestring|None
+        @return: if the claim was added
+        @rtype: bool
+        """
+        for qual in quals:
+            self.attach_qualifier(
+                claim, self.make_simple_claim(qual.prop, qual.itis))
+        if ref:
+            self.attach_sources(claim, self.make_sources(ref))
+
+        session = self.get_edit_session(item)
+        if session:
+            session.add_claim(claim)
+            pywikibot.output('Adding {0} claim to {1}'.format(
+                claim.getID(), item))
+            return True
+
+        claim.snak = '{0}${1}'.format(item.getID(), uuid.uuid4())
+        claim.on_item = item
+        try:
+            # writes to database
+            self.write(self.repo.save_claim, claim, summary=summary)
+            pywikibot.output('Adding {0} claim to {1}'.format(
+                claim.getID(), item))
+        except pywikibot.data.api.APIError as e:
+            claim.snak = None
+            claim.on_item = None
+            if e.code == 'modification-failed':
+                pywikibot.output(
+                    'modification-failed error: {0} claim to {1}'.format(
+                        claim.getID(), item))
+                return False
+            else:
+                raise pywikibot.Error(
+                    'Something went very wrong trying to add '
+                    'a claim: {}'.format(e))
+
+        item.claims.setdefault(claim.getID(), []).append(claim)
+        ClaimIndex.invalidate(item)
+        return True
+
+    @staticmethod
+    def attach_qualifier(claim, qualifier):
+        """
+        Add a qualifier to the local claim without saving it.
+
+        @param claim: the claim to qualify
+        @type claim: pywikibot.Claim
+        @param qualifier: the qualifier to add
+        @type qualifier: pywikibot.Claim
+        """
+        qualifier.isQualifier = True
+        claim.qualifiers.setdefault(qualifier.getID(), []).append(qualifier)
+        ClaimIndex.invalidate_claim(claim)
+
+    @staticmethod
+    def attach_sources(claim, sources):
+        """
+        Add a reference to the local claim without saving it.
+
+        @param claim: the claim to source
+        @type claim: pywikibot.Claim
+        @param sources: the claims making up the reference
+        @type sources: list of pywikibot.Claim
+        """
+        source = OrderedDict()
+        for s in sources:
+            s.isReference = True
+            source.setdefault(s.getID(), []).append(s)
+        claim.sources.append(source)
+        ClaimIndex.invalidate_claim(claim)
 
     def bypass_redirect(self, item):
         """
@@ -440,6 +1066,10 @@ class WikidataStuff(object):
         Not that this should either be called before an
         item.exists()/item.get() call or a new one must be made afterwards
 
+        The outcome is stored in the (process-wide) redirect cache so that
+        each item is only looked up once. Use resolve_redirects() to look up
+        many items at once.
+
         @param item: item to investigate
         @type item: pywikibot.ItemPage
         @rtype pywikibot.ItemPage
@@ -448,10 +1078,80 @@ class WikidataStuff(object):
         if not isinstance(item, pywikibot.ItemPage):
             return item
 
-        if item.isRedirectPage():
-            return item.getRedirectTarget()
-        else:
+        qid = item.getID()
+        target = self.redirect_cache.get(qid)
+        if target is None:
+            if item.isRedirectPage():
+                target = item.getRedirectTarget().getID()
+            else:
+                target = qid
+            self.redirect_cache.set(qid, target)
+
+        if target == qid:
             return item
+        return pywikibot.ItemPage(item.site, target)
+
+    def resolve_redirects(self, items):
+        """
+        Resolve the redirect targets of many items in bulk.
+
+        Any items not already in the redirect cache are looked up using
+        batched wbgetentities calls, after which bypass_redirect() no longer
+        needs to look them up one by one.
+
+        @param items: items to investigate, any non-ItemPage are skipped
+        @type items: iterable of pywikibot.ItemPage
+        @return: the redirect target (or the item itself) per item id
+        @rtype: dict
+        """
+        items = [item for item in items
+                 if isinstance(item, pywikibot.ItemPage)]
+        targets = self.redirect_cache.resolve(
+            self.repo, [item.getID() for item in items])
+
+        resolved = dict()
+        for item in items:
+            qid = item.getID()
+            if targets[qid] == qid:
+                resolved[qid] = item
+            else:
+                resolved[qid] = pywikibot.ItemPage(item.site, targets[qid])
+        return resolved
+
+    def prefetch_targets(self, item):
+        """
+        Resolve redirects for all items used on an item, in bulk.
+
+        Collects every distinct item used as a target of a claim, qualifier
+        or reference on the (loaded) item and resolves any redirects for
+        these using batched requests. This replaces the many individual
+        look-ups otherwise made when comparing statements to the item.
+
+        This is only done once per revision of the item.
+
+        @param item: the item to prefetch targets for
+        @type item: pywikibot.ItemPage
+        """
+        index = ClaimIndex.for_item(item)
+        if index.prefetched:
+            return
+
+        targets = OrderedDict()
+        for claims in item.claims.values():
+            for claim in claims:
+                snaks = [claim]
+                for qualifiers in claim.qualifiers.values():
+                    snaks += qualifiers
+                for source in claim.sources:
+                    for source_claims in source.values():
+                        snaks += source_claims
+                for snak in snaks:
+                    target = snak.getTarget()
+                    if isinstance(target, pywikibot.ItemPage):
+                        targets.setdefault(target.getID(), target)
+
+        self.resolve_redirects(targets.values())
+        index.prefetched = True
 
     def match_claim(self, claims, qualifiers, force):
         """
@@ -485,8 +1185,9 @@ class WikidataStuff(object):
         # close matches for qualifiers case 1-4
         exact_matches = []
         has_all_matches = []
+        keys = qualifier_keys(qualifiers)
         for claim in claims:
-            exact, has_all = self.has_all_qualifiers(qualifiers, claim)
+            exact, has_all = self.compare_qualifier_keys(keys, claim)
             if exact:
                 exact_matches.append(claim)
             if has_all:
@@ -515,46 +1216,46 @@ class WikidataStuff(object):
         """
         Compare if two WbTime claims are the same (regarding precision).
 
-        Handles T107870.
+        Handles T107870. See helpers.wbtime_key() for a key which can be used
+        to compare, or deduplicate, many WbTimes at once.
 
         @todo implement as __cmp__ in __init__ T131453
 
         @param target: any Claim
         @param itis: a WbTime
-        @raises: pywikibot.Error
         @rtype bool
         """
         if not isinstance(target, pywikibot.WbTime):
             return False
-        if itis.precision != target.precision:
-            return False
-        if itis.calendarmodel != target.calendarmodel:
-            return False
+        return helpers.wbtime_key(itis) == helpers.wbtime_key(target)
 
-        # comparison based on precision
-        PRECISION = pywikibot.WbTime.PRECISION
-        if itis.precision < PRECISION['year']:
-            raise pywikibot.Error(
-                'Comparison cannot be done if precision is more coarse '
-                'than a year')
-        if itis.year != target.year:
-            return False
-        if itis.precision >= PRECISION['month']:
-            if itis.month != target.month:
-                return False
-            if itis.precision >= PRECISION['day']:
-                if itis.day != target.day:
-                    return False
-                if itis.precision >= PRECISION['hour']:
-                    if itis.hour != target.hour:
-                        return False
-                    if itis.precision >= PRECISION['minute']:
-                        if itis.minute != target.minute:
-                            return False
-                        if (itis.precision >= PRECISION['second'] and
-                                itis.second != target.second):
-                            return False
-        return True
+    def preload_items(self, entries, chunk_size=50, max_chunks=2):
+        """
+        Load the items of many (qid, payload) entries in bulk.
+
+        The items are fetched in chunks, in the background, so that the next
+        chunk is loaded while the current one is being processed. Only the
+        configured props and languages are fetched. See ItemPreloader for
+        details.
+
+            for item, payload in wd_stuff.preload_items(entries):
+                wd_stuff.add_new_claim(prop, payload, item, ref)
+
+        @param entries: the items to load and the payload to pass along with
+            each of them
+        @type entries: iterable of (basestring, object)
+        @param chunk_size: number of items to fetch per request, at most 50.
+        @type chunk_size: int
+        @param max_chunks: maximum number of fetched chunks waiting to be
+            processed.
+        @type max_chunks: int
+        @return: the loaded item (or None if it does not exist) and payload
+            for each entry, in the original order
+        @rtype: generator of (pywikibot.ItemPage|None, object)
+        """
+        preloader = self.make_preloader(
+            chunk_size=chunk_size, max_chunks=max_chunks)
+        return preloader.preload(entries)
 
     def q_to_itempage(self, qid):
         """
@@ -566,20 +1267,39 @@ class WikidataStuff(object):
         """
         return pywikibot.ItemPage(self.repo, helpers.std_q(qid))
 
-    def make_simple_claim(self, prop, target):
+    def make_simple_claim(self, prop, target, is_reference=False):
         """
         Make a pywikibot.Claim given a property and target.
 
         @param prop: the P-id of a property (with or without "P")
         @type prop: basestring|int
-        @param target: the target of the Claim
+        @param target: the target of the Claim, lightweight values (see
+            wikidatastuff.values) are converted to pywikibot objects
         @type target: object
+        @param is_reference: if the Claim is a source claim
+        @type is_reference: bool
         @rtype: pywikibot.Claim
         """
-        claim = pywikibot.Claim(self.repo, helpers.std_p(prop))
-        claim.setTarget(target)
+        claim = pywikibot.Claim(
+            self.repo, helpers.std_p(prop), is_reference=is_reference)
+        claim.setTarget(to_pywikibot(target, self.repo))
         return claim
 
+    def make_sources(self, ref):
+        """
+        Make the source claims of a Reference.
+
+        Any Qualifier sources are converted to pywikibot.Claims.
+
+        @param ref: the reference
+        @type ref: Reference
+        @rtype: list of pywikibot.Claim
+        """
+        return [
+            source if isinstance(source, pywikibot.Claim) else
+            self.make_simple_claim(source.prop, source.itis, is_reference=True)
+            for source in ref.get_all_sources()]
+
     def make_new_item(self, data, summary=None):
         """
         Make a new ItemPage given some data and an edit summary.
@@ -593,7 +1313,8 @@ class WikidataStuff(object):
         summary = summary or self.edit_summary
 
         identification = dict()  # If empty this defaults to creating an entity
-        result = self.repo.editEntity(identification, data, summary=summary)
+        result = self.write(
+            self.repo.editEntity, identification, data, summary=summary)
         pywikibot.output(summary)  # afterwards in case an error is raised
 
         # return the new item
@@ -614,7 +1335,7 @@ class WikidataStuff(object):
         """
         summary = summary or self.edit_summary
 
-        result = self.repo.createNewItemFromPage(page, summary)
+        result = self.write(self.repo.createNewItemFromPage, page, summary)
         pywikibot.output(summary)  # afterwards in case an error is raised
 
         # return the new item
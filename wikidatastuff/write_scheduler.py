@@ -0,0 +1,285 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Author: Lokal_Profil
+# License: MIT
+#
+"""Adaptive, maxlag aware, scheduling of writes."""
+from __future__ import unicode_literals
+from builtins import object
+from collections import deque
+import re
+import threading
+import time
+
+import pywikibot
+
+try:
+    from pywikibot.exceptions import MaxlagTimeoutError
+except ImportError:  # older pywikibot
+    MaxlagTimeoutError = None
+
+LAG_PATTERN = re.compile(r'(?P<lag>\d+(\.\d+)?) seconds? lagged')
+
+
+class WriteScheduler(object):
+    """
+    Schedule writes, adapting their rate to the load of the cluster.
+
+    Every write made through run() or run_on() waits for a free slot
+    (limiting the number of concurrent writes) and for a minimum spacing to
+    the previous write. Whenever a write fails due to lag (maxlag or
+    ratelimited) the spacing is doubled, the concurrency halved and all
+    writes are paused for the reported time. If the site of the write is
+    known (see run_on()) any Retry-After header of the failed request is
+    used as the time to pause. Each successful write then slowly speeds
+    things up again.
+
+    The lag reported to pywikibot's own throttle for a site, including any
+    lag which pywikibot handled itself, can additionally be followed by
+    explicitly calling watch().
+
+    All of this comes on top of pywikibot's own put throttle, which may be
+    lowered (config.put_throttle) to let the scheduler set the pace.
+    """
+
+    def __init__(self, min_delay=0.0, max_delay=60.0, max_concurrency=4,
+                 max_retries=3, speedup=0.9, recovery=10):
+        """
+        Initialise the scheduler.
+
+        @param min_delay: the minimum spacing, in seconds, between writes
+        @type min_delay: float
+        @param max_delay: the maximum spacing, in seconds, between writes
+        @type max_delay: float
+        @param max_concurrency: the maximum number of concurrent writes
+        @type max_concurrency: int
+        @param max_retries: number of times to retry a write which failed
+            due to lag
+        @type max_retries: int
+        @param speedup: factor applied to the spacing after each successful
+            write
+        @type speedup: float
+        @param recovery: number of consecutive successful writes after which
+            the concurrency is increased by one
+        @type recovery: int
+        """
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.speedup = speedup
+        self.recovery = recovery
+
+        self.delay = min_delay
+        self.concurrency = max_concurrency
+        self.lag = None  # the last reported lag
+        self._successes = 0
+        self._active = 0
+        self._last_start = 0
+        self._paused_until = 0
+        self._recent = deque()  # start times of writes in the last minute
+        self._condition = threading.Condition()
+
+    @property
+    def rate(self):
+        """Return the number of writes started during the last minute."""
+        with self._condition:
+            self._forget_old(time.time())
+            return len(self._recent)
+
+    def status(self):
+        """
+        Return the current state of the scheduler, for monitoring.
+
+        @return: the current spacing (in seconds), concurrency, rate (writes
+            per minute) and last reported lag (in seconds)
+        @rtype: dict
+        """
+        rate = self.rate
+        with self._condition:
+            return {
+                'delay': self.delay,
+                'concurrency': self.concurrency,
+                'rate': rate,
+                'lag': self.lag}
+
+    def _forget_old(self, now):
+        """Drop start times older than a minute."""
+        while self._recent and self._recent[0] < now - 60:
+            self._recent.popleft()
+
+    def _acquire(self):
+        """Wait for a free slot and the required spacing."""
+        with self._condition:
+            while True:
+                now = time.time()
+                timeout = None
+                if self._active < self.concurrency:
+                    timeout = max(self._paused_until,
+                                  self._last_start + self.delay) - now
+                    if timeout <= 0:
+                        self._active += 1
+                        self._last_start = now
+                        self._recent.append(now)
+                        self._forget_old(now)
+                        return
+                self._condition.wait(timeout)
+
+    def _release(self):
+        """Free up the slot of a finished write."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def report_success(self):
+        """Speed up following a successful write."""
+        with self._condition:
+            self.delay = max(self.min_delay, self.delay * self.speedup)
+            self._successes += 1
+            if (self._successes >= self.recovery and
+                    self.concurrency < self.max_concurrency):
+                self.concurrency += 1
+                self._successes = 0
+            self._condition.notify_all()
+
+    def report_lag(self, lag=None, retry_after=None):
+        """
+        Slow down following a report of server lag.
+
+        @param lag: the reported lag, in seconds
+        @type lag: float|None
+        @param retry_after: the number of seconds after which to retry, e.g.
+            from a Retry-After header
+        @type retry_after: float|None
+        """
+        with self._condition:
+            self.lag = lag
+            self.delay = min(self.max_delay, max(self.delay * 2, 1.0))
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+            pause = retry_after or lag or self.delay
+            self._paused_until = max(self._paused_until, time.time() + pause)
+            self._condition.notify_all()
+
+    @staticmethod
+    def get_lag(error, site=None):
+        """
+        Determine if an error was caused by server lag.
+
+        @param error: the error raised by a write
+        @type error: Exception
+        @param site: the site to which the write was made. If given, any
+            Retry-After header of the failed request is read from the
+            throttle of the site, where pywikibot records it for every
+            response.
+        @type site: pywikibot.site.BaseSite|None
+        @return: the lag (or None if unknown) and the time to wait before
+            retrying (or None if unknown), or None if not caused by lag
+        @rtype: (float|None, float|None)|None
+        """
+        if MaxlagTimeoutError is not None and isinstance(
+                error, MaxlagTimeoutError):
+            return (None, WriteScheduler.get_retry_after(site))
+        if not isinstance(error, pywikibot.data.api.APIError):
+            return None
+        if error.code not in ('maxlag', 'ratelimited'):
+            return None
+
+        lag = error.other.get('lag')
+        if lag is None and error.info:
+            match = LAG_PATTERN.search(error.info)
+            if match:
+                lag = float(match.group('lag'))
+        return (lag, WriteScheduler.get_retry_after(site))
+
+    @staticmethod
+    def get_retry_after(site):
+        """
+        Get the Retry-After header of the last response from a site.
+
+        @param site: the site, or None if not known
+        @type site: pywikibot.site.BaseSite|None
+        @return: the number of seconds, or None if not set
+        @rtype: float|None
+        """
+        if site is None:
+            return None
+        return getattr(site.throttle, 'retry_after', None) or None
+
+    def run(self, func, *args, **kwargs):
+        """
+        Make a write, retrying it if it fails due to server lag.
+
+        @param func: the function making the write
+        @type func: callable
+        @return: the outcome of the function
+        """
+        return self.run_on(None, func, *args, **kwargs)
+
+    def run_on(self, site, func, *args, **kwargs):
+        """
+        Make a write to a given site, retrying it if it fails due to lag.
+
+        As run() but any Retry-After header of a failed write is honoured.
+
+        @param site: the site to which the write is made
+        @type site: pywikibot.site.BaseSite|None
+        @param func: the function making the write
+        @type func: callable
+        @return: the outcome of the function
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                lag = WriteScheduler.get_lag(e, site)
+                if lag is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                pywikibot.output(
+                    'Write failed due to server lag, retrying ({0}/{1})'.format(
+                        attempt, self.max_retries))
+                self.report_lag(*lag)
+            else:
+                self.report_success()
+                return result
+            finally:
+                self._release()
+
+    def watch(self, site):
+        """
+        Follow the lag reported to the throttle of a site.
+
+        pywikibot handles most maxlag errors itself, by pausing the throttle
+        of the site, without these reaching the caller. Watching the site
+        ensures the scheduler also adapts to these.
+
+        Note that this replaces the lag method of the (shared) throttle of
+        the site, so it is never done implicitly.
+
+        @param site: the site to watch
+        @type site: pywikibot.site.BaseSite
+        """
+        throttle = site.throttle
+        schedulers = getattr(throttle, '_wds_write_schedulers', None)
+        if schedulers is None:
+            schedulers = []
+            original_lag = throttle.lag
+
+            def lag(lagtime=None):
+                """Report the lag to the schedulers, then pause as usual."""
+                retry_after = getattr(throttle, 'retry_after', None)
+                for scheduler in schedulers:
+                    scheduler.report_lag(lagtime, retry_after)
+                return original_lag(lagtime)
+
+            throttle.lag = lag
+            throttle._wds_write_schedulers = schedulers
+        if self not in schedulers:
+            schedulers.append(self)
+
+
+default_scheduler = WriteScheduler()